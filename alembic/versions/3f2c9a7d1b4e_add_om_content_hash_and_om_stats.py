@@ -0,0 +1,49 @@
+"""add om content hash and om stats
+
+Revision ID: 3f2c9a7d1b4e
+Revises:
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f2c9a7d1b4e"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# NOTE: env.py runs `create_all` before any revision, so a fresh database
+#  already has all of this -- only add what an existing one is missing
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if "content_hash" not in {column["name"] for column in inspector.get_columns("oms")}:
+        op.add_column("oms", sa.Column("content_hash", sa.String(), nullable=True))
+    if "ix_oms_content_hash" not in {index["name"] for index in inspector.get_indexes("oms")}:
+        op.create_index("ix_oms_content_hash", "oms", ["content_hash"])
+
+    if not inspector.has_table("om_stats"):
+        op.create_table(
+            "om_stats",
+            sa.Column("id", sa.String(), primary_key=True, nullable=False),
+            sa.Column("om_id", sa.String(), sa.ForeignKey("oms.id"), nullable=False),
+            sa.Column("stats", sa.String(), nullable=False),
+            sa.Column("calls", sa.Integer(), nullable=False),
+            sa.Column("input_tokens", sa.Integer(), nullable=False),
+            sa.Column("output_tokens", sa.Integer(), nullable=False),
+            sa.Column("cost_usd", sa.Float(), nullable=False),
+            sa.Column("wall_seconds", sa.Float(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("om_stats")
+    op.drop_index("ix_oms_content_hash", table_name="oms")
+    op.drop_column("oms", "content_hash")
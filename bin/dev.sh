@@ -37,7 +37,7 @@ export PYTHONPATH="$PYTHONPATH:$(pwd)"
 
 # if we're targetting the worker, run the worker
 if [ "$WORKER" = true ]; then
-    arq src.task_manager.worker.WorkerSettings --watch ./src --verbose
+    watchfiles "python -m src.task_manager.worker" ./src
 else
     # Run the FastAPI server in the background
     python -m src
@@ -18,7 +18,7 @@ export LISTEN_PORT=8000
 export DEBUG=False
 
 if [ "$WORKER" = true ]; then
-    arq src.task_manager.worker.WorkerSettings
+    python -m src.task_manager.worker
 else
     python -m src
 fi
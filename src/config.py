@@ -41,6 +41,26 @@ class Config:
     database_path: str
     debug: bool
     log_path: str | None
+    render_workers: int | None
+    image_profile: str
+    anthropic_model: str | None
+    anthropic_screening_model: str | None
+    anthropic_metadata_model: str | None
+    anthropic_tables_model: str | None
+    anthropic_summary_model: str | None
+    llm_cache: str
+    screening_batch_size: int
+    prescreen: bool
+    prescreen_audit: bool
+    llm_cache_ttl: int
+    batch_poll_interval: float
+    summary_mode: str
+    rate_limit: str
+    anthropic_requests_per_minute: int | None
+    anthropic_tokens_per_minute: int | None
+    anthropic_max_concurrency: int
+    om_part_pages: int
+    om_max_jobs_per_user: int
 
     secrets: Secrets
 
@@ -62,6 +82,60 @@ class Config:
 
         self.minio_endpoint = os.getenv("MINIO_ENDPOINT", "http://localhost:9000")
 
+        # Number of processes used to parse and rasterize PDFs -- defaults to the cpu count
+        render_workers = empty_to_none("RENDER_WORKERS")
+        self.render_workers = int(render_workers) if render_workers else None
+
+        # Named profile for how page images are sized and encoded -- see IMAGE_PROFILES
+        self.image_profile = os.getenv("IMAGE_PROFILE", "default")
+
+        # Models per call type -- ANTHROPIC_MODEL sets all of them, the others
+        #  override a single call type; unset values use the engine defaults.
+        #  Metadata comes with the first chunk's tables, on the tables model, so
+        #  ANTHROPIC_METADATA_MODEL only affects batch mode's later-chunk calls
+        self.anthropic_model = empty_to_none("ANTHROPIC_MODEL")
+        self.anthropic_screening_model = empty_to_none("ANTHROPIC_SCREENING_MODEL")
+        self.anthropic_metadata_model = empty_to_none("ANTHROPIC_METADATA_MODEL")
+        self.anthropic_tables_model = empty_to_none("ANTHROPIC_TABLES_MODEL")
+        self.anthropic_summary_model = empty_to_none("ANTHROPIC_SUMMARY_MODEL")
+
+        # Where model responses are cached: redis, memory or none
+        self.llm_cache = os.getenv("LLM_CACHE", "redis")
+        self.llm_cache_ttl = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 60 * 60))
+
+        # Pages screened per model request -- 1 screens each page on its own
+        self.screening_batch_size = int(os.getenv("SCREENING_BATCH_SIZE", 1))
+
+        # Settle obviously (ir)relevant pages locally instead of asking the model;
+        #  the audit mode still asks, to measure how often the two agree
+        self.prescreen = os.getenv("PRESCREEN", "True") == "True"
+        self.prescreen_audit = os.getenv("PRESCREEN_AUDIT", "False") == "True"
+
+        # How document summaries are written: map_reduce (concurrent chunk summaries,
+        #  then combined) or running (one summary rewritten chunk by chunk)
+        self.summary_mode = os.getenv("SUMMARY_MODE", "map_reduce")
+
+        # Seconds between status checks on submitted message batches (batch mode)
+        self.batch_poll_interval = float(os.getenv("BATCH_POLL_INTERVAL", 60))
+
+        # Client-side limits on model calls, shared by the jobs of a worker (memory)
+        #  or by all workers (redis), or none; unset per-minute quotas aren't enforced,
+        #  and concurrency adapts below the maximum when the API reports overload
+        self.rate_limit = os.getenv("RATE_LIMIT", "memory")
+        requests_per_minute = empty_to_none("ANTHROPIC_REQUESTS_PER_MINUTE")
+        self.anthropic_requests_per_minute = int(requests_per_minute) if requests_per_minute else None
+        tokens_per_minute = empty_to_none("ANTHROPIC_TOKENS_PER_MINUTE")
+        self.anthropic_tokens_per_minute = int(tokens_per_minute) if tokens_per_minute else None
+        self.anthropic_max_concurrency = int(os.getenv("ANTHROPIC_MAX_CONCURRENCY", 16))
+
+        # Documents longer than this many pages are processed as page-range sub-jobs
+        #  on any free worker and merged afterwards -- 0 keeps every document in one job
+        self.om_part_pages = int(os.getenv("OM_PART_PAGES", 60))
+
+        # Jobs one user can have running at once, across all workers -- the rest wait
+        #  their turn, round-robin with other users' jobs. 0 turns the cap off
+        self.om_max_jobs_per_user = int(os.getenv("OM_MAX_JOBS_PER_USER", 3))
+
         # Set the log path
         self.log_path = empty_to_none("LOG_PATH")
 
@@ -1,10 +1,12 @@
 from .user import User
 from .om import Om, OmStatus
 from .om_table import OmTable
+from .om_stats import OmStats
 
 __all__ = [
     "User",
     "Om",
     "OmStatus",
-    "OmTable"
+    "OmTable",
+    "OmStats"
 ]
@@ -9,6 +9,7 @@ from sqlalchemy import Enum as SQLAlchemyEnum
 
 from src.logger import RequestSpan
 from ..database import Base, DatabaseException
+from .om_table import OmTable
 
 
 class OmStatus(str, Enum):
@@ -42,6 +43,9 @@ class Om(Base):
 
     storage_object_id = Column(String, nullable=False)
 
+    # sha-256 of the uploaded pdf -- uploads of the same pdf share its results
+    content_hash = Column(String, nullable=True, index=True)
+
     address = Column(String, nullable=True)
 
     title = Column(String, nullable=True)
@@ -71,6 +75,7 @@ class Om(Base):
         user_id: str,
         storage_object_id: str,
         session: AsyncSession,
+        content_hash: str | None = None,
         span: RequestSpan | None = None,
     ):
         try:
@@ -79,6 +84,7 @@ class Om(Base):
             om = Om(
                 user_id=user_id,
                 storage_object_id=storage_object_id,
+                content_hash=content_hash,
             )
             session.add(om)
             await session.flush()
@@ -143,3 +149,41 @@ class Om(Base):
             query = query.where(cls.status == status)
         result = await session.execute(query)
         return result.scalars().all()
+
+    @staticmethod
+    async def read_processed_by_content_hash(
+        content_hash: str,
+        session: AsyncSession,
+        span: RequestSpan | None = None,
+    ):
+        """An already processed OM of the same pdf, if there is one"""
+        if span:
+            span.debug(f"database::models::Om::read_processed_by_content_hash: {content_hash}")
+        query = (
+            select(Om)
+            .filter_by(content_hash=content_hash, status=OmStatus.PROCESSED)
+            .order_by(Om.created_at)
+        )
+        result = await session.execute(query)
+        return result.scalars().first()
+
+    async def copy_results(self, source: "Om", session: AsyncSession, span: RequestSpan | None = None):
+        """Mark this OM processed with the extracted fields and tables of processed `source`"""
+        try:
+            if span:
+                span.debug(f"database::models::Om::copy_results: {source.id} -> {self.id}")
+            self.address = source.address
+            self.title = source.title
+            self.type = source.type
+            self.description = source.description
+            self.summary = source.summary
+            self.square_feet = source.square_feet
+            self.total_units = source.total_units
+            self.property_type = source.property_type
+            self.status = source.status
+            await OmTable.clone_many(str(source.id), str(self.id), session, span=span)
+        except Exception as e:
+            if span:
+                span.error(f"database::models::Om::copy_results: {e}")
+            db_e = DatabaseException.from_sqlalchemy_error(e)
+            raise db_e
@@ -0,0 +1,66 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Float
+from datetime import datetime, UTC
+import uuid
+import json
+
+from src.logger import RequestSpan
+from src.llm.engines.om.stats import DocumentStats
+from ..database import Base, DatabaseException
+
+
+class OmStats(Base):
+    """What processing an OM took -- one row per processing attempt"""
+
+    __tablename__ = "om_stats"
+
+    id = Column(
+        String, primary_key=True, default=lambda: str(uuid.uuid4()), nullable=False
+    )
+
+    om_id = Column(String, ForeignKey("oms.id"), nullable=False)
+
+    # the full DocumentStats, per stage, as json
+    stats = Column(String, nullable=False)
+
+    # totals, kept as columns for querying
+    calls = Column(Integer, nullable=False, default=0)
+
+    input_tokens = Column(Integer, nullable=False, default=0)
+
+    output_tokens = Column(Integer, nullable=False, default=0)
+
+    cost_usd = Column(Float, nullable=False, default=0.0)
+
+    wall_seconds = Column(Float, nullable=False, default=0.0)
+
+    # timestamps
+    created_at = Column(DateTime, default=datetime.now(UTC))
+
+    @staticmethod
+    async def create(
+        om_id: str,
+        stats: DocumentStats,
+        session: AsyncSession,
+        span: RequestSpan | None = None,
+    ) -> "OmStats":
+        try:
+            if span:
+                span.debug(f"database::models::OmStats::create: {om_id}")
+            om_stats = OmStats(
+                om_id=om_id,
+                stats=json.dumps(stats.to_dict()),
+                calls=stats.total.calls,
+                input_tokens=stats.total.input_tokens,
+                output_tokens=stats.total.output_tokens,
+                cost_usd=stats.total.cost_usd,
+                wall_seconds=stats.wall_seconds,
+            )
+            session.add(om_stats)
+            await session.flush()
+            return om_stats
+        except Exception as e:
+            if span:
+                span.error(f"database::models::OmStats::create: {e}")
+            db_e = DatabaseException.from_sqlalchemy_error(e)
+            raise db_e
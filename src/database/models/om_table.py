@@ -4,10 +4,11 @@ from datetime import datetime, UTC
 import uuid
 from sqlalchemy.future import select
 from typing import Dict, Any, List
+import io
 import json
 
 from src.logger import RequestSpan
-from src.storage import StorageBucket
+from src.storage import Storage, StorageBucket
 from ..database import Base, DatabaseException
 
 class OmTable(Base):
@@ -33,11 +34,16 @@ class OmTable(Base):
     async def create_many(
         om_id: str,
         tables: Dict[str, List[Dict[str, Any]]],
-        storage: StorageBucket,
+        storage: Storage,
         session: AsyncSession,
+        content_hash: str | None = None,
         span: RequestSpan | None = None,
     ) -> List["OmTable"]:
-        """Create table entries and store data in minio"""
+        """Create table entries and store data in minio
+
+        With the `content_hash` of the OM's pdf, table data is stored under it,
+        so uploads of the same pdf share it.
+        """
         try:
             if span:
                 span.debug(f"database::models::OmTable::create_tables: {om_id}")
@@ -46,10 +52,12 @@ class OmTable(Base):
             
             for table_type, table_data in tables.items():
                 # Store table data in minio
+                data = json.dumps(table_data).encode()
                 storage_object_id = storage.put_object(
-                    bucket=StorageBucket.OM_TABLES,
-                    data=json.dumps(table_data).encode(),
-                    content_type="application/json"
+                    io.BytesIO(data),
+                    len(data),
+                    bucket=StorageBucket.om_tables,
+                    object_name=f"{content_hash}/{table_type}.json" if content_hash else None,
                 )
                 
                 # Create table record
@@ -69,3 +77,42 @@ class OmTable(Base):
                 span.error(f"database::models::OmTable::create_tables: {e}")
             db_e = DatabaseException.from_sqlalchemy_error(e)
             raise db_e
+
+    @staticmethod
+    async def read_by_om_id(om_id: str, session: AsyncSession, span: RequestSpan | None = None):
+        if span:
+            span.debug(f"database::models::OmTable::read_by_om_id: {om_id}")
+        query = select(OmTable).filter_by(om_id=om_id)
+        result = await session.execute(query)
+        return result.scalars().all()
+
+    @staticmethod
+    async def clone_many(
+        source_om_id: str,
+        om_id: str,
+        session: AsyncSession,
+        span: RequestSpan | None = None,
+    ) -> List["OmTable"]:
+        """Give `om_id` the tables of `source_om_id`, sharing their stored data"""
+        try:
+            if span:
+                span.debug(f"database::models::OmTable::clone_many: {source_om_id} -> {om_id}")
+
+            cloned_tables = []
+            for source in await OmTable.read_by_om_id(source_om_id, session):
+                table = OmTable(
+                    om_id=om_id,
+                    type=source.type,
+                    storage_object_id=source.storage_object_id,
+                )
+                session.add(table)
+                cloned_tables.append(table)
+
+            await session.flush()
+            return cloned_tables
+
+        except Exception as e:
+            if span:
+                span.error(f"database::models::OmTable::clone_many: {e}")
+            db_e = DatabaseException.from_sqlalchemy_error(e)
+            raise db_e
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from redis.asyncio import Redis
+
+
+def cache_key(
+    model: str,
+    prompt: str,
+    image: Optional[bytes | List[bytes]],
+    max_tokens: int,
+    temperature: float,
+    system: Optional[str] = None,
+) -> str:
+    """Content hash identifying a model call -- identical calls share a key"""
+    image_hash: Optional[str | List[str]]
+    if isinstance(image, bytes):
+        image_hash = hashlib.sha256(image).hexdigest()
+    elif image:
+        image_hash = [hashlib.sha256(page_image).hexdigest() for page_image in image]
+    else:
+        image_hash = None
+    payload = json.dumps(
+        [model, system, prompt, image_hash, max_tokens, temperature],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache(ABC):
+    """Interface for caching model responses by `cache_key`
+
+    Implementations should treat backend failures as misses -- a cache must
+    never fail the call it sits under.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str) -> None: ...
+
+
+class LruResponseCache(ResponseCache):
+    """In-process cache evicting least recently used entries past `max_bytes`"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.entries: OrderedDict[str, Tuple[str, float]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at and expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        if key in self.entries:
+            self._remove(key)
+        entry_size = len(value.encode())
+        if entry_size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        self.entries[key] = (value, expires_at)
+        self.size += entry_size
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, key: str) -> None:
+        value, _ = self.entries.pop(key)
+        self.size -= len(value.encode())
+
+
+class RedisResponseCache(ResponseCache):
+    """Cache shared across workers, backed by the worker's redis connection"""
+
+    def __init__(
+        self,
+        redis: Redis,
+        ttl: Optional[int] = 7 * 24 * 60 * 60,
+        prefix: str = "llm:response:",
+    ):
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self.redis.get(self.prefix + key)
+        except Exception:
+            return None
+        if value is None:
+            return None
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set(self, key: str, value: str) -> None:
+        try:
+            await self.redis.set(self.prefix + key, value, ex=self.ttl)
+        except Exception:
+            pass
@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+from .checkpoint import CheckpointStore
+
+# Seconds between status checks while a batch is processing
+BATCH_POLL_INTERVAL = 60.0
+
+
+class MessageBatchRunner:
+    """Runs many model requests as one message batch and waits for the replies
+
+    Batches take minutes to hours, so ids of submitted batches are saved to the
+    optional state store -- a retried job polls the batch it already submitted
+    instead of paying for it twice.
+    """
+
+    def __init__(
+        self,
+        anthropic_client: Any,
+        poll_interval: float = BATCH_POLL_INTERVAL,
+        state: Optional[CheckpointStore] = None,
+    ):
+        self.anthropic_client = anthropic_client
+        self.poll_interval = poll_interval
+        self.state = state
+
+    @property
+    def batches(self):
+        return self.anthropic_client.beta.messages.batches
+
+    async def run(
+        self, name: str, requests: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Submit `requests` (custom id -> messages.create params) as the batch called `name`
+
+        Returns the reply message for every request that succeeded; errored,
+        canceled and expired requests are left out for the caller to retry.
+        """
+        if not requests:
+            return {}
+
+        saved = (await self.state.load() if self.state else None) or {}
+        batch_id = saved.get(name)
+        if not batch_id:
+            batch = await self.batches.create(
+                requests=[
+                    {"custom_id": custom_id, "params": params}
+                    for custom_id, params in requests.items()
+                ]
+            )
+            batch_id = batch.id
+            if self.state:
+                await self.state.save({**saved, name: batch_id})
+
+        while (await self.batches.retrieve(batch_id)).processing_status != "ended":
+            await asyncio.sleep(self.poll_interval)
+
+        messages = {}
+        async for item in await self.batches.results(batch_id):
+            if item.result.type == "succeeded" and item.custom_id in requests:
+                messages[item.custom_id] = item.result.message
+        return messages
@@ -0,0 +1,53 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from redis.asyncio import Redis
+
+
+class CheckpointStore(ABC):
+    """Interface for persisting a document's processing state between job attempts"""
+
+    @abstractmethod
+    async def load(self) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def save(self, state: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def clear(self) -> None: ...
+
+
+class MemoryCheckpointStore(CheckpointStore):
+    """Keeps the checkpoint in memory -- mostly useful for tests"""
+
+    def __init__(self):
+        self.state: Optional[str] = None
+
+    async def load(self) -> Optional[Dict[str, Any]]:
+        return json.loads(self.state) if self.state else None
+
+    async def save(self, state: Dict[str, Any]) -> None:
+        self.state = json.dumps(state)
+
+    async def clear(self) -> None:
+        self.state = None
+
+
+class RedisCheckpointStore(CheckpointStore):
+    """Checkpoint kept in redis under a single key, e.g. one per OM"""
+
+    def __init__(self, redis: Redis, key: str, ttl: Optional[int] = 24 * 60 * 60):
+        self.redis = redis
+        self.key = key
+        self.ttl = ttl
+
+    async def load(self) -> Optional[Dict[str, Any]]:
+        value = await self.redis.get(self.key)
+        return json.loads(value) if value else None
+
+    async def save(self, state: Dict[str, Any]) -> None:
+        await self.redis.set(self.key, json.dumps(state), ex=self.ttl)
+
+    async def clear(self) -> None:
+        await self.redis.delete(self.key)
@@ -1,32 +1,88 @@
 import anthropic
-from typing import BinaryIO, Optional, Dict, List, Any, AsyncGenerator, Tuple
-from dataclasses import dataclass
+from typing import BinaryIO, Optional, Dict, List, Any, AsyncGenerator, AsyncIterator, Sequence, Tuple
+from dataclasses import dataclass, asdict, field
 import json
 import asyncio
-from .pdf import extract_pdf
+from .pdf import extract_pdf, ImageProfile, PageImage, RenderService
+from .checkpoint import CheckpointStore
+from .batch import MessageBatchRunner
+from .stats import CallUsage, DocumentStats
+from .prescreen import prescreen_page, PrescreenResult, PrescreenStats, PrescreenVerdict
 from .prompts import (
+    METADATA_SYSTEM,
     METADATA_PROMPT, 
+    TABLE_DETECTION_SYSTEM,
     TABLE_DETECTION_PROMPT, 
+    EXTRACTION_SYSTEM,
+    EXTRACTION_PROMPT,
+    SUMMARY_UPDATE_SYSTEM,
     SUMMARY_UPDATE_PROMPT, 
-    PAGE_SCREENING_PROMPT
+    CHUNK_SUMMARY_SYSTEM,
+    CHUNK_SUMMARY_PROMPT,
+    SUMMARY_REDUCE_SYSTEM,
+    SUMMARY_REDUCE_PROMPT,
+    PAGE_SCREENING_SYSTEM,
+    PAGE_SCREENING_PROMPT,
+    BATCH_SCREENING_SYSTEM,
+    BATCH_SCREENING_PROMPT
 )
 import os
 from datetime import datetime
 from pathlib import Path
 import functools
+import random
 import time
+from contextlib import nullcontext
 from typing import TypeVar, Callable, Any, ParamSpec
 import base64
+from enum import Enum
 from src.database.models.om import OmStatus  
+from src.llm.cache import ResponseCache, cache_key
+from src.llm.rate_limit import RETRYABLE_ERRORS, RateLimiter, Reservation, retry_after
 from typing import Callable, Awaitable
 
 # Constants
+DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
+# small and fast -- good enough for the per-page relevance check and summaries
+FAST_MODEL = "claude-3-5-haiku-20241022"
 METADATA_MAX_TOKENS = 1500
 TABLE_DETECTION_MAX_TOKENS = 8000
+# combined metadata and table extraction -- the model's output limit
+EXTRACTION_MAX_TOKENS = 8192
 SUMMARY_UPDATE_MAX_TOKENS = 1000
 PAGE_SCREENING_MAX_TOKENS = 1000
-CHUNK_PAGE_LIMIT = 3
+# Most pages, relevant or not, one chunk spans -- chunks close at the extraction
+#  budget, this only keeps checkpoints moving through runs of irrelevant pages
+CHUNK_PAGE_LIMIT = 20
+SCREENING_CONCURRENCY = 8
+# Batched screening: pages per request, the input budget for their text, a per-page
+#  cap, and the most pages a batch holds, those the pre-screen settled included
+SCREENING_BATCH_SIZE = 1
+SCREENING_BATCH_TOKEN_BUDGET = 6000
+SCREENING_PAGE_CHAR_LIMIT = 4000
+SCREENING_BATCH_PAGE_LIMIT = 3
+BATCH_SCREENING_MAX_TOKENS_PER_PAGE = 150
+PIPELINE_QUEUE_SIZE = 4
+# Map-reduce summaries: chunk summaries written at once, and how many are combined per reduce call
+SUMMARY_CONCURRENCY = 8
+SUMMARY_REDUCE_FAN_IN = 8
 TEXT_CHUNK_SIZE = 4000
+# Estimated input tokens per call type -- page text plus images -- that calls are
+#  packed up to: relevant pages into chunks, and chunks' text into summary calls
+EXTRACTION_INPUT_TOKEN_BUDGET = 12000
+SUMMARY_INPUT_TOKEN_BUDGET = 24000
+# what an image within ImageProfile's default size costs the model -- about
+#  width * height / 750 tokens, and the default caps an image at ~1.15 MP
+IMAGE_TOKEN_ESTIMATE = 1600
+# Shortest system prefix the API caches, in tokens (Haiku models need twice as
+#  much). Every *_SYSTEM prompt is well under it today, so no call is cached yet
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_MIN_TOKENS_HAIKU = 2048
+
+
+# A malformed answer may come out right when asked again; transport errors are
+#  already retried inside `generate`
+RESPONSE_ERRORS = (ValueError, KeyError, TypeError)
 
 
 T = TypeVar('T')
@@ -41,6 +97,9 @@ def async_retry(
     """
     Retry decorator for async functions with exponential backoff
     
+    Delays are jittered so callers failing together don't retry together, and
+    never shorter than a retry-after the error's response asked for.
+
     Args:
         retries: Number of retries
         delay: Initial delay between retries in seconds
@@ -61,13 +120,35 @@ def async_retry(
                     if attempt == retries:
                         raise
                     
-                    await asyncio.sleep(current_delay)
+                    jittered = current_delay * random.uniform(0.5, 1.0)
+                    await asyncio.sleep(max(jittered, retry_after(e) or 0))
                     current_delay *= backoff
             
             raise last_exception
         return wrapper
     return decorator
 
+def reduce_groups(summaries: List[str]) -> List[List[str]]:
+    """Split summaries into consecutive groups for one level of reduction"""
+    return [
+        summaries[start:start + SUMMARY_REDUCE_FAN_IN]
+        for start in range(0, len(summaries), SUMMARY_REDUCE_FAN_IN)
+    ]
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting requests (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def truncate_text(text: str, limit: int) -> str:
+    """Cut text to at most `limit` characters, preferring a line boundary"""
+    if len(text) <= limit:
+        return text
+    cut = text.rfind("\n", 0, limit)
+    if cut < limit // 2:
+        cut = limit
+    return text[:cut] + "\n[truncated]"
+
 @dataclass
 class DocumentContext:
     title: Optional[str] = None
@@ -79,17 +160,45 @@ class DocumentContext:
     running_summary: str = ""
     tables: Dict[str, List[Dict[str, Any]]] = None
     current_page: int = 0
+    # per-chunk summaries in page order, reduced into running_summary (map-reduce mode)
+    chunk_summaries: List[str] = field(default_factory=list)
+    # relevant text of finished chunks not summarized yet -- summary calls are packed across chunks
+    pending_summary: str = ""
     
     def __post_init__(self):
         if self.tables is None:
             self.tables = {}
 
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "address": self.address,
+            "square_feet": self.square_feet,
+            "total_units": self.total_units,
+            "property_type": self.property_type,
+            "description": self.description,
+        }
+
 @dataclass
 class PageContent:
     text: str
     image: Optional[bytes]
     is_relevant: bool = False
     reason: str = ""
+    # rendered into `image` only once the page is found relevant
+    image_source: Optional[PageImage] = None
+    # 1-indexed position in the document
+    page_number: int = 0
+
+@dataclass
+class ChunkResult:
+    """What the table stage hands the summary stage for a finished chunk"""
+    last_page: int
+    relevant_text: Optional[str]
+    # metadata and table row counts as of this chunk -- tables are append-only, so
+    #  these are enough to rebuild a consistent checkpoint while later chunks run ahead
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    table_rows: Dict[str, int] = field(default_factory=dict)
 
 @dataclass
 class ProgressEvent:
@@ -98,52 +207,283 @@ class ProgressEvent:
     total_pages: int
     error: str | None = None
 
+class SummaryMode(str, Enum):
+    # rewrite one running summary after every chunk, in order
+    RUNNING = "running"
+    # summarize chunks independently and concurrently, then combine the summaries
+    MAP_REDUCE = "map_reduce"
+
+
+@dataclass
+class ModelRouting:
+    """Which model handles each type of call
+
+    Metadata is extracted in the same call as the tables of the first relevant
+    chunk, on the `tables` model -- `metadata` only answers the separate calls
+    batch mode makes for later chunks while metadata is still missing.
+    """
+    screening: str = FAST_MODEL
+    metadata: str = DEFAULT_MODEL
+    tables: str = DEFAULT_MODEL
+    summary: str = FAST_MODEL
+
+    @classmethod
+    def single(cls, model: str) -> "ModelRouting":
+        return cls(screening=model, metadata=model, tables=model, summary=model)
+
+@dataclass
+class PipelineProgress:
+    total_pages: int = 0
+    screened: int = 0
+    # last page covered by the checkpoint we resumed from
+    resumed_from: int = 0
+    # the pages this run covers -- all of them unless given a page range
+    first_page: int = 1
+    last_page: Optional[int] = None
+
+    @property
+    def end_page(self) -> int:
+        return min(self.last_page, self.total_pages) if self.last_page else self.total_pages
+
+    @property
+    def pages(self) -> int:
+        return max(self.end_page - self.first_page + 1, 0)
+
 # TODO: long term debugging strategy
 class OmEngine:
     # enable async callbacks
     def __init__(
         self, 
-        anthropic_client: anthropic.Anthropic, 
-        model: str = "claude-3-5-sonnet-20241022",
-        progress_callback: Callable[[ProgressEvent], Awaitable[None]] | None = None
+        anthropic_client: anthropic.AsyncAnthropic | anthropic.Anthropic, 
+        model: str = DEFAULT_MODEL,
+        models: ModelRouting | None = None,
+        progress_callback: Callable[[ProgressEvent], Awaitable[None]] | None = None,
+        screening_concurrency: int = SCREENING_CONCURRENCY,
+        screening_batch_size: int = SCREENING_BATCH_SIZE,
+        screening_batch_tokens: int = SCREENING_BATCH_TOKEN_BUDGET,
+        prescreen: bool = True,
+        prescreen_audit: bool = False,
+        render_service: RenderService | None = None,
+        image_profile: ImageProfile = ImageProfile(),
+        cache: ResponseCache | None = None,
+        batch_runner: MessageBatchRunner | None = None,
+        summary_mode: SummaryMode = SummaryMode.MAP_REDUCE,
+        summary_concurrency: int = SUMMARY_CONCURRENCY,
+        rate_limiter: RateLimiter | None = None
     ):
         self.anthropic_client = anthropic_client
         self.model = model
+        # per call type models; without a routing everything goes to `model`
+        self.models = models or ModelRouting.single(model)
         self.progress_callback = progress_callback
+        # shared process pool for PDF parsing and rasterization; None uses the process-wide default
+        self.render_service = render_service
+        self.image_profile = image_profile
+        self.cache = cache
+        # shared per worker so concurrent jobs stay within the API quota together
+        self.rate_limiter = rate_limiter
+        # submits calls through the message batch API in `process_pdfs_batch`
+        self.batch_runner = batch_runner
+        # token usage of every model call made by the current process_pdf run
+        self.usage: List[CallUsage] = []
+        # aggregated from `usage` once process_pdf / process_pdfs_batch finishes
+        self.stats = DocumentStats()
+        self.batch_stats: List[DocumentStats] = []
+        # screening batches in flight, or screened and waiting for the table stage, per document
+        self.screening_concurrency = screening_concurrency
+        # pages per screening request; 1 screens every page on its own
+        self.screening_batch_size = screening_batch_size
+        self.screening_batch_tokens = screening_batch_tokens
+        # settle obvious pages locally; in audit mode they are still sent to the
+        #  model so prescreen_stats can report how often the two agree
+        self.prescreen = prescreen
+        self.prescreen_audit = prescreen_audit
+        self.prescreen_stats = PrescreenStats()
+        self.summary_mode = SummaryMode(summary_mode)
+        # bounds the number of chunk summaries being written at once
+        self.summary_semaphore = asyncio.Semaphore(summary_concurrency)
 
     async def emit_progress(self, event: ProgressEvent):
         """Emit a progress event if callback is configured"""
         if self.progress_callback:
             await self.progress_callback(event)
 
-    @async_retry(retries=3, delay=1.0, backoff=2.0)
-    async def generate(self, prompt: str, image: Optional[bytes] = None, max_tokens: int = 8000, temperature: float = 0) -> str:
-        """Generate text using the Anthropic model with retries"""
+    async def generate(
+        self,
+        prompt: str,
+        image: Optional[bytes | List[bytes]] = None,
+        max_tokens: int = 8000,
+        temperature: float = 0,
+        model: Optional[str] = None,
+        system: Optional[str] = None,
+        stage: str = "other",
+        validate: Optional[Callable[[str], Any]] = None
+    ) -> str:
+        """Generate text using the Anthropic model, answering from the response cache when possible
+
+        `image` is one image or a list of them, sent after the prompt in order.
+        `system` is a static instruction prefix, marked for provider-side prompt
+        caching once it is long enough for the API to cache.
+        `validate` raises one of RESPONSE_ERRORS for an answer the caller can't use;
+        such answers are never cached, so asking again really asks the model again.
+        Every call is recorded in `usage` under `stage`.
+        """
+        model = model or self.model
+        call = CallUsage(model=model, stage=stage)
+        start = time.monotonic()
         try:
-            messages_content = [{"type": "text", "text": prompt}]
-            if image:
-                messages_content.append({
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "image/jpeg",
-                        "data": base64.b64encode(image).decode('utf-8')
-                    }
-                })
-            response = self.anthropic_client.messages.create(
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                messages=[{
-                    "role": "user",
-                    "content": messages_content
-                }]
-            )
-            response_text = response.content[0].text
+            key = cache_key(model, prompt, image, max_tokens, temperature, system) if self.cache else None
+            if self.cache and key:
+                cached = await self.cache.get(key)
+                if cached is not None and self.usable(cached, validate):
+                    call.cached = True
+                    return cached
+            response_text = await self._generate(prompt, image, max_tokens, temperature, model, system, call)
+            if validate:
+                validate(response_text)
+            if self.cache and key:
+                await self.cache.set(key, response_text)
             return response_text
-            
-        except Exception as e:
+        except Exception:
+            call.failed = True
             raise
+        finally:
+            call.latency = time.monotonic() - start
+            self.usage.append(call)
+
+    def usable(self, response_text: str, validate: Optional[Callable[[str], Any]]) -> bool:
+        if not validate:
+            return True
+        try:
+            validate(response_text)
+            return True
+        except RESPONSE_ERRORS:
+            return False
+
+    def build_request(
+        self,
+        prompt: str,
+        image: Optional[bytes | List[bytes]] = None,
+        max_tokens: int = 8000,
+        temperature: float = 0,
+        model: Optional[str] = None,
+        system: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Parameters for `messages.create`, shared by interactive and batch calls"""
+        messages_content: List[Dict[str, Any]] = [{"type": "text", "text": prompt}]
+        for page_image in [image] if isinstance(image, bytes) else image or []:
+            messages_content.append({
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": self.image_profile.media_type,
+                    "data": base64.b64encode(page_image).decode('utf-8')
+                }
+            })
+        request: Dict[str, Any] = dict(
+            model=model or self.model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=[{
+                "role": "user",
+                "content": messages_content
+            }]
+        )
+        if system:
+            request["system"] = [{"type": "text", "text": system}]
+            if estimate_tokens(system) >= self.prompt_cache_min_tokens(request["model"]):
+                request["system"][0]["cache_control"] = {"type": "ephemeral"}
+        return request
+
+    def prompt_cache_min_tokens(self, model: str) -> int:
+        return PROMPT_CACHE_MIN_TOKENS_HAIKU if "haiku" in model else PROMPT_CACHE_MIN_TOKENS
+
+    @async_retry(retries=3, delay=1.0, backoff=2.0, exceptions=RETRYABLE_ERRORS)
+    async def _generate(
+        self,
+        prompt: str,
+        image: Optional[bytes | List[bytes]],
+        max_tokens: int,
+        temperature: float,
+        model: str,
+        system: Optional[str],
+        call: CallUsage
+    ) -> str:
+        """Call the Anthropic model, within the rate limits, retrying transient errors"""
+        call.attempts += 1
+        request = self.build_request(prompt, image, max_tokens, temperature, model, system)
+        images = [image] if isinstance(image, bytes) else image or []
+        estimate = estimate_tokens((system or "") + prompt) + IMAGE_TOKEN_ESTIMATE * len(images)
+        limit = self.rate_limiter.reserve(estimate) if self.rate_limiter else nullcontext(Reservation(estimate))
+        async with limit as reservation:
+            if isinstance(self.anthropic_client, anthropic.Anthropic):
+                # sync clients still work, but keep them off the event loop
+                create = self.anthropic_client.messages.create
+                response = await asyncio.to_thread(lambda: create(**request))
+            else:
+                response = await self.anthropic_client.messages.create(**request)
+            call.record(response)
+            # settle the estimate with what the call really used
+            reservation.tokens = (
+                call.input_tokens + call.cache_creation_input_tokens
+                + call.cache_read_input_tokens + call.output_tokens
+            ) or estimate
+        return response.content[0].text
+
+    async def generate_batch(self, name: str, calls: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """Answer many `generate` calls (custom id -> keyword arguments) with one message batch
+
+        Cached answers never reach the batch, and requests the batch fails on, or
+        whose answer fails the call's `validate`, are retried as ordinary calls.
+        """
+        if not self.batch_runner:
+            raise RuntimeError("batch processing needs an engine with a batch_runner")
+
+        answers: Dict[str, str] = {}
+        pending: Dict[str, Dict[str, Any]] = {}
+        # which stage and document each call is recorded under
+        tags: Dict[str, Dict[str, Any]] = {}
+        validators: Dict[str, Optional[Callable[[str], Any]]] = {}
+        for custom_id, call in calls.items():
+            call = {**call, "model": call.get("model") or self.model}
+            tags[custom_id] = {"stage": call.pop("stage", "other"), "document": call.pop("document", None)}
+            validators[custom_id] = call.pop("validate", None)
+            if self.cache:
+                cached = await self.cache.get(self.call_cache_key(call))
+                if cached is not None and self.usable(cached, validators[custom_id]):
+                    self.usage.append(CallUsage(model=call["model"], cached=True, **tags[custom_id]))
+                    answers[custom_id] = cached
+                    continue
+            pending[custom_id] = call
+
+        messages = await self.batch_runner.run(name, {
+            custom_id: self.build_request(**call)
+            for custom_id, call in pending.items()
+        })
+        for custom_id, call in pending.items():
+            message = messages.get(custom_id)
+            if message is not None:
+                self.usage.append(CallUsage.from_response(call["model"], message, batched=True, **tags[custom_id]))
+            if message is None or not self.usable(message.content[0].text, validators[custom_id]):
+                answers[custom_id] = await self.generate(
+                    **call, stage=tags[custom_id]["stage"], validate=validators[custom_id]
+                )
+                self.usage[-1].document = tags[custom_id]["document"]
+                continue
+            answers[custom_id] = message.content[0].text
+            if self.cache:
+                await self.cache.set(self.call_cache_key(call), answers[custom_id])
+        return answers
+
+    def call_cache_key(self, call: Dict[str, Any]) -> str:
+        return cache_key(
+            call["model"],
+            call["prompt"],
+            call.get("image"),
+            call.get("max_tokens", 8000),
+            call.get("temperature", 0),
+            call.get("system"),
+        )
 
     def clean_json_response(self, response_text: str) -> str:
         """Clean and extract JSON from response text"""
@@ -187,78 +527,127 @@ class OmEngine:
                 return default_value
             raise
 
-    @async_retry(retries=2, delay=1.0, backoff=2.0)
+    @async_retry(retries=2, delay=1.0, backoff=2.0, exceptions=RESPONSE_ERRORS)
     async def screen_page(self, text: str) -> PageContent:
         """Screen a page for relevance with retries"""
+        verdict = functools.partial(self.screening_verdict, text)
         response_text = await self.generate(
             PAGE_SCREENING_PROMPT.format(text=text),
-            max_tokens=PAGE_SCREENING_MAX_TOKENS
+            system=PAGE_SCREENING_SYSTEM,
+            max_tokens=PAGE_SCREENING_MAX_TOKENS,
+            model=self.models.screening,
+            stage="screening",
+            validate=verdict
         )
-        
-        # Parse response with default empty screening result
-        response = self.parse_json_response(response_text, {
-            "is_relevant": False,
-            "confidence": 0.0,
-            "reason": "failed-to-parse"
-        })
+        return verdict(response_text)
 
+    def screening_verdict(self, text: str, response_text: str) -> PageContent:
+        """Build a screened page from a model answer, raising if it isn't a verdict"""
+        return self.page_from_verdict(text, self.parse_json_response(response_text))
+
+    def page_from_verdict(self, text: str, verdict: Dict[str, Any]) -> PageContent:
+        """Build a screened page from a model verdict"""
         # TODO: maybe i should just make this binary 
         page = PageContent(
             text=text,
             image=None,
-            is_relevant=response["is_relevant"] and response["confidence"] > 0.7,
-            reason=response["reason"]
+            is_relevant=verdict["is_relevant"] and verdict["confidence"] > 0.7,
+            reason=verdict["reason"]
         )
         return page
 
-    @async_retry(retries=2, delay=1.0, backoff=2.0)
-    async def detect_and_extract_tables(self, text: str, image: Optional[bytes], context: DocumentContext) -> None:
-        """Extract and normalize tables from text and image with retries"""
-        
-        response_text = ""  # Initialize response_text
+    async def screen_batch(self, texts: List[str]) -> List[PageContent]:
+        """Screen several pages in one request, falling back to per-page calls if the reply is malformed"""
+        if len(texts) == 1:
+            return [await self.screen_page(texts[0])]
+
+        pages = "\n\n".join(
+            f"--- Page {i} ---\n{truncate_text(text, SCREENING_PAGE_CHAR_LIMIT)}"
+            for i, text in enumerate(texts, start=1)
+        )
+
+        def screened(response_text: str) -> List[PageContent]:
+            verdicts = self.parse_json_response(response_text)
+            if not isinstance(verdicts, list) or len(verdicts) != len(texts):
+                raise ValueError("batch screening returned the wrong number of verdicts")
+            verdicts = sorted(verdicts, key=lambda verdict: int(verdict["page"]))
+            if [int(verdict["page"]) for verdict in verdicts] != list(range(1, len(texts) + 1)):
+                raise ValueError("batch screening returned unexpected page numbers")
+            return [
+                self.page_from_verdict(text, verdict)
+                for text, verdict in zip(texts, verdicts)
+            ]
+
         try:
-            # First try with a larger context window for complete extraction
             response_text = await self.generate(
-                TABLE_DETECTION_PROMPT.format(
-                    text=text,
-                    known_tables=list(context.tables.keys())
-                ),
-                image=image,
-                max_tokens=TABLE_DETECTION_MAX_TOKENS
+                BATCH_SCREENING_PROMPT.format(page_count=len(texts), pages=pages),
+                system=BATCH_SCREENING_SYSTEM,
+                max_tokens=BATCH_SCREENING_MAX_TOKENS_PER_PAGE * len(texts),
+                model=self.models.screening,
+                stage="screening",
+                validate=screened
             )
-            
-            
-            # Parse response with empty dict as default
-            response = self.parse_json_response(response_text, default_value={})
-            
-            if not response:
-                return
-            
-            for table_type, data in response.items():
-                if table_type not in context.tables:
-                    context.tables[table_type] = []
-                
-                if isinstance(data, list):
-                    context.tables[table_type].extend(data)
-            
-        except Exception as e:
-            raise
-
+            return screened(response_text)
+        except RESPONSE_ERRORS:
+            return list(await asyncio.gather(*(self.screen_page(text) for text in texts)))
 
-
-    @async_retry(retries=2, delay=1.0, backoff=2.0)
     async def update_summary(self, text: str, context: DocumentContext) -> None:
-        """Update running summary with new information with retries"""
+        """Update running summary with new information"""
         context.running_summary = await self.generate(
             SUMMARY_UPDATE_PROMPT.format(
                 current_summary=context.running_summary,
                 new_text=text
             ),
-            max_tokens=SUMMARY_UPDATE_MAX_TOKENS
+            system=SUMMARY_UPDATE_SYSTEM,
+            max_tokens=SUMMARY_UPDATE_MAX_TOKENS,
+            model=self.models.summary,
+            stage="summary"
         )
 
-    async def process_chunk(self, pages: List[PageContent], context: DocumentContext) -> None:
-        """Process a chunk of pages for metadata, tables, and summary"""
+    def summary_inputs(self, text: Optional[str]) -> List[str]:
+        """Split a chunk's relevant text into pieces that fit a summary call's budget"""
+        if not text:
+            return []
+        return self.split_page_text(text, SUMMARY_INPUT_TOKEN_BUDGET * 4)
+
+    async def summarize_chunk(self, text: str) -> str:
+        """Summarize one chunk's relevant text on its own, for map-reduce summaries"""
+        return await self.generate(
+            CHUNK_SUMMARY_PROMPT.format(text=text),
+            system=CHUNK_SUMMARY_SYSTEM,
+            max_tokens=SUMMARY_UPDATE_MAX_TOKENS,
+            model=self.models.summary,
+            stage="summary"
+        )
+
+    async def combine_summaries(self, summaries: List[str]) -> str:
+        """Combine summaries of consecutive sections into one"""
+        return await self.generate(
+            self.summary_reduce_prompt(summaries),
+            system=SUMMARY_REDUCE_SYSTEM,
+            max_tokens=SUMMARY_UPDATE_MAX_TOKENS,
+            model=self.models.summary,
+            stage="summary"
+        )
+
+    def summary_reduce_prompt(self, summaries: List[str]) -> str:
+        return SUMMARY_REDUCE_PROMPT.format(summaries="\n\n".join(
+            f"--- Section {i} ---\n{summary}"
+            for i, summary in enumerate(summaries, start=1)
+        ))
+
+    async def reduce_summaries(self, summaries: List[str]) -> str:
+        """Combine chunk summaries level by level, SUMMARY_REDUCE_FAN_IN at a time"""
+        async def combine(group: List[str]) -> str:
+            return await self.combine_summaries(group) if len(group) > 1 else group[0]
+
+        summaries = [summary for summary in summaries if summary]
+        while len(summaries) > 1:
+            summaries = await asyncio.gather(*(combine(group) for group in reduce_groups(summaries)))
+        return summaries[0] if summaries else ""
+
+    async def process_chunk(self, pages: List[PageContent], context: DocumentContext) -> Optional[str]:
+        """Process a chunk of pages for metadata and tables, returning its relevant text"""
         # Combine text from relevant pages
         relevant_pages = [
             page for page in pages 
@@ -266,78 +655,195 @@ class OmEngine:
         ]
         
         if not relevant_pages:
-            return
+            return None
             
         relevant_text = "\n".join(page.text for page in relevant_pages)
-        # Collect all images from relevant pages
-        relevant_images = [page.image for page in relevant_pages if page.image]
-        
-        # Process tables in smaller chunks if text is large
-        if len(relevant_text) > TEXT_CHUNK_SIZE:
-            chunks = self.split_text_into_chunks(relevant_text, TEXT_CHUNK_SIZE)
-            for i, chunk in enumerate(chunks):
-                # Use corresponding images for each chunk if available
-                chunk_images = relevant_images[i:i+1] if i < len(relevant_images) else []
-                await self.process_chunk_data(chunk, chunk_images, context)
-        else:
-            await self.process_chunk_data(relevant_text, relevant_images, context)
+        for text, images in self.chunk_inputs(relevant_pages):
+            await self.process_chunk_data(text, images, context)
+
+        return relevant_text
+
+    def page_tokens(self, page: PageContent) -> int:
+        """Estimated input tokens of a page sent to the model, its text and image"""
+        return estimate_tokens(page.text) + (IMAGE_TOKEN_ESTIMATE if page.image else 0)
+
+    def starts_chunk(self, chunk: List[PageContent], chunk_tokens: int, page: PageContent) -> bool:
+        """Whether the next screened `page` opens a new chunk rather than joining `chunk`
+
+        Relevant pages fill a chunk up to EXTRACTION_INPUT_TOKEN_BUDGET; irrelevant
+        ones cost nothing, but no chunk spans more than CHUNK_PAGE_LIMIT pages.
+        """
+        if not chunk:
+            return False
+        if len(chunk) >= CHUNK_PAGE_LIMIT:
+            return True
+        return (
+            page.is_relevant
+            and chunk_tokens > 0
+            and chunk_tokens + self.page_tokens(page) > EXTRACTION_INPUT_TOKEN_BUDGET
+        )
+
+    def pack_chunks(self, pages: List[PageContent]) -> List[List[PageContent]]:
+        """Group a document's screened pages into chunks, see `starts_chunk`"""
+        chunks: List[List[PageContent]] = []
+        chunk: List[PageContent] = []
+        chunk_tokens = 0
+        for page in pages:
+            if self.starts_chunk(chunk, chunk_tokens, page):
+                chunks.append(chunk)
+                chunk, chunk_tokens = [], 0
+            chunk.append(page)
+            chunk_tokens += self.page_tokens(page) if page.is_relevant else 0
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def pack_summary_texts(self, texts: List[str]) -> List[str]:
+        """Join consecutive chunks' relevant text into summary inputs up to SUMMARY_INPUT_TOKEN_BUDGET"""
+        packed: List[str] = []
+        current: List[str] = []
+        tokens = 0
+        for text in texts:
+            if current and tokens + estimate_tokens(text) > SUMMARY_INPUT_TOKEN_BUDGET:
+                packed.append("\n".join(current))
+                current, tokens = [], 0
+            current.append(text)
+            tokens += estimate_tokens(text)
+        if current:
+            packed.append("\n".join(current))
+        return [piece for text in packed for piece in self.summary_inputs(text)]
+
+    def chunk_inputs(
+        self,
+        relevant_pages: List[PageContent],
+        token_budget: int = EXTRACTION_INPUT_TOKEN_BUDGET
+    ) -> List[Tuple[str, List[bytes]]]:
+        """Pack the relevant pages of a chunk into (text, images) model inputs
+
+        Consecutive whole pages share an input while their estimated tokens, text
+        and images, fit the budget, and every page's text travels with its own
+        image. A page over budget on its own is split on paragraph and line
+        boundaries, each piece sent with that page's image.
+        """
+        inputs = []
+        texts: List[str] = []
+        images: List[bytes] = []
+        tokens = 0
+        for page in relevant_pages:
+            page_images = [page.image] if page.image else []
+            image_tokens = IMAGE_TOKEN_ESTIMATE * len(page_images)
+            page_tokens = self.page_tokens(page)
+            if texts and tokens + page_tokens > token_budget:
+                inputs.append(("\n".join(texts), images))
+                texts, images, tokens = [], [], 0
+            if page_tokens > token_budget:
+                text_chars = max(token_budget - image_tokens, 1) * 4
+                inputs.extend((piece, page_images) for piece in self.split_page_text(page.text, text_chars))
+                continue
+            texts.append(page.text)
+            images.extend(page_images)
+            tokens += page_tokens
+        if texts:
+            inputs.append(("\n".join(texts), images))
+        return inputs
+
+    def split_page_text(self, text: str, chunk_size: int) -> List[str]:
+        """Split one page's text on blank lines, so tables stay whole, falling back to single lines"""
+        chunks = []
+        current = ""
+        for block in text.split("\n\n"):
+            pieces = [block] if len(block) <= chunk_size else self.split_text_into_chunks(block, chunk_size)
+            for piece in pieces:
+                if current and len(current) + len(piece) + 2 > chunk_size:
+                    chunks.append(current)
+                    current = ""
+                current = f"{current}\n\n{piece}" if current else piece
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def merge_metadata(self, metadata: Dict[str, Any], context: DocumentContext) -> None:
+        """Fill in metadata fields the context doesn't have yet"""
+        if not context.title:
+            context.title = metadata.get("title")
+        if not context.address:
+            context.address = metadata.get("address")
+        if not context.description:
+            context.description = metadata.get("description")
+        if not context.square_feet:
+            context.square_feet = metadata.get("square_feet")
+        if not context.total_units:
+            context.total_units = metadata.get("total_units")
+        if not context.property_type:
+            context.property_type = metadata.get("property_type")
 
-        await self.update_summary(relevant_text, context)
+    def merge_tables(self, tables: Dict[str, Any], context: DocumentContext) -> None:
+        """Append extracted table rows to the context"""
+        for table_type, data in tables.items():
+            if isinstance(data, list):
+                if table_type not in context.tables:
+                    context.tables[table_type] = []
+                context.tables[table_type].extend(data)
 
     async def process_chunk_data(self, text: str, images: List[bytes], context: DocumentContext) -> None:
-        """Process both tables and metadata from a chunk of text and its images"""
-        # Process each image with both metadata and table detection
-        for image in images:
-            # Try to extract metadata if needed
-            if not (context.title and context.address and context.description):
-                metadata_response = await self.generate(
-                    METADATA_PROMPT.format(text=text),
-                    image=image,
-                    max_tokens=METADATA_MAX_TOKENS
-                )
-                try:
-                    metadata = self.parse_json_response(metadata_response)
-                    if not context.title:
-                        context.title = metadata.get("title")
-                    if not context.address:
-                        context.address = metadata.get("address")
-                    if not context.description:
-                        context.description = metadata.get("description")
-                    if not context.square_feet:
-                        context.square_feet = metadata.get("square_feet")
-                    if not context.total_units:
-                        context.total_units = metadata.get("total_units")
-                    if not context.property_type:
-                        context.property_type = metadata.get("property_type")
-                except Exception as e:
-                    raise
-
-            # Extract tables
-            table_response = await self.generate(
-                TABLE_DETECTION_PROMPT.format(
+        """Process both tables and metadata from text and the images of the pages it came from"""
+        # metadata rides along with the tables until the context has it
+        if not self.metadata_complete(context):
+            extraction = await self.generate(
+                EXTRACTION_PROMPT.format(
                     text=text,
                     known_tables=list(context.tables.keys())
                 ),
-                image=image,
-                max_tokens=TABLE_DETECTION_MAX_TOKENS
+                system=EXTRACTION_SYSTEM,
+                image=images,
+                max_tokens=EXTRACTION_MAX_TOKENS,
+                model=self.models.tables,
+                stage="tables"
             )
-            
-            try:
-                tables = self.parse_json_response(table_response, default_value={})
-                for table_type, data in tables.items():
-                    if isinstance(data, list):
-                        if table_type not in context.tables:
-                            context.tables[table_type] = []
-                        context.tables[table_type].extend(data)
-                
-            except Exception as e:
-                raise
+            self.merge_extraction(extraction, context)
+            return
+
+        table_response = await self.generate(
+            TABLE_DETECTION_PROMPT.format(
+                text=text,
+                known_tables=list(context.tables.keys())
+            ),
+            system=TABLE_DETECTION_SYSTEM,
+            image=images,
+            max_tokens=TABLE_DETECTION_MAX_TOKENS,
+            model=self.models.tables,
+            stage="tables"
+        )
+        
+        self.merge_tables(self.parse_json_response(table_response, default_value={}), context)
+
+    def metadata_complete(self, context: DocumentContext) -> bool:
+        return bool(context.title and context.address and context.description)
+
+    def metadata_answer(self, response_text: str) -> Dict[str, Any]:
+        """The metadata in a model answer, raising if it isn't a JSON object"""
+        metadata = self.parse_json_response(response_text)
+        if not isinstance(metadata, dict):
+            raise ValueError("metadata answer is not a JSON object")
+        return metadata
+
+    def merge_extraction(self, response_text: str, context: DocumentContext) -> None:
+        """Fill the context from a combined metadata and tables response"""
+        extraction = self.parse_json_response(response_text, default_value={})
+        if not isinstance(extraction, dict):
+            return
+        metadata = extraction.get("metadata")
+        if isinstance(metadata, dict):
+            self.merge_metadata(metadata, context)
+        tables = extraction.get("tables")
+        if isinstance(tables, dict):
+            self.merge_tables(tables, context)
 
     def split_text_into_chunks(self, text: str, chunk_size: int = TEXT_CHUNK_SIZE) -> List[str]:
         """Split text into chunks while trying to maintain table integrity"""
         chunks = []
         lines = text.split('\n')
-        current_chunk = []
+        current_chunk: List[str] = []
         current_size = 0
         
         for line in lines:
@@ -354,40 +860,334 @@ class OmEngine:
             
         return chunks
 
-    async def process_pdf(self, pdf_stream: BinaryIO):
-        """Process a PDF document and extract structured data"""
-        total_pages = 0
-        try:
-            context = DocumentContext()
-            current_chunk: List[PageContent] = []
-            
-            page_count = 0
-            
-            async for text, image, tp in extract_pdf(pdf_stream):
-                total_pages = tp
-                page_count += 1
-                # Emit progress update
+    def run_prescreen(self, text: str) -> PrescreenResult:
+        """Pre-screen a page locally, counting it in prescreen_stats"""
+        if not self.prescreen:
+            return PrescreenResult(PrescreenVerdict.AMBIGUOUS, "")
+        result = prescreen_page(text)
+        self.prescreen_stats.pages += 1
+        if result.verdict == PrescreenVerdict.RELEVANT:
+            self.prescreen_stats.skipped_relevant += 1
+        elif result.verdict == PrescreenVerdict.IRRELEVANT:
+            self.prescreen_stats.skipped_irrelevant += 1
+        return result
+
+    def screened_page(
+        self,
+        page: PageContent,
+        prescreen: PrescreenResult,
+        verdict: Optional[PageContent]
+    ) -> PageContent:
+        """Settle a page from its pre-screen result, or the model verdict if the pre-screen couldn't"""
+        if prescreen.verdict == PrescreenVerdict.AMBIGUOUS:
+            if verdict is None:
+                raise ValueError("an ambiguous page needs the model's verdict")
+            result = verdict
+        else:
+            result = PageContent(
+                text=page.text,
+                image=None,
+                is_relevant=prescreen.verdict == PrescreenVerdict.RELEVANT,
+                reason=f"prescreen: {prescreen.reason}"
+            )
+            if verdict is not None:
+                self.prescreen_stats.audited += 1
+                self.prescreen_stats.agreed += verdict.is_relevant == result.is_relevant
+        result.page_number = page.page_number
+        return result
+
+    async def render_relevant(self, pages: List[PageContent], screened: List[PageContent]) -> None:
+        """Rasterize the pages screened relevant, all at once over the render pool
+
+        Only pages that will be sent to the model are ever rasterized.
+        """
+        async def render(result: PageContent, image_source: PageImage) -> None:
+            result.image = await image_source.render()
+
+        await asyncio.gather(*(
+            render(result, page.image_source)
+            for page, result in zip(pages, screened)
+            if result.is_relevant and page.image_source
+        ))
+
+    async def _extract_stage(
+        self,
+        pdf_stream: BinaryIO,
+        pages_out: asyncio.Queue,
+        progress: PipelineProgress
+    ) -> None:
+        """Pipeline stage: pull page text and lazy image handles out of the PDF"""
+        page_range = (progress.first_page, progress.last_page) if progress.last_page else None
+        page_number = progress.first_page - 1
+        async for text, image_source, total_pages in extract_pdf(
+            pdf_stream, self.render_service, self.image_profile, page_range
+        ):
+            progress.total_pages = total_pages
+            page_number += 1
+            # already covered by a checkpoint from an earlier attempt
+            if page_number <= progress.resumed_from:
+                continue
+            await pages_out.put(PageContent(
+                text=text,
+                image=None,
+                image_source=image_source,
+                page_number=page_number
+            ))
+        await pages_out.put(None)
+
+    async def _screen_stage(
+        self,
+        pages_in: asyncio.Queue,
+        chunks_out: asyncio.Queue,
+        progress: PipelineProgress,
+        tg: asyncio.TaskGroup
+    ) -> None:
+        """Pipeline stage: screen pages concurrently and regroup them into ordered chunks"""
+        # screening tasks in page order, so chunks come out in page order
+        screening: asyncio.Queue = asyncio.Queue()
+        # a batch holds its slot until its pages are handed to the table stage, so
+        #  screening and rendering never run more than this far ahead of extraction
+        slots = asyncio.Semaphore(self.screening_concurrency)
+
+        async def screen(batch: List[Tuple[PageContent, PrescreenResult]]) -> List[PageContent]:
+            # pages the pre-screen settled only go to the model when auditing it
+            to_model = [
+                i for i, (_, prescreen) in enumerate(batch)
+                if prescreen.verdict == PrescreenVerdict.AMBIGUOUS or self.prescreen_audit
+            ]
+            verdicts = dict(zip(to_model, await self.screen_batch(
+                [batch[i][0].text for i in to_model]
+            ))) if to_model else {}
+
+            screened = [
+                self.screened_page(page, prescreen, verdicts.get(i))
+                for i, (page, prescreen) in enumerate(batch)
+            ]
+
+            await self.render_relevant([page for page, _ in batch], screened)
+            for _ in screened:
+                progress.screened += 1
                 await self.emit_progress(ProgressEvent(
                     status=OmStatus.PROCESSING,
-                    current_page=page_count,
-                    total_pages=total_pages,
+                    current_page=progress.screened,
+                    total_pages=progress.total_pages,
+                ))
+            return screened
+
+        async def submit(batch: List[Tuple[PageContent, PrescreenResult]]) -> None:
+            await slots.acquire()
+            screening.put_nowait(tg.create_task(screen(batch)))
+
+        async def dispatch() -> None:
+            # group pages into batches bounded by page count and estimated input tokens
+            #  of the pages that actually go to the model
+            batch: List[Tuple[PageContent, PrescreenResult]] = []
+            batch_pages = 0
+            batch_tokens = 0
+            while (page := await pages_in.get()) is not None:
+                result = self.run_prescreen(page.text)
+                to_model = result.verdict == PrescreenVerdict.AMBIGUOUS or self.prescreen_audit
+                tokens = estimate_tokens(truncate_text(page.text, SCREENING_PAGE_CHAR_LIMIT)) if to_model else 0
+                if batch and (
+                    batch_pages >= self.screening_batch_size
+                    or batch_tokens + tokens > self.screening_batch_tokens
+                    or len(batch) >= max(self.screening_batch_size, SCREENING_BATCH_PAGE_LIMIT)
+                ):
+                    await submit(batch)
+                    batch, batch_pages, batch_tokens = [], 0, 0
+                batch.append((page, result))
+                batch_pages += to_model
+                batch_tokens += tokens
+            if batch:
+                await submit(batch)
+            screening.put_nowait(None)
+
+        tg.create_task(dispatch())
+
+        chunk: List[PageContent] = []
+        chunk_tokens = 0
+        while (task := await screening.get()) is not None:
+            for page in await task:
+                if self.starts_chunk(chunk, chunk_tokens, page):
+                    await chunks_out.put(chunk)
+                    chunk, chunk_tokens = [], 0
+                chunk.append(page)
+                chunk_tokens += self.page_tokens(page) if page.is_relevant else 0
+            slots.release()
+        if chunk:
+            await chunks_out.put(chunk)
+        await chunks_out.put(None)
+
+    async def _table_stage(
+        self,
+        chunks_in: asyncio.Queue,
+        results_out: asyncio.Queue,
+        context: DocumentContext
+    ) -> None:
+        """Pipeline stage: extract metadata and tables, one chunk at a time so merges stay in page order"""
+        while (chunk := await chunks_in.get()) is not None:
+            relevant_text = await self.process_chunk(chunk, context)
+            await results_out.put(ChunkResult(
+                last_page=chunk[-1].page_number,
+                relevant_text=relevant_text,
+                metadata=context.metadata(),
+                table_rows={table_type: len(rows) for table_type, rows in context.tables.items()},
+            ))
+        await results_out.put(None)
+
+    async def _summary_stage(
+        self,
+        results_in: asyncio.Queue,
+        context: DocumentContext,
+        checkpoint: CheckpointStore | None,
+        tg: asyncio.TaskGroup
+    ) -> None:
+        """Pipeline stage: summarize each chunk's relevant text, then checkpoint
+
+        In running mode each chunk is folded into the running summary in turn; in
+        map-reduce mode chunks are summarized concurrently and the summaries are
+        reduced once the whole document is through.
+        """
+        if self.summary_mode == SummaryMode.RUNNING:
+            async for result, text, pending in self.summary_units(results_in, context.pending_summary):
+                for piece in self.summary_inputs(text):
+                    await self.update_summary(piece, context)
+                context.pending_summary = pending
+                if result:
+                    await self.save_checkpoint(checkpoint, result, context)
+            return
+
+        # summary tasks in chunk order, so a checkpoint only ever covers finished chunks
+        summarizing: asyncio.Queue = asyncio.Queue()
+
+        async def summarize(text: str) -> List[str]:
+            try:
+                return await asyncio.gather(*(
+                    self.summarize_chunk(piece) for piece in self.summary_inputs(text)
                 ))
-                
-                page = await self.screen_page(text)
-                page.image = image
-                current_chunk.append(page)
-                
-                if len(current_chunk) >= CHUNK_PAGE_LIMIT:
-                    await self.process_chunk(current_chunk, context)
-                    current_chunk = []
-            if current_chunk:
-                await self.process_chunk(current_chunk, context)
+            finally:
+                self.summary_semaphore.release()
+
+        async def dispatch() -> None:
+            async for result, text, pending in self.summary_units(results_in, context.pending_summary):
+                task = None
+                if text:
+                    await self.summary_semaphore.acquire()
+                    task = tg.create_task(summarize(text))
+                summarizing.put_nowait((result, task, pending))
+            summarizing.put_nowait(None)
+
+        tg.create_task(dispatch())
+        while (item := await summarizing.get()) is not None:
+            result, task, pending = item
+            if task:
+                context.chunk_summaries.extend(await task)
+            context.pending_summary = pending
+            if result:
+                await self.save_checkpoint(checkpoint, result, context)
+
+    async def summary_units(
+        self,
+        results_in: asyncio.Queue,
+        pending: str
+    ) -> AsyncIterator[Tuple[Optional[ChunkResult], Optional[str], str]]:
+        """Consecutive chunks' relevant text, packed up to SUMMARY_INPUT_TOKEN_BUDGET
+
+        Yields each finished chunk with the text ready to summarize, if any, and the
+        text held back for later chunks -- which a checkpoint after the chunk keeps.
+        What is still held at the end comes last, with no chunk.
+        """
+        texts = [pending] if pending else []
+        tokens = estimate_tokens(pending) if pending else 0
+        while (result := await results_in.get()) is not None:
+            text_tokens = estimate_tokens(result.relevant_text) if result.relevant_text else 0
+            ready = None
+            if texts and tokens + text_tokens > SUMMARY_INPUT_TOKEN_BUDGET:
+                ready = "\n".join(texts)
+                texts, tokens = [], 0
+            if result.relevant_text:
+                texts.append(result.relevant_text)
+                tokens += text_tokens
+            yield result, ready, "\n".join(texts)
+        if texts:
+            yield None, "\n".join(texts), ""
+
+    async def save_checkpoint(
+        self,
+        checkpoint: CheckpointStore | None,
+        result: ChunkResult,
+        context: DocumentContext
+    ) -> None:
+        """Checkpoint the document as it stood after the chunk in `result`"""
+        if not checkpoint:
+            return
+        await checkpoint.save(asdict(DocumentContext(
+            **result.metadata,
+            running_summary=context.running_summary,
+            tables={
+                table_type: context.tables[table_type][:rows]
+                for table_type, rows in result.table_rows.items()
+            },
+            current_page=result.last_page,
+            chunk_summaries=list(context.chunk_summaries),
+            pending_summary=context.pending_summary,
+        )))
+
+    async def process_pdf(
+        self,
+        pdf_stream: BinaryIO,
+        checkpoint: CheckpointStore | None = None,
+        page_range: Tuple[int, int] | None = None
+    ):
+        """Process a PDF document and extract structured data
+
+        The work is split into stages joined by bounded queues -- PDF extraction,
+        page screening, metadata/table extraction and summary updates -- so later
+        pages are screened while earlier chunks are still being extracted.
+
+        If a checkpoint store is given, the document context is saved after every
+        chunk and a later call resumes after the last completed chunk.
+
+        With a `page_range` (first, last -- 1-indexed, inclusive) only those pages
+        are processed and map-reduce summaries are left unreduced, so the partial
+        contexts of a split document can be combined with `merge_contexts`.
+
+        Calls, tokens, retries and latency per stage end up in `stats`, whether
+        or not processing succeeds.
+        """
+        progress = PipelineProgress()
+        if page_range:
+            progress.first_page, progress.last_page = page_range
+        self.prescreen_stats = PrescreenStats()
+        self.usage = []
+        start = time.monotonic()
+        try:
+            saved = await checkpoint.load() if checkpoint else None
+            context = DocumentContext(**saved) if saved else DocumentContext()
+            progress.resumed_from = context.current_page
+            progress.screened = max(context.current_page - progress.first_page + 1, 0)
+
+            pages: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            chunks: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            results: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    tg.create_task(self._extract_stage(pdf_stream, pages, progress))
+                    tg.create_task(self._screen_stage(pages, chunks, progress, tg))
+                    tg.create_task(self._table_stage(chunks, results, context))
+                    tg.create_task(self._summary_stage(results, context, checkpoint, tg))
+            except ExceptionGroup as eg:
+                # surface the first failure rather than the group
+                raise eg.exceptions[0]
+            if self.summary_mode == SummaryMode.MAP_REDUCE and not page_range:
+                context.running_summary = await self.reduce_summaries(context.chunk_summaries)
+            context.current_page = progress.end_page
             
             # Emit completion status
             await self.emit_progress(ProgressEvent(
                 status=OmStatus.PROCESSED,
-                current_page=total_pages,
-                total_pages=total_pages,
+                current_page=progress.end_page,
+                total_pages=progress.total_pages,
             ))
             
             return context
@@ -396,8 +1196,225 @@ class OmEngine:
             # Emit error status
             await self.emit_progress(ProgressEvent(
                 status=OmStatus.FAILED,
-                current_page=page_count,
-                total_pages=total_pages,
+                current_page=progress.screened,
+                total_pages=progress.total_pages,
                 error=str(e)
             ))
             raise
+        finally:
+            self.stats = DocumentStats.from_usage(
+                self.usage,
+                self.prescreen_stats,
+                pages=progress.pages,
+                wall_seconds=time.monotonic() - start,
+            )
+
+    async def merge_contexts(self, parts: List[DocumentContext]) -> DocumentContext:
+        """Combine the partial contexts of consecutive page ranges of one document
+
+        Metadata comes from the earliest part that has it, table rows are joined
+        in page order, and the parts' summaries are reduced into one.
+        """
+        self.usage = []
+        start = time.monotonic()
+        context = DocumentContext()
+        for part in parts:
+            self.merge_metadata(part.metadata(), context)
+            self.merge_tables(part.tables, context)
+            # running-mode parts carry one summary of their own
+            context.chunk_summaries.extend(
+                part.chunk_summaries or ([part.running_summary] if part.running_summary else [])
+            )
+            context.current_page = max(context.current_page, part.current_page)
+        try:
+            context.running_summary = await self.reduce_summaries(context.chunk_summaries)
+        finally:
+            self.stats = DocumentStats.from_usage(self.usage, wall_seconds=time.monotonic() - start)
+        return context
+
+    async def process_pdfs_batch(self, pdf_streams: Sequence[BinaryIO]) -> List[DocumentContext]:
+        """Process PDFs through the message batch API, for backfills where cost matters more than latency
+
+        Work runs in rounds, each submitted as one batch covering every document:
+        page screening; tables, per-chunk summaries and metadata from each
+        document's first relevant chunk; metadata from later chunks where still
+        missing; and then the chunk summaries, reduced a level per round. All
+        pages and requests of a round are held in memory, so callers bound how
+        many documents go into one call (see OM_BATCH_SIZE).
+
+        Per-document stats end up in `batch_stats`, and the whole run's in `stats`.
+        """
+        self.prescreen_stats = PrescreenStats()
+        self.usage = []
+        start = time.monotonic()
+
+        documents: List[List[PageContent]] = []
+        for pdf_stream in pdf_streams:
+            pages: List[PageContent] = []
+            async for text, image_source, _ in extract_pdf(pdf_stream, self.render_service, self.image_profile):
+                pages.append(PageContent(
+                    text=text,
+                    image=None,
+                    image_source=image_source,
+                    page_number=len(pages) + 1
+                ))
+            documents.append(pages)
+
+        # screening
+        prescreened: Dict[Tuple[int, int], PrescreenResult] = {}
+        calls = {}
+        for d, pages in enumerate(documents):
+            for page in pages:
+                prescreen = prescreened[d, page.page_number] = self.run_prescreen(page.text)
+                if prescreen.verdict == PrescreenVerdict.AMBIGUOUS or self.prescreen_audit:
+                    calls[f"screen-{d}-{page.page_number}"] = dict(
+                        prompt=PAGE_SCREENING_PROMPT.format(text=page.text),
+                        system=PAGE_SCREENING_SYSTEM,
+                        max_tokens=PAGE_SCREENING_MAX_TOKENS,
+                        model=self.models.screening,
+                        stage="screening",
+                        document=d,
+                        validate=functools.partial(self.screening_verdict, page.text)
+                    )
+        answers = await self.generate_batch("screening", calls)
+
+        # relevant pages of every chunk, rendered, in page order
+        chunks: List[List[List[PageContent]]] = []
+        for d, pages in enumerate(documents):
+            screened = []
+            for page in pages:
+                answer = answers.get(f"screen-{d}-{page.page_number}")
+                verdict = self.screening_verdict(page.text, answer) if answer is not None else None
+                screened.append(self.screened_page(page, prescreened[d, page.page_number], verdict))
+            await self.render_relevant(pages, screened)
+            chunks.append([
+                relevant
+                for chunk in self.pack_chunks(screened)
+                if (relevant := [page for page in chunk if page.is_relevant])
+            ])
+
+        def metadata_calls(d: int, c: int) -> Dict[str, Dict[str, Any]]:
+            return {
+                f"metadata-{d}-{c}-{i}": dict(
+                    prompt=METADATA_PROMPT.format(text=text),
+                    system=METADATA_SYSTEM,
+                    image=images,
+                    max_tokens=METADATA_MAX_TOKENS,
+                    model=self.models.metadata,
+                    stage="metadata",
+                    document=d,
+                    validate=self.metadata_answer
+                )
+                for i, (text, images) in enumerate(self.chunk_inputs(chunks[d][c]))
+            }
+
+        def merge_metadata_answers(d: int, c: int, answers: Dict[str, str], context: DocumentContext) -> None:
+            for custom_id in metadata_calls(d, c):
+                if self.metadata_complete(context):
+                    return
+                metadata = self.parse_json_response(answers[custom_id], default_value={})
+                if isinstance(metadata, dict):
+                    self.merge_metadata(metadata, context)
+
+        # tables and chunk summaries, with metadata extracted alongside the tables of the first chunk
+        calls = {}
+        for d, document_chunks in enumerate(chunks):
+            for c, relevant_pages in enumerate(document_chunks):
+                for i, (text, images) in enumerate(self.chunk_inputs(relevant_pages)):
+                    calls[f"tables-{d}-{c}-{i}"] = dict(
+                        prompt=(EXTRACTION_PROMPT if c == 0 else TABLE_DETECTION_PROMPT).format(
+                            text=text,
+                            known_tables=[]
+                        ),
+                        system=EXTRACTION_SYSTEM if c == 0 else TABLE_DETECTION_SYSTEM,
+                        image=images,
+                        max_tokens=EXTRACTION_MAX_TOKENS if c == 0 else TABLE_DETECTION_MAX_TOKENS,
+                        model=self.models.tables,
+                        stage="tables",
+                        document=d
+                    )
+            relevant_texts = ["\n".join(page.text for page in relevant_pages) for relevant_pages in document_chunks]
+            for k, text in enumerate(self.pack_summary_texts(relevant_texts)):
+                calls[f"summary-{d}-{k}"] = dict(
+                    prompt=CHUNK_SUMMARY_PROMPT.format(text=text),
+                    system=CHUNK_SUMMARY_SYSTEM,
+                    max_tokens=SUMMARY_UPDATE_MAX_TOKENS,
+                    model=self.models.summary,
+                    stage="summary",
+                    document=d
+                )
+        answers = await self.generate_batch("extraction", calls)
+
+        contexts = [DocumentContext(current_page=len(pages)) for pages in documents]
+        for d, (document_chunks, context) in enumerate(zip(chunks, contexts)):
+            for c, relevant_pages in enumerate(document_chunks):
+                for i in range(len(self.chunk_inputs(relevant_pages))):
+                    answer = answers[f"tables-{d}-{c}-{i}"]
+                    if c == 0:
+                        self.merge_extraction(answer, context)
+                    else:
+                        self.merge_tables(self.parse_json_response(answer, default_value={}), context)
+
+        # metadata the first chunk didn't have
+        incomplete = [d for d, context in enumerate(contexts) if not self.metadata_complete(context)]
+        metadata_answers = await self.generate_batch("metadata", {
+            custom_id: call
+            for d in incomplete
+            for c in range(1, len(chunks[d]))
+            for custom_id, call in metadata_calls(d, c).items()
+        })
+        for d in incomplete:
+            for c in range(1, len(chunks[d])):
+                merge_metadata_answers(d, c, metadata_answers, contexts[d])
+
+        # chunk summaries reduced a level per round, every document at once
+        summaries: List[List[str]] = []
+        for d, (document_chunks, context) in enumerate(zip(chunks, contexts)):
+            # cached answers come back first -- order by the index in the custom id
+            context.chunk_summaries = [
+                answers[custom_id] for custom_id in sorted(
+                    (custom_id for custom_id in answers if custom_id.startswith(f"summary-{d}-")),
+                    key=lambda custom_id: tuple(int(index) for index in custom_id.split("-")[2:])
+                )
+            ]
+            summaries.append([summary for summary in context.chunk_summaries if summary])
+        level = 0
+        while any(len(document_summaries) > 1 for document_summaries in summaries):
+            level += 1
+            groups = [reduce_groups(document_summaries) for document_summaries in summaries]
+            combined = await self.generate_batch(f"summary-{level}", {
+                f"summary-{d}-{g}": dict(
+                    prompt=self.summary_reduce_prompt(group),
+                    system=SUMMARY_REDUCE_SYSTEM,
+                    max_tokens=SUMMARY_UPDATE_MAX_TOKENS,
+                    model=self.models.summary,
+                    stage="summary",
+                    document=d
+                )
+                for d, document_groups in enumerate(groups)
+                for g, group in enumerate(document_groups)
+                if len(group) > 1
+            })
+            summaries = [
+                [combined.get(f"summary-{d}-{g}", group[0]) for g, group in enumerate(document_groups)]
+                for d, document_groups in enumerate(groups)
+            ]
+        for context, document_summaries in zip(contexts, summaries):
+            context.running_summary = document_summaries[0] if document_summaries else ""
+
+        wall_seconds = time.monotonic() - start
+        self.batch_stats = [
+            DocumentStats.from_usage(
+                [call for call in self.usage if call.document == d],
+                pages=len(pages),
+                wall_seconds=wall_seconds,
+            )
+            for d, pages in enumerate(documents)
+        ]
+        self.stats = DocumentStats.from_usage(
+            self.usage,
+            self.prescreen_stats,
+            pages=sum(len(pages) for pages in documents),
+            wall_seconds=wall_seconds,
+        )
+        return contexts
@@ -1,41 +1,284 @@
 from io import BytesIO
+import os
 import shutil
 import asyncio
-from typing import BinaryIO, AsyncGenerator, Tuple
+import math
+import multiprocessing
+import tempfile
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import AbstractSet, BinaryIO, AsyncGenerator, Dict, List, Optional, Tuple
 import PyPDF2
-from pdf2image import convert_from_bytes
+from PIL import Image
+from pdf2image import convert_from_path
 
-async def extract_pdf(pdf_stream: BinaryIO) -> AsyncGenerator[Tuple[str, bytes, int], None]:
-    """Extract text and images from PDF in parallel"""
-    pdf_stream.seek(0)
-    
-    if not shutil.which('pdftoppm'):
-        raise RuntimeError("Poppler is required but not installed.")
+# Number of pages whose text is extracted by a single pool task
+PAGE_TEXT_BATCH_SIZE = 8
+
+
+@dataclass(frozen=True)
+class ImageProfile:
+    """How page images are rasterized and encoded before being sent to the model"""
+    dpi: int = 150
+    # long edge in pixels; the model downscales anything larger, so sending more is wasted upload
+    max_long_edge: Optional[int] = 1568
+    # total pixels, the model's recommended maximum; a letter page at the long edge cap is ~1.9 MP
+    max_pixels: Optional[int] = 1_150_000
+    # JPEG, WEBP or PNG (quality is ignored for PNG)
+    format: str = "JPEG"
+    quality: int = 80
+    # pages with at least this many characters of text are encoded in grayscale; None disables
+    grayscale_text_threshold: Optional[int] = 1200
+
+    @property
+    def media_type(self) -> str:
+        return f"image/{self.format.lower()}"
+
+    def use_grayscale(self, text: str) -> bool:
+        return self.grayscale_text_threshold is not None and len(text or "") >= self.grayscale_text_threshold
+
+
+IMAGE_PROFILES = {
+    # sized for the model's recommended maximum (~1.15 megapixels, ~1600 tokens)
+    "default": ImageProfile(),
+    "color": ImageProfile(grayscale_text_threshold=None),
+    "compact": ImageProfile(dpi=100, max_long_edge=1092, format="WEBP", quality=70, grayscale_text_threshold=800),
+    "lossless": ImageProfile(format="PNG", grayscale_text_threshold=None),
+    # what we sent before profiles existed
+    "legacy": ImageProfile(dpi=200, max_long_edge=None, max_pixels=None, quality=95, grayscale_text_threshold=None),
+}
+
+
+def encode_image(img: Image.Image, profile: ImageProfile, grayscale: bool = False) -> bytes:
+    """Resize and encode a rasterized page according to the profile"""
+    mode = 'L' if grayscale else 'RGB'
+    if img.mode != mode:
+        img = img.convert(mode)
+    if profile.max_long_edge and max(img.size) > profile.max_long_edge:
+        img.thumbnail((profile.max_long_edge, profile.max_long_edge), Image.Resampling.LANCZOS)
+    if profile.max_pixels and img.width * img.height > profile.max_pixels:
+        scale = math.sqrt(profile.max_pixels / (img.width * img.height))
+        img.thumbnail((int(img.width * scale), int(img.height * scale)), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    if profile.format == "PNG":
+        img.save(buffer, format="PNG", optimize=True)
+    else:
+        img.save(buffer, format=profile.format, quality=profile.quality)
+    img.close()
+    return buffer.getvalue()
+
+
+# NOTE: the functions below run inside pool processes, so they must stay
+#  module-level and only take / return picklable values
+
+
+def count_pages(pdf_path: str | BinaryIO) -> int:
+    return len(PyPDF2.PdfReader(pdf_path).pages)
+
+
+def extract_text_range(pdf_path: str, first_page: int, last_page: int) -> List[str]:
+    """Extract text for pages first_page..last_page (1-indexed, inclusive)"""
+    reader = PyPDF2.PdfReader(pdf_path)
+    return [
+        reader.pages[page_number - 1].extract_text()
+        for page_number in range(first_page, last_page + 1)
+    ]
+
+
+def render_page_range(
+    pdf_path: str,
+    first_page: int,
+    last_page: int,
+    profile: ImageProfile = ImageProfile(),
+    grayscale_pages: AbstractSet[int] = frozenset(),
+) -> List[bytes]:
+    """Rasterize pages first_page..last_page (1-indexed, inclusive) and encode them per the profile"""
+    try:
+        images = convert_from_path(pdf_path, dpi=profile.dpi, first_page=first_page, last_page=last_page)
+    except Exception as e:
+        raise RuntimeError(f"Failed to convert PDF images: {str(e)}") from e
+
+    return [
+        encode_image(img, profile, grayscale=page_number in grayscale_pages)
+        for page_number, img in zip(range(first_page, last_page + 1), images)
+    ]
+
+
+def split_page_ranges(page_numbers: List[int], parts: int) -> List[Tuple[int, int]]:
+    """Split page numbers into at most roughly `parts` contiguous (first, last) ranges"""
+    runs: List[List[int]] = []
+    for page_number in sorted(set(page_numbers)):
+        if runs and runs[-1][-1] == page_number - 1:
+            runs[-1].append(page_number)
+        else:
+            runs.append([page_number])
+
+    size = max(1, -(-len(set(page_numbers)) // max(parts, 1)))
+    ranges = []
+    for run in runs:
+        for start in range(0, len(run), size):
+            piece = run[start:start + size]
+            ranges.append((piece[0], piece[-1]))
+    return ranges
+
+
+class RenderService:
+    """Runs PDF parsing, rasterization and image encoding in a process pool
 
-    pdf_data = pdf_stream.read()
-    text_stream = BytesIO(pdf_data)
-    image_stream = BytesIO(pdf_data)
+    Meant to be created once per worker process and shared by every job it runs.
+    """
 
-    async def extract_text():
-        reader = PyPDF2.PdfReader(text_stream)
-        total_pages = len(reader.pages)
-        return [[page.extract_text(), total_pages] for page in reader.pages]
+    def __init__(self, max_workers: Optional[int] = None, executor: Optional[Executor] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # the worker already runs threads and holds open sockets, which fork would copy
+        #  into every child -- start them from a clean server process instead
+        self.executor = executor or ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+        )
 
-    async def extract_images():
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def render_pages(
+        self,
+        pdf_path: str,
+        page_numbers: List[int],
+        profile: ImageProfile = ImageProfile(),
+        grayscale_pages: AbstractSet[int] = frozenset(),
+    ) -> Dict[int, bytes]:
+        """Rasterize pages, splitting the page ranges across the pool"""
+        ranges = split_page_ranges(page_numbers, self.max_workers)
+        results = await asyncio.gather(*(
+            self.run(
+                render_page_range,
+                pdf_path,
+                first_page,
+                last_page,
+                profile,
+                frozenset(p for p in grayscale_pages if first_page <= p <= last_page),
+            )
+            for first_page, last_page in ranges
+        ))
+        images: Dict[int, bytes] = {}
+        for (first_page, last_page), encoded in zip(ranges, results):
+            images.update(zip(range(first_page, last_page + 1), encoded))
+        return images
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_render_service: Optional[RenderService] = None
+
+
+def default_render_service() -> RenderService:
+    """Process-wide render service for callers that don't bring their own"""
+    global _default_render_service
+    if _default_render_service is None:
+        _default_render_service = RenderService()
+    return _default_render_service
+
+
+class PdfDocument:
+    """A PDF spilled to disk once, so pool processes can read and rasterize pages on demand"""
+
+    def __init__(
+        self,
+        pdf_path: str,
+        total_pages: int,
+        render_service: RenderService,
+        profile: ImageProfile = ImageProfile(),
+    ):
+        self.path = pdf_path
+        self.total_pages = total_pages
+        self.render_service = render_service
+        self.profile = profile
+        # the file lives as long as anything (e.g. a PageImage) still references the document
+        self._finalizer = weakref.finalize(self, os.unlink, pdf_path)
+
+    @classmethod
+    async def open(
+        cls,
+        pdf_stream: BinaryIO,
+        render_service: RenderService,
+        profile: ImageProfile = ImageProfile(),
+    ) -> "PdfDocument":
+        def spill() -> str:
+            pdf_stream.seek(0)
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as pdf_file:
+                shutil.copyfileobj(pdf_stream, pdf_file)
+                return pdf_file.name
+
+        pdf_path = await asyncio.to_thread(spill)
         try:
-            images = convert_from_bytes(image_stream.read())
-            image_data = []
-            for img in images:
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                buffer = BytesIO()
-                img.save(buffer, format='JPEG', quality=95)
-                image_data.append(buffer.getvalue())
-            return image_data
-        except Exception as e:
-            raise RuntimeError(f"Failed to convert PDF images: {str(e)}") from e
-
-    texts, images = await asyncio.gather(extract_text(), extract_images())
-    
-    for [text, total_pages], image in zip(texts, images):
-        yield text, image, total_pages
+            total_pages = await render_service.run(count_pages, pdf_path)
+        except Exception:
+            os.unlink(pdf_path)
+            raise
+        return cls(pdf_path, total_pages, render_service, profile)
+
+    async def render_page(self, page_number: int, grayscale: bool = False) -> bytes:
+        images = await self.render_service.render_pages(
+            self.path,
+            [page_number],
+            self.profile,
+            grayscale_pages={page_number} if grayscale else frozenset(),
+        )
+        return images[page_number]
+
+    def close(self):
+        self._finalizer()
+
+
+@dataclass
+class PageImage:
+    """Lazy handle to a page image -- nothing is rasterized until `render` is awaited"""
+    document: PdfDocument
+    page_number: int
+    grayscale: bool = False
+
+    async def render(self) -> bytes:
+        return await self.document.render_page(self.page_number, self.grayscale)
+
+
+async def extract_pdf(
+    pdf_stream: BinaryIO,
+    render_service: Optional[RenderService] = None,
+    profile: ImageProfile = ImageProfile(),
+    page_range: Optional[Tuple[int, int]] = None,
+) -> AsyncGenerator[Tuple[str, PageImage, int], None]:
+    """Extract text from a PDF page by page, with a lazy image handle for each page
+
+    Text extraction for all page ranges is submitted to the render service up
+    front, and pages are yielded in order as their range completes. With
+    `page_range` (first, last -- 1-indexed, inclusive) only those pages are
+    extracted; the total is still the whole document's.
+    """
+    if not shutil.which('pdftoppm'):
+        raise RuntimeError("Poppler is required but not installed.")
+
+    render_service = render_service or default_render_service()
+    document = await PdfDocument.open(pdf_stream, render_service, profile)
+    total_pages = document.total_pages
+
+    start, end = page_range or (1, total_pages)
+    end = min(end, total_pages)
+    ranges = [
+        (first_page, min(first_page + PAGE_TEXT_BATCH_SIZE - 1, end))
+        for first_page in range(start, end + 1, PAGE_TEXT_BATCH_SIZE)
+    ]
+    batches = [
+        asyncio.ensure_future(render_service.run(extract_text_range, document.path, first_page, last_page))
+        for first_page, last_page in ranges
+    ]
+    try:
+        for (first_page, last_page), batch in zip(ranges, batches):
+            texts = await batch
+            for page_number, text in zip(range(first_page, last_page + 1), texts):
+                yield text, PageImage(document, page_number, profile.use_grayscale(text)), total_pages
+    finally:
+        for batch in batches:
+            batch.cancel()
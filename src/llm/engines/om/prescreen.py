@@ -0,0 +1,124 @@
+import re
+from dataclasses import dataclass
+from enum import Enum
+
+# Terms that show up on pages with property financials or unit data
+FINANCIAL_KEYWORDS = [
+    "rent roll",
+    "noi",
+    "net operating income",
+    "cap rate",
+    "operating expenses",
+    "gross income",
+    "asking price",
+    "price per",
+    "occupancy",
+    "vacancy",
+    "real estate taxes",
+    "tax",
+    "expenses",
+    "income",
+    "insurance",
+    "utilities",
+    "legal rent",
+    "unit mix",
+    "square feet",
+    "sf",
+    "annual",
+    "monthly",
+]
+
+# Terms that show up on confidentiality notices and legal disclaimers
+BOILERPLATE_KEYWORDS = [
+    "confidential",
+    "disclaimer",
+    "no representation",
+    "no warranty",
+    "without limitation",
+    "sole discretion",
+    "not be reproduced",
+    "all rights reserved",
+    "copyright",
+    "prospective purchaser",
+    "non-disclosure",
+    "independent investigation",
+]
+
+# Pages with fewer meaningful characters than this are covers, image captions or blank
+MIN_PAGE_CHARS = 40
+
+
+class PrescreenVerdict(str, Enum):
+    RELEVANT = "relevant"
+    IRRELEVANT = "irrelevant"
+    # not clear from local features -- ask the model
+    AMBIGUOUS = "ambiguous"
+
+
+@dataclass
+class PrescreenResult:
+    verdict: PrescreenVerdict
+    reason: str
+
+
+def keyword_hits(text: str, keywords) -> int:
+    return sum(
+        1 for keyword in keywords if re.search(rf"\b{re.escape(keyword)}\b", text)
+    )
+
+
+def prescreen_page(text: str) -> PrescreenResult:
+    """Classify a page from cheap local features, leaving anything unclear to the model"""
+    stripped = " ".join((text or "").split())
+    chars = len(stripped)
+    if chars < MIN_PAGE_CHARS:
+        return PrescreenResult(
+            PrescreenVerdict.IRRELEVANT, f"near-empty page ({chars} characters)"
+        )
+
+    lowered = stripped.lower()
+    digit_density = sum(c.isdigit() for c in stripped) / chars
+    money_marks = stripped.count("$") + stripped.count("%")
+    financial_hits = keyword_hits(lowered, FINANCIAL_KEYWORDS)
+    boilerplate_hits = keyword_hits(lowered, BOILERPLATE_KEYWORDS)
+
+    # dense tables of dollar and percent figures are financial whatever their labels
+    dense_figures = money_marks >= 20 and digit_density >= 0.25
+    if dense_figures or (
+        financial_hits >= 2 and money_marks >= 5 and digit_density >= 0.1
+    ):
+        return PrescreenResult(
+            PrescreenVerdict.RELEVANT,
+            f"financial page ({financial_hits} keywords, {money_marks} $/% marks, {digit_density:.0%} digits)",
+        )
+    if (
+        boilerplate_hits >= 2
+        and financial_hits <= 1
+        and money_marks == 0
+        and digit_density < 0.02
+    ):
+        return PrescreenResult(
+            PrescreenVerdict.IRRELEVANT,
+            f"boilerplate page ({boilerplate_hits} disclaimer keywords)",
+        )
+    return PrescreenResult(PrescreenVerdict.AMBIGUOUS, "")
+
+
+@dataclass
+class PrescreenStats:
+    """Per-document counts of pages the pre-screen decided without the model"""
+
+    pages: int = 0
+    skipped_relevant: int = 0
+    skipped_irrelevant: int = 0
+    # short-circuited pages that were also sent to the model (audit mode), and how many matched
+    audited: int = 0
+    agreed: int = 0
+
+    @property
+    def skipped(self) -> int:
+        return self.skipped_relevant + self.skipped_irrelevant
+
+    @property
+    def agreement_rate(self) -> float | None:
+        return self.agreed / self.audited if self.audited else None
@@ -1,54 +1,119 @@
-METADATA_PROMPT = """Extract key property metadata from this text.
+# Prompts are split into a static `*_SYSTEM` instruction prefix, sent as the
+#  system prompt, and a `*_PROMPT` suffix carrying the per-call variables.
+#  `*_SYSTEM` strings are not formatted, so their braces are literal. A system
+#  prompt is only marked for caching past PROMPT_CACHE_MIN_TOKENS, which none of
+#  these reach -- they cost full input price on every call.
+
+METADATA_SYSTEM = """Extract key property metadata from the text you are given.
 Only extract fields if you are confident they are correct.
 Leave fields empty if uncertain.
 
 Return valid JSON in this format:
-{{
+{
     "title": "Official property name/title. THIS IS REQUIRED",
     "address": "Complete property address. THIS IS REQUIRED",
     "description": "2-3 sentence property overview. THIS IS REQUIRED",
     "square_feet": "Total square feet of the property if mentioned. THIS IS REQUIRED",
     "total_units": "Total number of units if mentioned. THIS IS REQUIRED",
     "property_type": "Type of property (e.g. multifamily, office). THIS IS REQUIRED",
-}}
+}
 
-Text: {text}
+Return valid JSON only."""
+
+METADATA_PROMPT = """Text: {text}
 
 Return valid JSON only."""
 
-TABLE_DETECTION_PROMPT = """Identify and extract any tables from this text and any provided images. 
+TABLE_DETECTION_SYSTEM = """Identify and extract any tables from the text and any provided images you are given.
 Known table types: rent_roll, expenses, units, occupancy
 
 For each table found, normalize the data into a consistent format.
 If you find a new table type, use an appropriate descriptive name.
 
-Previous table types found: {known_tables}
-Text: {text}
-
 Respond with JSON in format:
-{{
+{
     "table_type": [
-        {{normalized table rows as objects}}
+        {normalized table rows as objects}
     ]
-}}
+}
 
 Return valid JSON only."""
 
-SUMMARY_UPDATE_PROMPT = """Given the current summary and new text, update the summary.
+TABLE_DETECTION_PROMPT = """Previous table types found: {known_tables}
+Text: {text}
+
+Return valid JSON only."""
+
+EXTRACTION_SYSTEM = """Extract property metadata and tables from the text and any provided images you are given.
+
+For metadata, only extract fields if you are confident they are correct.
+Leave fields empty if uncertain.
+
+For tables, known table types are: rent_roll, expenses, units, occupancy
+Normalize each table found into a consistent format.
+If you find a new table type, use an appropriate descriptive name.
+
+Respond with JSON in format:
+{
+    "metadata": {
+        "title": "Official property name/title",
+        "address": "Complete property address",
+        "description": "2-3 sentence property overview",
+        "square_feet": "Total square feet of the property if mentioned",
+        "total_units": "Total number of units if mentioned",
+        "property_type": "Type of property (e.g. multifamily, office)"
+    },
+    "tables": {
+        "table_type": [
+            {normalized table rows as objects}
+        ]
+    }
+}
+
+Return valid JSON only."""
+
+EXTRACTION_PROMPT = """Previous table types found: {known_tables}
+Text: {text}
+
+Return valid JSON only."""
+
+SUMMARY_UPDATE_SYSTEM = """Given the current summary and new text, update the summary.
 Add any new relevant information while maintaining coherence.
 Avoid redundancy and maintain a clear narrative flow.
 
-Current summary: {current_summary}
+Provide only the updated summary text."""
+
+SUMMARY_UPDATE_PROMPT = """Current summary: {current_summary}
 New text: {new_text}
 
 Provide only the updated summary text."""
 
-PAGE_SCREENING_PROMPT = """Analyze this page and respond with JSON:
-{{
+CHUNK_SUMMARY_SYSTEM = """Summarize the property information in the section of a property document you are given.
+Keep figures, names and other specifics.
+Leave out marketing language, confidentiality notices and legal disclaimers.
+
+Provide only the summary text."""
+
+CHUNK_SUMMARY_PROMPT = """Text: {text}
+
+Provide only the summary text."""
+
+SUMMARY_REDUCE_SYSTEM = """Combine the summaries you are given, each covering consecutive sections of one property document, into a single summary.
+Keep all relevant information while maintaining coherence.
+Avoid redundancy and maintain a clear narrative flow.
+
+Provide only the combined summary text."""
+
+SUMMARY_REDUCE_PROMPT = """{summaries}
+
+Provide only the combined summary text."""
+
+PAGE_SCREENING_SYSTEM = """Analyze the page you are given and respond with JSON:
+{
     "is_relevant": boolean,  # Contains property data, financials, or key information. This includes rent rolls, expenses, units, occupancy, etc. This explicitly excludes generic marketing content and especially excludes confidentiality notices and legal disclaimers.
     "confidence": float,  # 0-1 score of confidence in assessment
     "reason": string  # Brief explanation of why you scored it this way
-}}
+}
 
 Look for:
 - Property details and descriptions
@@ -62,10 +127,42 @@ Ignore:
 - Generic marketing content
 - Table of contents
 
-Text: {text}
+Return valid JSON only."""
+
+PAGE_SCREENING_PROMPT = """Text: {text}
 
 Return valid JSON only."""
 
+BATCH_SCREENING_SYSTEM = """Analyze each of the pages you are given and respond with a JSON array holding one verdict per page, in page order:
+[
+    {
+        "page": integer,  # The page number shown in the page header
+        "is_relevant": boolean,  # Contains property data, financials, or key information. This includes rent rolls, expenses, units, occupancy, etc. This explicitly excludes generic marketing content and especially excludes confidentiality notices and legal disclaimers.
+        "confidence": float,  # 0-1 score of confidence in assessment
+        "reason": string  # Brief explanation of why you scored it this way
+    }
+]
+
+Look for:
+- Property details and descriptions
+- Financial data and tables
+- Market analysis
+- Rent rolls or tenant information
+
+Ignore:
+- Legal disclaimers
+- Confidentiality notices
+- Generic marketing content
+- Table of contents
+
+Judge every page on its own."""
+
+BATCH_SCREENING_PROMPT = """There are {page_count} pages.
+
+{pages}
+
+Return a valid JSON array with exactly {page_count} entries only."""
+
 CONFIDENTIALITY_FILTER_PROMPT = """Remove any confidentiality notices, disclaimers, or legal warnings from this text.
 Return only the substantive content about the property or business.
 
@@ -0,0 +1,131 @@
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .prescreen import PrescreenStats
+
+# USD per million tokens: input, output, cache write, cache read.
+#  Models missing from the table are counted at no cost.
+MODEL_PRICES = {
+    "claude-3-5-sonnet-20241022": (3.00, 15.00, 3.75, 0.30),
+    "claude-3-5-haiku-20241022": (0.80, 4.00, 1.00, 0.08),
+}
+# message batches are billed at half the interactive price
+BATCH_DISCOUNT = 0.5
+
+
+@dataclass
+class CallUsage:
+    """Tokens, latency and retries of one model call"""
+
+    model: str
+    # pipeline stage that made the call: screening, tables, metadata or summary
+    stage: str = "other"
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # tokens written to / served from the provider-side prompt cache
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    # seconds from the first attempt to the answer, including retry backoff
+    latency: float = 0.0
+    attempts: int = 0
+    # answered from the response cache without calling the model
+    cached: bool = False
+    batched: bool = False
+    failed: bool = False
+    # index of the document in a multi-document batch run
+    document: Optional[int] = None
+
+    @classmethod
+    def from_response(cls, model: str, response: Any, **kwargs) -> "CallUsage":
+        usage = cls(model=model, **kwargs)
+        usage.record(response)
+        return usage
+
+    def record(self, response: Any) -> None:
+        """Take token counts from a response's `usage`"""
+        usage = getattr(response, "usage", None)
+        self.input_tokens = getattr(usage, "input_tokens", 0) or 0
+        self.output_tokens = getattr(usage, "output_tokens", 0) or 0
+        self.cache_creation_input_tokens = (
+            getattr(usage, "cache_creation_input_tokens", 0) or 0
+        )
+        self.cache_read_input_tokens = getattr(usage, "cache_read_input_tokens", 0) or 0
+
+    @property
+    def retries(self) -> int:
+        return max(self.attempts - 1, 0)
+
+    @property
+    def cost(self) -> float:
+        prices = MODEL_PRICES.get(self.model)
+        if not prices:
+            return 0.0
+        tokens = (
+            self.input_tokens,
+            self.output_tokens,
+            self.cache_creation_input_tokens,
+            self.cache_read_input_tokens,
+        )
+        cost = sum(count * price for count, price in zip(tokens, prices)) / 1_000_000
+        return cost * BATCH_DISCOUNT if self.batched else cost
+
+
+@dataclass
+class StageStats:
+    """Model calls of one stage, summed"""
+
+    calls: int = 0
+    cache_hits: int = 0
+    retries: int = 0
+    failures: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    # summed call latency -- calls overlap, so this can exceed wall time
+    seconds: float = 0.0
+    cost_usd: float = 0.0
+
+    def add(self, usage: CallUsage) -> None:
+        self.calls += 1
+        self.cache_hits += usage.cached
+        self.retries += usage.retries
+        self.failures += usage.failed
+        self.input_tokens += usage.input_tokens
+        self.output_tokens += usage.output_tokens
+        self.cache_creation_input_tokens += usage.cache_creation_input_tokens
+        self.cache_read_input_tokens += usage.cache_read_input_tokens
+        self.seconds += usage.latency
+        self.cost_usd += usage.cost
+
+
+@dataclass
+class DocumentStats:
+    """What processing one document took, per stage and in total"""
+
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    total: StageStats = field(default_factory=StageStats)
+    prescreen: PrescreenStats = field(default_factory=PrescreenStats)
+    pages: int = 0
+    wall_seconds: float = 0.0
+
+    @classmethod
+    def from_usage(
+        cls,
+        usage: List[CallUsage],
+        prescreen: Optional[PrescreenStats] = None,
+        pages: int = 0,
+        wall_seconds: float = 0.0,
+    ) -> "DocumentStats":
+        stats = cls(
+            prescreen=prescreen or PrescreenStats(),
+            pages=pages,
+            wall_seconds=wall_seconds,
+        )
+        for call in usage:
+            stats.stages.setdefault(call.stage, StageStats()).add(call)
+            stats.total.add(call)
+        return stats
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
@@ -0,0 +1,285 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import anthropic
+from redis.asyncio import Redis
+
+# Errors worth another attempt: rate limits, overload and other 5xx, and network
+#  trouble (timeouts included) -- anything else fails the same way every time
+RETRYABLE_ERRORS = (
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    anthropic.APIConnectionError,
+)
+# rate limited and overloaded -- the API wants less traffic
+OVERLOAD_STATUS_CODES = (429, 529)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the API asked to wait before trying again, if it said"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    for header, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            return max(float(value) / scale, 0.0)
+        except ValueError:
+            # the http-date form -- fall back to our own backoff
+            continue
+    return None
+
+
+def is_overload(error: BaseException) -> bool:
+    return (
+        isinstance(error, anthropic.APIStatusError)
+        and error.status_code in OVERLOAD_STATUS_CODES
+    )
+
+
+class TokenBucket(ABC):
+    """Interface for a bucket holding up to `capacity`, refilled at `rate` per second"""
+
+    @abstractmethod
+    async def take(self, amount: float) -> float:
+        """Take `amount` if the bucket holds it; otherwise take nothing and return the seconds to wait"""
+
+    @abstractmethod
+    async def adjust(self, amount: float) -> None:
+        """Put back (positive) or take out (negative) `amount` unconditionally"""
+
+
+class LocalTokenBucket(TokenBucket):
+    """Bucket shared by everything in this process"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self, amount: float) -> float:
+        self._refill()
+        # a request bigger than the bucket waits for a full one instead of forever
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            self.level -= amount
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    async def adjust(self, amount: float) -> None:
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+# Refill, then take / adjust, atomically -- redis' clock keeps workers in agreement
+_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local amount = tonumber(ARGV[4])
+local now = redis.call("TIME")
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "level", "updated")
+local level = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+level = math.min(capacity, level + math.max(now - updated, 0) * rate)
+local wait = 0
+if ARGV[3] == "adjust" then
+    level = math.min(capacity, level + amount)
+else
+    amount = math.min(amount, capacity)
+    if level >= amount then
+        level = level - amount
+    else
+        wait = (amount - level) / rate
+    end
+end
+redis.call("HSET", KEYS[1], "level", tostring(level), "updated", tostring(now))
+redis.call("EXPIRE", KEYS[1], ARGV[5])
+return tostring(wait)
+"""
+
+
+class RedisTokenBucket(TokenBucket):
+    """Bucket shared by every worker on the same redis
+
+    Redis failures fall back to a per-process bucket -- a limiter must never
+    fail the call it sits under.
+    """
+
+    def __init__(self, redis: Redis, key: str, capacity: float, rate: float):
+        self.key = key
+        self.capacity = capacity
+        self.rate = rate
+        self.script = redis.register_script(_BUCKET_SCRIPT)
+        self.fallback = LocalTokenBucket(capacity, rate)
+        # an idle bucket refills completely well within this many seconds
+        self.ttl = int(capacity / rate) + 60
+
+    async def _run(self, op: str, amount: float) -> float:
+        result = await self.script(
+            keys=[self.key], args=[self.capacity, self.rate, op, amount, self.ttl]
+        )
+        return float(result.decode() if isinstance(result, bytes) else result)
+
+    async def take(self, amount: float) -> float:
+        try:
+            return await self._run("take", amount)
+        except Exception:
+            return await self.fallback.take(amount)
+
+    async def adjust(self, amount: float) -> None:
+        try:
+            await self._run("adjust", amount)
+        except Exception:
+            await self.fallback.adjust(amount)
+
+
+class AdaptiveConcurrency:
+    """Limit on calls in flight, tuned AIMD style
+
+    Every success adds 1/limit, so the limit grows by about one per round of
+    calls; an overload response halves it. Calls already in flight when the
+    limit drops tend to be overloaded too, so one halving per `cooldown` counts.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, cooldown: float = 1.0):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.cooldown = cooldown
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+        self.last_decrease = 0.0
+
+    async def acquire(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def increase(self) -> None:
+        self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    def decrease(self) -> None:
+        now = time.monotonic()
+        if now - self.last_decrease < self.cooldown:
+            return
+        self.last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit / 2)
+
+
+@dataclass
+class Reservation:
+    """Tokens held for one call -- set `tokens` to what it really used"""
+
+    tokens: int
+
+
+class RateLimiter:
+    """Client-side limits for model calls: requests and tokens per minute, and concurrency
+
+    Share one per worker process so all its jobs draw from the same quota; with
+    redis the per-minute buckets and retry-after pauses hold across workers too,
+    while concurrency is tuned per process. Unset per-minute limits are not
+    enforced. Token counts are estimated before a call and settled afterwards.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        redis: Optional[Redis] = None,
+        prefix: str = "llm:rate_limit:",
+    ):
+        self.redis = redis
+        self.prefix = prefix
+        self.requests = self._bucket("requests", requests_per_minute)
+        self.tokens = self._bucket("tokens", tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(max_concurrency, min_concurrency)
+        self.paused_until = 0.0
+
+    def _bucket(self, name: str, per_minute: Optional[int]) -> Optional[TokenBucket]:
+        if not per_minute:
+            return None
+        if self.redis is not None:
+            return RedisTokenBucket(
+                self.redis, self.prefix + name, per_minute, per_minute / 60
+            )
+        return LocalTokenBucket(per_minute, per_minute / 60)
+
+    async def pause(self, seconds: float) -> None:
+        """Hold every call for `seconds`, as a retry-after header asks"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        if self.redis is not None:
+            try:
+                await self.redis.set(
+                    self.prefix + "paused", "1", px=max(int(seconds * 1000), 1)
+                )
+            except Exception:
+                pass
+
+    async def _pause_remaining(self) -> float:
+        remaining = self.paused_until - time.monotonic()
+        if self.redis is not None:
+            try:
+                # -2 / -1 when there is no pause
+                remaining = max(
+                    remaining, await self.redis.pttl(self.prefix + "paused") / 1000
+                )
+            except Exception:
+                pass
+        return remaining
+
+    async def _wait(self, bucket: Optional[TokenBucket], amount: float) -> None:
+        if bucket is None:
+            return
+        while (delay := await bucket.take(amount)) > 0:
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def reserve(self, tokens: int) -> AsyncIterator[Reservation]:
+        """Wait until a call estimated at `tokens` fits the limits, then hold it
+
+        Overload errors raised inside halve the concurrency and honor the
+        response's retry-after; successes grow the concurrency back.
+        """
+        await self.concurrency.acquire()
+        reservation = Reservation(tokens)
+        try:
+            while (remaining := await self._pause_remaining()) > 0:
+                await asyncio.sleep(remaining)
+            await self._wait(self.requests, 1)
+            await self._wait(self.tokens, tokens)
+            yield reservation
+        except Exception as e:
+            if is_overload(e):
+                self.concurrency.decrease()
+                delay = retry_after(e)
+                if delay:
+                    await self.pause(delay)
+            raise
+        else:
+            self.concurrency.increase()
+        finally:
+            await self.concurrency.release()
+            if self.tokens is not None and reservation.tokens != tokens:
+                await self.tokens.adjust(tokens - reservation.tokens)
@@ -5,17 +5,21 @@ from fastapi import (
 )
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-import io
+import asyncio
 from fastapi.templating import Jinja2Templates
 
 from src.database.models import OmStatus, User, Om
 from src.logger import RequestSpan
 from src.storage import Storage, StorageBucket
-from src.task_manager import TaskManager
+from src.task_manager import TaskManager, TaskPriority
 from ...deps import require_logged_in_user, span, async_db, storage, task_manager
 
 router = APIRouter()
 
+# A pdf starts with this, within its first kilobyte
+PDF_MAGIC = b"%PDF-"
+PDF_HEADER_SIZE = 1024
+
 templates = Jinja2Templates(directory="templates")
 
 
@@ -34,36 +38,54 @@ async def create_om(
         if not file.filename or not file.filename.lower().endswith(".pdf"):
             raise HTTPException(status_code=422, detail="Only PDF files are allowed")
 
-        # Read file
+        # Check the pdf header -- only the first chunk is read
         try:
-            content = await file.read()
-            if not content:
-                raise HTTPException(status_code=422, detail="Empty file uploaded")
+            head = await file.read(PDF_HEADER_SIZE)
+            await file.seek(0)
         except Exception as e:
             span.error(f"File read error: {str(e)}")
             raise HTTPException(status_code=422, detail="Error reading uploaded file")
+        if not head:
+            raise HTTPException(status_code=422, detail="Empty file uploaded")
+        if PDF_MAGIC not in head:
+            raise HTTPException(status_code=422, detail="Only PDF files are allowed")
 
-        # Upload to storage
-        storage_object_id = storage.put_object(
-            stream=io.BytesIO(content),
-            stream_len=len(content),
-            bucket=StorageBucket.oms,
+        # Stream to storage in parts, keyed by content, so the same pdf is stored once
+        content_hash, size = await asyncio.to_thread(
+            storage.put_object_by_hash, file.file, StorageBucket.oms
         )
+        span.info(f"stored upload: content_hash={content_hash} size={size}")
 
         # Create initial Om record
         om = await Om.create(
             user_id=str(user.id),
-            storage_object_id=storage_object_id,
+            storage_object_id=content_hash,
+            content_hash=content_hash,
             session=db,
             span=span,
         )
 
+        # the same pdf was processed before -- reuse its results
+        source = await Om.read_processed_by_content_hash(content_hash, db, span=span)
+        if source:
+            span.info(f"om {om.id} is a duplicate of om {source.id}")
+            await om.copy_results(source, db, span=span)
+            await db.commit()
+            return {
+                "om_id": om.id,
+                "status": om.status,
+            }
+
         await db.commit()
 
         # TODO: i should probably do something with the task_result
         # Trigger background processing
+        # someone is waiting on this one -- ahead of backfills
         _task_result = await task_manager.process_om(
             om_id=om.id,
+            priority=TaskPriority.HIGH,
+            user_id=om.user_id,
+            content_hash=content_hash,
         )
 
         return {
@@ -71,6 +93,8 @@ async def create_om(
             "status": om.status,
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         span.error(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
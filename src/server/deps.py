@@ -4,7 +4,7 @@ from redis import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi_sso.sso.base import OpenID
 from jose import jwt
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 
 from src.database.models import User
 from src.storage import Storage
@@ -30,7 +30,7 @@ def storage(request: Request) -> Storage:
     return request.state.storage
 
 
-def anthropic_client(request: Request) -> Anthropic:
+def anthropic_client(request: Request) -> AsyncAnthropic:
     return request.state.anthropic_client
 
 
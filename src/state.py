@@ -32,7 +32,7 @@ class AppStateException(Exception):
 class AppState:
     config: Config
     google_sso: GoogleSSO
-    anthropic_client: anthropic.Client
+    anthropic_client: anthropic.AsyncAnthropic
     storage: Storage
     database: AsyncDatabase
     logger: Logger
@@ -50,12 +50,12 @@ class AppState:
                 redirect_uri=f"{config.host_name}/auth/google/callback",
                 allow_insecure_http=True,
             ),
-            anthropic_client=anthropic.Client(api_key=config.secrets.anthropic_api_key),
+            anthropic_client=anthropic.AsyncAnthropic(api_key=config.secrets.anthropic_api_key),
             storage=Storage(config),
             database=AsyncDatabase(config.database_path),
             logger=Logger(config.log_path, config.debug),
             secrets=config.secrets,
-            task_manager=TaskManager(config.redis_url, None),
+            task_manager=TaskManager(config.redis_url, None, config.om_max_jobs_per_user),
             redis_client=Redis(config.redis_url),
         )
         return state
@@ -1,5 +1,7 @@
 from minio import Minio
+from minio.commonconfig import CopySource
 from minio.error import S3Error
+import hashlib
 import uuid
 from enum import Enum as PyEnum
 from urllib.parse import urlparse
@@ -8,6 +10,10 @@ from urllib.parse import urlparse
 
 from src.config import Config
 
+# Objects of unknown length go up in parts of this size -- the smallest s3 takes,
+#  and all of an upload that is held in memory at a time
+PART_SIZE = 5 * 1024 * 1024
+
 
 class StorageBucket(PyEnum):
     oms = "oms"
@@ -30,6 +36,24 @@ class StorageException(Exception):
         return StorageException(StorageExceptionType.default, str(e))
 
 
+class HashingReader:
+    """Wraps a binary stream, hashing (sha-256) and counting what is read through it"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.hash.update(data)
+        self.size += len(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self.hash.hexdigest()
+
+
 class Storage:
     client: Minio
 
@@ -62,24 +86,64 @@ class Storage:
     ):
         return self.client.get_object(bucket.value, object_name)
 
+    def object_exists(self, bucket: StorageBucket, object_name: str) -> bool:
+        try:
+            self.client.stat_object(bucket.value, object_name)
+            return True
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return False
+            raise StorageException.from_s3_error(e)
+
     def put_object(
         self,
         stream,
         stream_len,
         bucket: StorageBucket,
+        object_name: str | None = None,
     ):
+        """Store an object, under `object_name` or a fresh uuid, and return its name
+
+        A `stream_len` of -1 streams an object of unknown length in parts.
+        """
         try:
-            object_id = str(uuid.uuid4())
+            object_id = object_name or str(uuid.uuid4())
             match bucket:
                 case StorageBucket.oms:
                     content_type = "application/pdf"
+                case StorageBucket.om_tables:
+                    content_type = "application/json"
             self.client.put_object(
                 bucket_name=bucket.value,
                 object_name=object_id,
                 data=stream,
                 length=stream_len,
                 content_type=content_type,
+                part_size=PART_SIZE if stream_len < 0 else 0,
             )
             return object_id
         except S3Error as e:
             raise StorageException.from_s3_error(e)
+
+    def put_object_by_hash(self, stream, bucket: StorageBucket) -> tuple[str, int]:
+        """Stream an object into storage under the sha-256 of its content
+
+        The name is only known once the stream is read, so the object goes up
+        under a temporary name and is copied, server side, unless an object
+        with the same content is already stored. Returns the hash and size.
+        """
+        reader = HashingReader(stream)
+        temporary_id = self.put_object(
+            reader, -1, bucket, object_name=f"uploads/{uuid.uuid4()}"
+        )
+        try:
+            content_hash = reader.hexdigest()
+            if not self.object_exists(bucket, content_hash):
+                self.client.copy_object(
+                    bucket.value, content_hash, CopySource(bucket.value, temporary_id)
+                )
+            return content_hash, reader.size
+        except S3Error as e:
+            raise StorageException.from_s3_error(e)
+        finally:
+            self.client.remove_object(bucket.value, temporary_id)
@@ -1,7 +1,15 @@
 from arq import create_pool
 from arq.connections import RedisSettings
+from arq.constants import default_queue_name
 from enum import Enum
-from typing import Any
+from typing import Any, List, Optional, Tuple
+
+from src.task_manager.dedup import claim_content
+from src.task_manager.fair import FairScheduler
+
+# Most OMs one batch job processes -- the job holds every page and request of its
+#  OMs in memory, so bigger backfills are split over several jobs
+OM_BATCH_SIZE = 20
 
 
 class TaskPriority(Enum):
@@ -9,28 +17,138 @@ class TaskPriority(Enum):
     MEDIUM = 5
     HIGH = 1
 
+    @property
+    def queue_name(self) -> str:
+        """The arq queue jobs of this priority wait in -- medium is arq's default queue"""
+        if self == TaskPriority.MEDIUM:
+            return default_queue_name
+        return f"{default_queue_name}:{self.name.lower()}"
+
 
 class TaskManager:
-    def __init__(self, redis_url: str, app_state: Any):
+    def __init__(self, redis_url: str, app_state: Any, max_jobs_per_user: int = 0):
         self.redis_settings = RedisSettings.from_dsn(redis_url)
         self.redis_pool = None
+        # 0 enqueues every job right away, whoever it belongs to
+        self.max_jobs_per_user = max_jobs_per_user
+        self.scheduler: Optional[FairScheduler] = None
 
     async def initialize(self):
         """Initialize Redis pool for enqueueing jobs"""
         self.redis_pool = await create_pool(self.redis_settings)
+        if self.max_jobs_per_user:
+            self.scheduler = FairScheduler(self.redis_pool, self.max_jobs_per_user)
+
+    async def _enqueue(self, function: str, *args: Any, user_id: Optional[str] = None, **kwargs: Any):
+        """Enqueue a job -- through the per-user fair share when it has an owner"""
+        if not self.redis_pool:
+            raise RuntimeError("TaskManager not initialized")
+
+        if self.scheduler and user_id:
+            return await self.scheduler.submit(user_id, function, *args, **kwargs)
+        return await self.redis_pool.enqueue_job(function, *args, **kwargs)
+
+    async def job_done(self, job_id: str):
+        """Free the user slot a finished job held, letting the next job in"""
+        if self.scheduler:
+            await self.scheduler.release(job_id)
+            await self.scheduler.dispatch()
+
+    async def dispatch(self):
+        """Enqueue the jobs waiting for a free user slot, e.g. after a slot's lease ran out"""
+        if self.scheduler:
+            await self.scheduler.dispatch()
 
     async def shutdown(self):
         """Cleanup Redis pool"""
         if self.redis_pool:
             await self.redis_pool.close()
 
-    # TODO: some sort of priority queue?
-    async def process_om(self, om_id: str):
-        """Enqueue an OM processing job"""
+    async def process_om(
+        self,
+        om_id: str,
+        priority: TaskPriority = TaskPriority.MEDIUM,
+        split: bool = True,
+        user_id: Optional[str] = None,
+        content_hash: Optional[str] = None,
+    ):
+        """Enqueue an OM processing job on the queue for `priority`
+
+        With `split`, documents longer than OM_PART_PAGES are processed as
+        page-range sub-jobs spread over the workers, then merged -- at the
+        same priority. Jobs of a `user_id` wait their turn among the other
+        users' once the user has OM_MAX_JOBS_PER_USER running. An OM whose
+        `content_hash` is already being processed for another upload gets
+        no job; it's given that upload's results when they're ready.
+        """
         if not self.redis_pool:
             raise RuntimeError("TaskManager not initialized")
+        if content_hash and not await claim_content(self.redis_pool, content_hash, om_id):
+            return None
 
-        return await self.redis_pool.enqueue_job(
+        return await self._enqueue(
             "process_om",  # Must match function name in worker
             om_id,
+            user_id=user_id,
+            split=split,
+            priority=priority,
+            _queue_name=priority.queue_name,
         )
+
+    async def process_om_part(
+        self,
+        om_id: str,
+        part: int,
+        page_range: Tuple[int, int],
+        parts: int,
+        priority: TaskPriority = TaskPriority.MEDIUM,
+        user_id: Optional[str] = None,
+    ):
+        """Enqueue the job processing one page range of a split OM"""
+        return await self._enqueue(
+            "process_om_part",  # Must match function name in worker
+            om_id,
+            part,
+            page_range,
+            parts,
+            priority=priority,
+            user_id=user_id,
+            # a retried fan-out doesn't start a range twice
+            _job_id=f"process_om_part:{om_id}:{part}",
+            _queue_name=priority.queue_name,
+        )
+
+    async def merge_om(
+        self,
+        om_id: str,
+        parts: int,
+        priority: TaskPriority = TaskPriority.MEDIUM,
+        user_id: Optional[str] = None,
+    ):
+        """Enqueue the job combining the page ranges of a split OM"""
+        return await self._enqueue(
+            "merge_om",  # Must match function name in worker
+            om_id,
+            parts,
+            user_id=user_id,
+            # the last parts can finish together -- only one of them starts the merge
+            _job_id=f"merge_om:{om_id}",
+            _queue_name=priority.queue_name,
+        )
+
+    async def process_om_batch(self, om_ids: List[str]):
+        """Enqueue jobs processing OMs through the message batch API, OM_BATCH_SIZE per job
+
+        Batch jobs are backfills, so they wait on the low priority queue.
+        """
+        if not self.redis_pool:
+            raise RuntimeError("TaskManager not initialized")
+
+        return [
+            await self.redis_pool.enqueue_job(
+                "process_om_batch",  # Must match function name in worker
+                om_ids[start:start + OM_BATCH_SIZE],
+                _queue_name=TaskPriority.LOW.queue_name,
+            )
+            for start in range(0, len(om_ids), OM_BATCH_SIZE)
+        ]
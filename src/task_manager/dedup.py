@@ -0,0 +1,69 @@
+from typing import AsyncIterator, Awaitable, Optional, Tuple, cast
+
+from redis.asyncio import Redis
+
+# How long uploads of the same pdf wait on the first one's job -- past this,
+#  a new upload runs a job of its own
+CONTENT_LOCK_TTL = 24 * 60 * 60
+
+
+def content_lock_key(content_hash: str) -> str:
+    return f"process_om:content:{content_hash}"
+
+
+def content_waiting_key(content_hash: str) -> str:
+    return f"process_om:content:{content_hash}:waiting"
+
+
+async def claim_content(redis: Redis, content_hash: str, om_id: str) -> bool:
+    """Whether `om_id` should be processed, or waits on the OM already processing the same pdf
+
+    Waiting OMs are settled by the processing one's job, see `release_content`.
+    """
+    lock = content_lock_key(content_hash)
+    waiting = content_waiting_key(content_hash)
+    while True:
+        if await redis.set(lock, om_id, nx=True, ex=CONTENT_LOCK_TTL):
+            return True
+        if await redis.get(lock) == om_id.encode():
+            return True
+        await cast(Awaitable[int], redis.sadd(waiting, om_id))
+        await redis.expire(waiting, CONTENT_LOCK_TTL)
+        # the lock can go between the two calls above -- if it did and we're still
+        #  waiting, nobody is left to settle us, so try again
+        if await redis.exists(lock) or not await cast(
+            Awaitable[int], redis.srem(waiting, om_id)
+        ):
+            return False
+
+
+async def release_content(
+    redis: Redis, content_hash: str, om_id: str
+) -> AsyncIterator[str]:
+    """Yield the ids of OMs waiting on `om_id`, releasing its claim on the pdf along the way"""
+    waiting = content_waiting_key(content_hash)
+    lock = content_lock_key(content_hash)
+    while waiting_id := await cast(Awaitable[Optional[bytes]], redis.spop(waiting)):
+        yield waiting_id.decode()
+    if await redis.get(lock) == om_id.encode():
+        await redis.delete(lock)
+    # anyone who joined before the lock went
+    while waiting_id := await cast(Awaitable[Optional[bytes]], redis.spop(waiting)):
+        yield waiting_id.decode()
+
+
+async def waiting_content(redis: Redis) -> AsyncIterator[Tuple[str, Optional[str]]]:
+    """Yield each pdf with OMs waiting on it, and the OM holding its lock -- None once the lock is gone"""
+    async for key in redis.scan_iter(match=content_waiting_key("*")):
+        # process_om:content:<hash>:waiting
+        content_hash = key.decode().split(":")[2]
+        holder = await redis.get(content_lock_key(content_hash))
+        yield content_hash, holder.decode() if holder else None
+
+
+async def pop_waiting(redis: Redis, content_hash: str) -> Optional[str]:
+    """Take one OM off those waiting on the pdf, if any are left"""
+    waiting_id = await cast(
+        Awaitable[Optional[bytes]], redis.spop(content_waiting_key(content_hash))
+    )
+    return waiting_id.decode() if waiting_id else None
@@ -0,0 +1,163 @@
+import functools
+import inspect
+import pickle
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from arq import Retry
+from arq.connections import ArqRedis
+
+# How long a dispatched job may hold its user's slot -- every try of a job fits
+#  well within this, so slots of jobs lost with their worker come back by themselves
+SLOT_LEASE = 60 * 60
+
+# Queue a job for a user -- a user is on the ring while they have jobs pending
+_SUBMIT_SCRIPT = """
+if redis.call("SET", KEYS[4], ARGV[3], "NX") then
+    redis.call("RPUSH", KEYS[3], ARGV[2])
+    if redis.call("SADD", KEYS[2], ARGV[1]) == 1 then
+        redis.call("RPUSH", KEYS[1], ARGV[1])
+    end
+    return 1
+end
+return 0
+"""
+
+# Walk the ring once from its head, moving each user to the back: the first user
+#  with a job pending and a free slot takes a slot for their oldest job
+_NEXT_SCRIPT = """
+local prefix = ARGV[1]
+local max_jobs = tonumber(ARGV[2])
+local lease = tonumber(ARGV[3])
+local now = tonumber(redis.call("TIME")[1])
+for _ = 1, redis.call("LLEN", KEYS[1]) do
+    local user = redis.call("LPOP", KEYS[1])
+    local pending = prefix .. "pending:" .. user
+    local running = prefix .. "running:" .. user
+    if redis.call("LLEN", pending) == 0 then
+        redis.call("SREM", KEYS[2], user)
+    else
+        redis.call("RPUSH", KEYS[1], user)
+        redis.call("ZREMRANGEBYSCORE", running, "-inf", now)
+        if redis.call("ZCARD", running) < max_jobs then
+            local job_id = redis.call("LPOP", pending)
+            redis.call("ZADD", running, now + lease, job_id)
+            redis.call("EXPIRE", running, lease)
+            redis.call("SET", prefix .. "owner:" .. job_id, user, "EX", lease)
+            return {user, job_id}
+        end
+    end
+end
+return false
+"""
+
+
+class FairScheduler:
+    """Round-robin dispatch of jobs across users, at most `max_jobs_per_user` running each
+
+    Jobs wait in redis per user until one of the user's slots is free, then
+    are enqueued with arq as usual. State is shared by everything on the same
+    redis, so the caps hold across the api and every worker.
+    """
+
+    def __init__(self, redis: ArqRedis, max_jobs_per_user: int, prefix: str = "fair:"):
+        self.redis = redis
+        self.max_jobs_per_user = max_jobs_per_user
+        self.prefix = prefix
+        self.ring = prefix + "users"
+        self.members = prefix + "queued_users"
+        self.submit_script = redis.register_script(_SUBMIT_SCRIPT)
+        self.next_script = redis.register_script(_NEXT_SCRIPT)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}job:{job_id}"
+
+    async def submit(
+        self, user_id: str, function: str, *args: Any, **kwargs: Any
+    ) -> str:
+        """Queue a job for `user_id` and dispatch what fits -- a pending job with the same `_job_id` wins"""
+        job_id = kwargs.pop("_job_id", None) or uuid.uuid4().hex
+        payload = pickle.dumps((function, args, kwargs))
+        await self.submit_script(
+            keys=[
+                self.ring,
+                self.members,
+                f"{self.prefix}pending:{user_id}",
+                self._job_key(job_id),
+            ],
+            args=[user_id, job_id, payload],
+        )
+        await self.dispatch()
+        return job_id
+
+    async def _next(self) -> Optional[Tuple[str, str]]:
+        picked = await self.next_script(
+            keys=[self.ring, self.members],
+            args=[self.prefix, self.max_jobs_per_user, SLOT_LEASE],
+        )
+        if not picked:
+            return None
+        user_id, job_id = (value.decode() for value in picked)
+        return user_id, job_id
+
+    async def dispatch(self) -> int:
+        """Enqueue pending jobs while their users have free slots, returning how many"""
+        dispatched = 0
+        while picked := await self._next():
+            _user_id, job_id = picked
+            payload = await self.redis.get(self._job_key(job_id))
+            await self.redis.delete(self._job_key(job_id))
+            if payload is None:
+                await self.release(job_id)
+                continue
+            function, args, kwargs = pickle.loads(payload)
+            job = await self.redis.enqueue_job(
+                function, *args, _job_id=job_id, **kwargs
+            )
+            if job is None:
+                # arq already has a job with this id, and it holds no slot of its own
+                await self.release(job_id)
+                continue
+            dispatched += 1
+        return dispatched
+
+    async def release(self, job_id: str) -> None:
+        """Free the slot held by `job_id`, if it holds one"""
+        owner = self.prefix + "owner:" + job_id
+        user_id = await self.redis.get(owner)
+        if user_id is None:
+            return
+        await self.redis.zrem(f"{self.prefix}running:{user_id.decode()}", job_id)
+        await self.redis.delete(owner)
+
+    async def running(self, user_id: str) -> int:
+        return await self.redis.zcard(f"{self.prefix}running:{user_id}")
+
+
+def fair_share(job):
+    """Free the job's user slot, and dispatch the next job, once it won't be tried again
+
+    For arq jobs taking `max_tries`; jobs not dispatched by the scheduler hold no slot.
+    """
+    max_tries = inspect.signature(job).parameters["max_tries"].default
+
+    @functools.wraps(job)
+    async def run(ctx: Dict[str, Any], *args: Any, **kwargs: Any):
+        retrying = False
+        try:
+            return await job(ctx, *args, **kwargs)
+        except Retry:
+            retrying = ctx["job_try"] < kwargs.get("max_tries", max_tries)
+            raise
+        finally:
+            if not retrying:
+                try:
+                    await ctx["task_manager"].job_done(ctx["job_id"])
+                except Exception as e:
+                    # the slot's lease runs out eventually
+                    logger = ctx["logger"].get_worker_logger(
+                        name=job.__name__, attempt=ctx["job_try"]
+                    )
+                    logger.exception(f"failed to release job -- {ctx['job_id']} | {e}")
+
+    return run
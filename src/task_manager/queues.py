@@ -0,0 +1,108 @@
+import asyncio
+import signal
+from typing import Any, Dict, List
+
+from arq.utils import timestamp_ms
+from arq.worker import Worker, get_kwargs
+
+from src.task_manager import TaskPriority
+
+# Share of the job slots each priority's queue is guaranteed while it has jobs waiting
+QUEUE_WEIGHTS = {
+    TaskPriority.HIGH: 6,
+    TaskPriority.MEDIUM: 3,
+    TaskPriority.LOW: 1,
+}
+
+
+class JobSlots:
+    """The job slots of one worker process, shared by its per-priority queue workers
+
+    A queue with jobs waiting is guaranteed its weighted share of `max_jobs`, so
+    backfills keep moving during busy hours. Slots the other queues leave idle
+    are borrowed, but not past a queue's share while a higher priority waits.
+    """
+
+    def __init__(self, max_jobs: int, weights: Dict[TaskPriority, int] = QUEUE_WEIGHTS):
+        self.max_jobs = max_jobs
+        total = sum(weights.values())
+        self.shares = {
+            priority: max(1, round(max_jobs * weight / total))
+            for priority, weight in weights.items()
+        }
+        self.workers: Dict[TaskPriority, "PriorityWorker"] = {}
+
+    async def waiting(self, priority: TaskPriority) -> bool:
+        worker = self.workers[priority]
+        return await worker.pool.zcount(priority.queue_name, "-inf", timestamp_ms()) > 0
+
+    async def allowance(self, priority: TaskPriority) -> int:
+        """How many jobs the queue of `priority` may be running right now"""
+        running = {p: worker.job_counter for p, worker in self.workers.items()}
+        others = [p for p in self.workers if p != priority]
+        waiting = {p: await self.waiting(p) for p in others}
+
+        # slots the other queues are owed, for jobs they have waiting
+        reserved = sum(
+            max(self.shares[p] - running[p], 0) for p in others if waiting[p]
+        )
+        free = self.max_jobs - sum(running.values())
+        allowance = running[priority] + max(free - reserved, 0)
+        # lower TaskPriority values come first
+        if any(waiting[p] for p in others if p.value < priority.value):
+            allowance = min(allowance, max(self.shares[priority], running[priority]))
+        return allowance
+
+
+class PriorityWorker(Worker):
+    """arq worker for one priority's queue, starting jobs only as its `JobSlots` allow"""
+
+    def __init__(self, priority: TaskPriority, slots: JobSlots, **kwargs: Any):
+        super().__init__(
+            queue_name=priority.queue_name, **{**kwargs, "max_jobs": slots.max_jobs}
+        )
+        self.priority = priority
+        self.slots = slots
+        slots.workers[priority] = self
+
+    async def _poll_iteration(self) -> None:
+        self.max_jobs = await self.slots.allowance(self.priority)
+        await super()._poll_iteration()
+
+
+async def run_priority_workers(settings: Any) -> None:
+    """Run one worker per priority queue in this process, sharing context and `settings.max_jobs`
+
+    `settings` is an arq WorkerSettings class; its startup and shutdown run once.
+    """
+    kwargs: Dict[str, Any] = get_kwargs(settings)
+    on_startup = kwargs.pop("on_startup", None)
+    on_shutdown = kwargs.pop("on_shutdown", None)
+    slots = JobSlots(kwargs.pop("max_jobs", 10))
+    ctx: Dict[str, Any] = {}
+    workers: List[PriorityWorker] = [
+        PriorityWorker(priority, slots, handle_signals=False, **kwargs)
+        for priority in sorted(TaskPriority, key=lambda priority: priority.value)
+    ]
+    for worker in workers:
+        # not passed in -- arq swaps an empty ctx for a fresh dict of its own
+        worker.ctx = ctx
+
+    def stop(signum: signal.Signals) -> None:
+        for worker in workers:
+            worker.handle_sig(signum)
+
+    if on_startup:
+        await on_startup(ctx)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop, signum)
+    try:
+        # a worker only returns on shutdown or when it fails -- either way, stop them all
+        runs = [asyncio.ensure_future(worker.async_run()) for worker in workers]
+        await asyncio.wait(runs, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for worker in workers:
+            await worker.close()
+        if on_shutdown:
+            await on_shutdown(ctx)
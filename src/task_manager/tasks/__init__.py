@@ -1 +1 @@
-__all__ = ["process_om"]
+__all__ = ["process_om", "process_om_batch", "process_om_part", "merge_om"]
@@ -1,18 +1,126 @@
 import io
+import asyncio
 
 # used by dependency
 import json
 from arq import Retry
 from dataclasses import asdict
 
-from src.database.models import Om, OmStatus
+from src.database.models import Om, OmStatus, OmStats
 from src.database.models.om_table import OmTable
 from src.storage import StorageBucket
-from src.llm.engines.om.engine import OmEngine, ProgressEvent
+from src.llm.engines.om.engine import DocumentContext, OmEngine, ProgressEvent
+from src.llm.engines.om.checkpoint import RedisCheckpointStore
+from src.llm.engines.om.pdf import count_pages
+from src.task_manager import TaskPriority
+from src.task_manager.dedup import pop_waiting, release_content, waiting_content
+from src.task_manager.fair import fair_share
 
+# Give up on an attempt a little before WorkerSettings.job_timeout, so the job
+#  is retried -- and resumes from its checkpoint -- instead of being killed
+PROCESS_TIMEOUT = 270
 
-async def process_om(ctx, om_id: str, max_tries: int = 5):
-    """Process an OM document"""
+
+async def save_results(om, context: DocumentContext, session, storage) -> None:
+    """Copy an engine's results onto the OM and store its tables"""
+    om.address = context.address
+    om.title = context.title
+    om.description = context.description
+    om.summary = context.running_summary
+    om.square_feet = context.square_feet
+    om.total_units = context.total_units
+    om.property_type = context.property_type
+    om.status = OmStatus.PROCESSED
+
+    # create tables
+    await OmTable.create_many(
+        om_id=om.id,
+        tables=context.tables,
+        session=session,
+        storage=storage,
+        content_hash=om.content_hash,
+    )
+
+
+async def settle_duplicates(ctx, om, session, logger) -> None:
+    """Give the uploads of the same pdf that waited on a finished OM its outcome"""
+    if not om.content_hash or om.status not in (OmStatus.PROCESSED, OmStatus.FAILED):
+        return
+    redis = ctx["redis"]
+    async for om_id in release_content(redis, om.content_hash, om.id):
+        duplicate = await Om.read(om_id, session)
+        if not duplicate or duplicate.status == OmStatus.PROCESSED:
+            continue
+        if om.status == OmStatus.PROCESSED:
+            await duplicate.copy_results(om, session)
+        else:
+            duplicate.status = OmStatus.FAILED
+        await session.commit()
+        await redis.publish(
+            "process_om_status",
+            json.dumps({"om_id": om_id, "status": duplicate.status}),
+        )
+        logger.info(f"settled om -- {om_id} | as om -- {om.id}")
+
+
+async def resume_duplicates(ctx, session, logger) -> None:
+    """Look after uploads still waiting on a pdf whose processing OM never settled them
+
+    A job can end without settling its waiters, e.g. cancelled on its last try.
+    Waiters of an OM that has finished get its outcome now; once the pdf's lock
+    is gone, one waiter is processed in its place and the rest wait on it.
+    """
+    redis = ctx["redis"]
+    async for content_hash, holder_id in waiting_content(redis):
+        if holder_id:
+            holder = await Om.read(holder_id, session)
+            if holder:
+                await settle_duplicates(ctx, holder, session, logger)
+            continue
+        while om_id := await pop_waiting(redis, content_hash):
+            om = await Om.read(om_id, session)
+            if not om or om.status == OmStatus.PROCESSED:
+                continue
+            # someone is waiting on this one -- ahead of backfills
+            await ctx["task_manager"].process_om(
+                om.id,
+                priority=TaskPriority.HIGH,
+                user_id=om.user_id,
+                content_hash=content_hash,
+            )
+            logger.info(f"resumed om -- {om.id} | its pdf's lock is gone")
+            break
+
+
+async def save_stats(om, engine: OmEngine, session, logger) -> None:
+    """Log and record what processing took -- never fails the job"""
+    stats = engine.stats
+    logger.info(
+        f"stats om -- {om.id} | pages={stats.pages} calls={stats.total.calls} "
+        f"cache_hits={stats.total.cache_hits} retries={stats.total.retries} "
+        f"input={stats.total.input_tokens} output={stats.total.output_tokens} "
+        f"cost_usd={stats.total.cost_usd:.4f} wall_seconds={stats.wall_seconds:.1f} "
+        f"skipped_pages={stats.prescreen.skipped_relevant + stats.prescreen.skipped_irrelevant}"
+    )
+    try:
+        await OmStats.create(om.id, stats, session)
+    except Exception as e:
+        logger.exception(f"failed to save stats for om -- {om.id} | {e}")
+
+
+@fair_share
+async def process_om(
+    ctx,
+    om_id: str,
+    split: bool = True,
+    priority: TaskPriority = TaskPriority.MEDIUM,
+    max_tries: int = 5,
+):
+    """Process an OM document
+
+    With `split`, a document longer than `config.om_part_pages` is handed to
+    `process_om_part` jobs, one per page range, instead of processed here.
+    """
     storage = ctx["storage"]
     anthropic = ctx["anthropic"]
     redis = ctx["redis"]
@@ -45,8 +153,23 @@ async def process_om(ctx, om_id: str, max_tries: int = 5):
                 raise ValueError(f"om -- {om_id} not found")
             if om.status == OmStatus.PROCESSED:
                 logger.info(f"om -- {om_id} already processed")
+                await settle_duplicates(ctx, om, session, logger)
                 return
 
+            # an upload of the same pdf may have been processed since this one was queued
+            if om.content_hash:
+                source = await Om.read_processed_by_content_hash(om.content_hash, session)
+                if source:
+                    logger.info(f"om -- {om_id} is a duplicate of om -- {source.id}")
+                    await om.copy_results(source, session)
+                    await session.commit()
+                    await redis.publish(
+                        "process_om_status",
+                        json.dumps({"om_id": om_id, "status": OmStatus.PROCESSED}),
+                    )
+                    await settle_duplicates(ctx, om, session, logger)
+                    return
+
             # Update status to processing and publish status update
             try:
                 om.status = OmStatus.PROCESSING
@@ -67,6 +190,7 @@ async def process_om(ctx, om_id: str, max_tries: int = 5):
                 await session.commit()
 
             # process the om
+            engine = None
             try:
                 # read the om file
                 response = storage.get_object(
@@ -74,39 +198,60 @@ async def process_om(ctx, om_id: str, max_tries: int = 5):
                 )
                 file_content = response.data  # Use .data instead of .read() for MinIO
 
+                part_pages = ctx["config"].om_part_pages
+                if split and part_pages:
+                    total_pages = await asyncio.to_thread(count_pages, io.BytesIO(file_content))
+                    if total_pages > part_pages:
+                        page_ranges = [
+                            (first_page, min(first_page + part_pages - 1, total_pages))
+                            for first_page in range(1, total_pages + 1, part_pages)
+                        ]
+                        for part, page_range in enumerate(page_ranges):
+                            await ctx["task_manager"].process_om_part(
+                                om_id, part, page_range, len(page_ranges),
+                                priority=priority, user_id=om.user_id,
+                            )
+                        logger.info(f"split om -- {om_id} | pages={total_pages} parts={len(page_ranges)}")
+                        return
+
                 # extract the text and get the summary
                 engine = OmEngine(
                     anthropic_client=anthropic,
-                    progress_callback=progress_callback
+                    models=ctx["models"],
+                    progress_callback=progress_callback,
+                    render_service=ctx["render_service"],
+                    image_profile=ctx["image_profile"],
+                    cache=ctx["llm_cache"],
+                    screening_batch_size=ctx["config"].screening_batch_size,
+                    prescreen=ctx["config"].prescreen,
+                    prescreen_audit=ctx["config"].prescreen_audit,
+                    summary_mode=ctx["config"].summary_mode,
+                    rate_limiter=ctx["rate_limiter"],
                 )
-                context = await engine.process_pdf(io.BytesIO(file_content))
-
-                # Update with success
-                om.address = context.address
-                om.title = context.title
-                om.description = context.description
-                om.summary = context.running_summary
-                om.square_feet = context.square_feet
-                om.total_units = context.total_units
-                om.property_type = context.property_type
-                om.status = OmStatus.PROCESSED
-
-                # create tables
-                await OmTable.create_many(
-                    om_id=om.id,
-                    tables=context.tables,
-                    session=session,
-                    storage=storage,
+                # resume from the last completed chunk if an earlier attempt got that far
+                checkpoint = RedisCheckpointStore(redis, f"process_om:checkpoint:{om_id}")
+                context = await asyncio.wait_for(
+                    engine.process_pdf(io.BytesIO(file_content), checkpoint=checkpoint),
+                    timeout=PROCESS_TIMEOUT,
                 )
+                await save_stats(om, engine, session, logger)
+
+                await save_results(om, context, session, storage)
+                await session.commit()
+                await checkpoint.clear()
 
             except Exception as e:
                 logger.exception(f"failed to process om -- {om_id} | {e}")
+                # failed attempts cost tokens too
+                if engine is not None:
+                    await save_stats(om, engine, session, logger)
                 # if we're at max tries, mark as failed
                 if job_try == max_tries:
                     om.status = OmStatus.FAILED
                 raise
             finally:
                 await session.commit()
+                await settle_duplicates(ctx, om, session, logger)
 
     except Exception as e:
         logger.exception(f"failed to process om -- {om_id} | {e}")
@@ -0,0 +1,114 @@
+import io
+import json
+from typing import List
+
+from arq import Retry
+
+from src.database.models import Om, OmStatus, OmStats
+from src.storage import StorageBucket
+from src.llm.engines.om.engine import OmEngine
+from src.llm.engines.om.batch import MessageBatchRunner
+from src.llm.engines.om.checkpoint import RedisCheckpointStore
+from src.task_manager.tasks.process_om import save_results
+
+# Message batches finish within 24 hours -- leave room for several rounds of them
+BATCH_JOB_TIMEOUT = 3 * 24 * 60 * 60
+
+
+async def process_om_batch(ctx, om_ids: List[str], max_tries: int = 5):
+    """Process several OM documents through the message batch API
+
+    Slower than `process_om` but cheaper per token, for backfills. Submitted
+    batch ids are kept in redis under the job id, so a retry picks up the
+    batches it already paid for.
+    """
+    storage = ctx["storage"]
+    redis = ctx["redis"]
+    database = ctx["database"]
+    job_try = ctx["job_try"]
+    logger = ctx["logger"].get_worker_logger(name="process_om_batch", attempt=job_try)
+
+    async def publish_status(om_id: str, status: OmStatus):
+        try:
+            await redis.publish(
+                "process_om_status", json.dumps({"om_id": om_id, "status": status})
+            )
+        except Exception as e:
+            logger.exception(f"failed to publish status update for om -- {om_id} | {e}")
+
+    logger.info(f"processing {len(om_ids)} oms in batch mode")
+    try:
+        async with database.session() as session:
+            oms = []
+            for om_id in om_ids:
+                om = await Om.read(om_id, session)
+                if not om:
+                    logger.error(f"om -- {om_id} not found")
+                    continue
+                if om.status == OmStatus.PROCESSED:
+                    logger.info(f"om -- {om_id} already processed")
+                    continue
+                om.status = OmStatus.PROCESSING
+                oms.append(om)
+            await session.commit()
+            if not oms:
+                return
+            for om in oms:
+                await publish_status(om.id, OmStatus.PROCESSING)
+
+            try:
+                pdf_streams = [
+                    io.BytesIO(
+                        storage.get_object(
+                            bucket=StorageBucket.oms, object_name=om.storage_object_id
+                        ).data
+                    )
+                    for om in oms
+                ]
+                engine = OmEngine(
+                    anthropic_client=ctx["anthropic"],
+                    models=ctx["models"],
+                    render_service=ctx["render_service"],
+                    image_profile=ctx["image_profile"],
+                    cache=ctx["llm_cache"],
+                    prescreen=ctx["config"].prescreen,
+                    prescreen_audit=ctx["config"].prescreen_audit,
+                    rate_limiter=ctx["rate_limiter"],
+                    batch_runner=MessageBatchRunner(
+                        # batch calls skip the rate limiter -- let the client retry them
+                        ctx["anthropic"].with_options(max_retries=2),
+                        poll_interval=ctx["config"].batch_poll_interval,
+                        state=RedisCheckpointStore(
+                            redis,
+                            f"process_om_batch:batches:{ctx['job_id']}",
+                            ttl=BATCH_JOB_TIMEOUT,
+                        ),
+                    ),
+                )
+                contexts = await engine.process_pdfs_batch(pdf_streams)
+                logger.info(
+                    f"stats for {len(oms)} oms | calls={engine.stats.total.calls} "
+                    f"input={engine.stats.total.input_tokens} "
+                    f"output={engine.stats.total.output_tokens} "
+                    f"cost_usd={engine.stats.total.cost_usd:.4f}"
+                )
+
+                for om, context, stats in zip(oms, contexts, engine.batch_stats):
+                    await save_results(om, context, session, storage)
+                    await OmStats.create(om.id, stats, session)
+                await session.commit()
+                for om in oms:
+                    await publish_status(om.id, OmStatus.PROCESSED)
+
+            except Exception as e:
+                logger.exception(f"failed to process oms in batch mode | {e}")
+                if job_try == max_tries:
+                    for om in oms:
+                        om.status = OmStatus.FAILED
+                raise
+            finally:
+                await session.commit()
+
+    except Exception as e:
+        logger.exception(f"failed to process oms in batch mode | {e}")
+        raise Retry(defer=job_try * 60)
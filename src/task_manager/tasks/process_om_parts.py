@@ -0,0 +1,254 @@
+import io
+import asyncio
+import json
+from dataclasses import asdict
+from typing import List
+
+from arq import Retry
+
+from src.database.models import Om, OmStatus
+from src.storage import StorageBucket
+from src.llm.engines.om.engine import DocumentContext, OmEngine, ProgressEvent
+from src.llm.engines.om.checkpoint import RedisCheckpointStore
+from src.task_manager import TaskPriority
+from src.task_manager.fair import fair_share
+from src.task_manager.tasks.process_om import (
+    PROCESS_TIMEOUT,
+    save_results,
+    save_stats,
+    settle_duplicates,
+)
+
+# How long finished page ranges wait in redis for the merge
+PART_TTL = 24 * 60 * 60
+
+
+def part_key(om_id: str, part: int) -> str:
+    return f"process_om:part:{om_id}:{part}"
+
+
+def parts_done_key(om_id: str) -> str:
+    return f"process_om:parts_done:{om_id}"
+
+
+def pages_done_key(om_id: str) -> str:
+    return f"process_om:pages_done:{om_id}"
+
+
+def part_progress(ctx, om_id: str, part: int, page_range: List[int], logger):
+    """Progress callback for one page range, publishing pages done across the whole document
+
+    Each range keeps its own count in redis, and every event publishes their sum.
+    A range failing is retried, so only the OM's own status reports failure.
+    """
+    redis = ctx["redis"]
+
+    async def progress_callback(event: ProgressEvent):
+        if event.status == OmStatus.FAILED:
+            return
+        # a finished range reports its last page, an unfinished one the pages screened
+        pages = event.current_page
+        if event.status == OmStatus.PROCESSED:
+            pages = event.current_page - page_range[0] + 1
+        try:
+            await redis.hset(pages_done_key(om_id), str(part), pages)
+            await redis.expire(pages_done_key(om_id), PART_TTL)
+            done = sum(int(value) for value in await redis.hvals(pages_done_key(om_id)))
+            await redis.publish(
+                "process_om_progress",
+                json.dumps(
+                    {
+                        "om_id": om_id,
+                        **asdict(
+                            ProgressEvent(
+                                status=OmStatus.PROCESSING,
+                                current_page=done,
+                                total_pages=event.total_pages,
+                            )
+                        ),
+                    }
+                ),
+            )
+        except Exception as e:
+            logger.exception(f"Failed to publish progress event: {e}")
+
+    return progress_callback
+
+
+def om_engine(ctx, progress_callback=None) -> OmEngine:
+    return OmEngine(
+        anthropic_client=ctx["anthropic"],
+        models=ctx["models"],
+        progress_callback=progress_callback,
+        render_service=ctx["render_service"],
+        image_profile=ctx["image_profile"],
+        cache=ctx["llm_cache"],
+        screening_batch_size=ctx["config"].screening_batch_size,
+        prescreen=ctx["config"].prescreen,
+        prescreen_audit=ctx["config"].prescreen_audit,
+        summary_mode=ctx["config"].summary_mode,
+        rate_limiter=ctx["rate_limiter"],
+    )
+
+
+@fair_share
+async def process_om_part(
+    ctx,
+    om_id: str,
+    part: int,
+    page_range: List[int],
+    parts: int,
+    priority: TaskPriority = TaskPriority.MEDIUM,
+    max_tries: int = 5,
+):
+    """Process one page range of a split OM document
+
+    The partial context is kept in redis; the last range to finish enqueues
+    `merge_om`. Finished ranges are tracked as a set, so a retried job is
+    never counted twice.
+    """
+    storage = ctx["storage"]
+    redis = ctx["redis"]
+    database = ctx["database"]
+    job_try = ctx["job_try"]
+    logger = ctx["logger"].get_worker_logger(name="process_om_part", attempt=job_try)
+
+    logger.info(
+        f"processing om -- {om_id} | part={part} pages={page_range[0]}-{page_range[1]}"
+    )
+    try:
+        async with database.session() as session:
+            om = await Om.read(om_id, session)
+            if not om:
+                logger.error(f"om -- {om_id} not found")
+                raise ValueError(f"om -- {om_id} not found")
+            if om.status in (OmStatus.PROCESSED, OmStatus.FAILED):
+                logger.info(f"om -- {om_id} already {om.status.value}")
+                return
+
+            result = RedisCheckpointStore(redis, part_key(om_id, part), ttl=PART_TTL)
+            if not await result.load():
+                engine = None
+                try:
+                    response = storage.get_object(
+                        bucket=StorageBucket.oms, object_name=om.storage_object_id
+                    )
+                    engine = om_engine(
+                        ctx, part_progress(ctx, om_id, part, page_range, logger)
+                    )
+                    # resume from the last completed chunk if an earlier attempt got that far
+                    checkpoint = RedisCheckpointStore(
+                        redis, f"process_om:checkpoint:{om_id}:{part}"
+                    )
+                    context = await asyncio.wait_for(
+                        engine.process_pdf(
+                            io.BytesIO(response.data),
+                            checkpoint=checkpoint,
+                            page_range=(page_range[0], page_range[1]),
+                        ),
+                        timeout=PROCESS_TIMEOUT,
+                    )
+                    await save_stats(om, engine, session, logger)
+                    await result.save(asdict(context))
+                    await checkpoint.clear()
+
+                except Exception as e:
+                    logger.exception(
+                        f"failed to process om -- {om_id} part {part} | {e}"
+                    )
+                    if engine is not None:
+                        await save_stats(om, engine, session, logger)
+                    # one range failing for good fails the document
+                    if job_try == max_tries:
+                        om.status = OmStatus.FAILED
+                        await redis.publish(
+                            "process_om_status",
+                            json.dumps({"om_id": om_id, "status": OmStatus.FAILED}),
+                        )
+                    raise
+                finally:
+                    await session.commit()
+                    await settle_duplicates(ctx, om, session, logger)
+
+            # counted and read back at once, so of ranges finishing together only
+            #  the last starts the merge -- a retry may start it again, arq keeps one
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.sadd(parts_done_key(om_id), part)
+                pipe.expire(parts_done_key(om_id), PART_TTL)
+                pipe.scard(parts_done_key(om_id))
+                added, _, done = await pipe.execute()
+            if done >= parts and (added or job_try > 1):
+                await ctx["task_manager"].merge_om(
+                    om_id, parts, priority=priority, user_id=om.user_id
+                )
+
+    except Exception as e:
+        logger.exception(f"failed to process om -- {om_id} part {part} | {e}")
+        # retry with linear backoff
+        raise Retry(defer=job_try * 5)
+
+
+@fair_share
+async def merge_om(ctx, om_id: str, parts: int, max_tries: int = 5):
+    """Combine the page ranges of a split OM document and save the results"""
+    storage = ctx["storage"]
+    redis = ctx["redis"]
+    database = ctx["database"]
+    job_try = ctx["job_try"]
+    logger = ctx["logger"].get_worker_logger(name="merge_om", attempt=job_try)
+
+    logger.info(f"merging om -- {om_id} | parts={parts}")
+    try:
+        async with database.session() as session:
+            om = await Om.read(om_id, session)
+            if not om:
+                logger.error(f"om -- {om_id} not found")
+                raise ValueError(f"om -- {om_id} not found")
+            if om.status == OmStatus.PROCESSED:
+                logger.info(f"om -- {om_id} already processed")
+                await settle_duplicates(ctx, om, session, logger)
+                return
+
+            engine = None
+            try:
+                results = [
+                    RedisCheckpointStore(redis, part_key(om_id, part))
+                    for part in range(parts)
+                ]
+                saved = [await result.load() for result in results]
+                missing = [part for part, state in enumerate(saved) if state is None]
+                if missing:
+                    raise ValueError(f"om -- {om_id} is missing parts {missing}")
+
+                engine = om_engine(ctx)
+                context = await engine.merge_contexts(
+                    [DocumentContext(**state) for state in saved if state]
+                )
+                await save_stats(om, engine, session, logger)
+
+                await save_results(om, context, session, storage)
+                await session.commit()
+                await redis.publish(
+                    "process_om_status",
+                    json.dumps({"om_id": om_id, "status": OmStatus.PROCESSED}),
+                )
+                for result in results:
+                    await result.clear()
+                await redis.delete(parts_done_key(om_id))
+                await redis.delete(pages_done_key(om_id))
+
+            except Exception as e:
+                logger.exception(f"failed to merge om -- {om_id} | {e}")
+                if engine is not None:
+                    await save_stats(om, engine, session, logger)
+                if job_try == max_tries:
+                    om.status = OmStatus.FAILED
+                raise
+            finally:
+                await session.commit()
+                await settle_duplicates(ctx, om, session, logger)
+
+    except Exception as e:
+        logger.exception(f"failed to merge om -- {om_id} | {e}")
+        # retry with linear backoff
+        raise Retry(defer=job_try * 5)
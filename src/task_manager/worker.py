@@ -1,35 +1,117 @@
+import asyncio
+import logging.config
+
+from arq import cron, func
 from arq.connections import RedisSettings
+from arq.logs import default_log_config
 from src.logger import Logger
-from src.task_manager.tasks.process_om import process_om
+from src.task_manager.tasks.process_om import process_om, resume_duplicates
+from src.task_manager.tasks.process_om_batch import process_om_batch, BATCH_JOB_TIMEOUT
+from src.task_manager.tasks.process_om_parts import process_om_part, merge_om
+from src.task_manager import TaskManager
+from src.task_manager.queues import run_priority_workers
 from src.config import Config
 from src.database import AsyncDatabase
 from src.storage import Storage
-from anthropic import Anthropic
+from src.llm.engines.om.pdf import RenderService, IMAGE_PROFILES
+from src.llm.cache import LruResponseCache, RedisResponseCache
+from src.llm.rate_limit import RateLimiter
+from src.llm.engines.om.engine import ModelRouting
+from anthropic import AsyncAnthropic
 from redis.asyncio import Redis
+from dataclasses import replace
+
+
+def model_routing(config: Config) -> ModelRouting:
+    """Build the per call type model routing from config"""
+    if config.anthropic_model:
+        routing = ModelRouting.single(config.anthropic_model)
+    else:
+        routing = ModelRouting()
+    overrides = {
+        "screening": config.anthropic_screening_model,
+        "metadata": config.anthropic_metadata_model,
+        "tables": config.anthropic_tables_model,
+        "summary": config.anthropic_summary_model,
+    }
+    return replace(routing, **{k: v for k, v in overrides.items() if v})
 
 
 async def startup(ctx):
     """Initialize worker context"""
     config = Config()
+    ctx["config"] = config
     ctx["database"] = AsyncDatabase(config.database_path)
     ctx["storage"] = Storage(config)
-    ctx["anthropic"] = Anthropic(api_key=config.secrets.anthropic_api_key)
+    # the engine retries model calls itself, through the rate limiter -- the
+    #  client's own retries would hide rate limit responses from it
+    ctx["anthropic"] = AsyncAnthropic(api_key=config.secrets.anthropic_api_key, max_retries=0)
     ctx["redis"] = Redis.from_url(config.redis_url)
     ctx["logger"] = Logger(config.log_path, config.debug)
+    # jobs enqueue follow-up jobs, e.g. the page ranges of a split OM
+    ctx["task_manager"] = TaskManager(config.redis_url, None, config.om_max_jobs_per_user)
+    # shared by every job on this worker so pdf work is spread across cores
+    ctx["render_service"] = RenderService(max_workers=config.render_workers)
+    ctx["image_profile"] = IMAGE_PROFILES[config.image_profile]
+    ctx["models"] = model_routing(config)
+    match config.llm_cache:
+        case "redis":
+            ctx["llm_cache"] = RedisResponseCache(ctx["redis"], ttl=config.llm_cache_ttl)
+        case "memory":
+            ctx["llm_cache"] = LruResponseCache(ttl=config.llm_cache_ttl)
+        case _:
+            ctx["llm_cache"] = None
+    limits = dict(
+        requests_per_minute=config.anthropic_requests_per_minute,
+        tokens_per_minute=config.anthropic_tokens_per_minute,
+        max_concurrency=config.anthropic_max_concurrency,
+    )
+    match config.rate_limit:
+        case "redis":
+            ctx["rate_limiter"] = RateLimiter(**limits, redis=ctx["redis"])
+        case "memory":
+            ctx["rate_limiter"] = RateLimiter(**limits)
+        case _:
+            ctx["rate_limiter"] = None
 
     await ctx["database"].initialize()
     await ctx["storage"].initialize()
+    await ctx["task_manager"].initialize()
 
 
 async def shutdown(ctx):
     """Cleanup worker context"""
-    pass
+    ctx["render_service"].shutdown()
+    await ctx["task_manager"].shutdown()
+
+
+async def dispatch_jobs(ctx):
+    """Enqueue jobs still waiting on a user slot, and duplicate uploads nobody is left to settle
+
+    Slots also free up when their lease runs out, and waiting uploads once their
+    pdf's lock does.
+    """
+    await ctx["task_manager"].dispatch()
+    logger = ctx["logger"].get_worker_logger(name="dispatch_jobs", attempt=ctx["job_try"])
+    async with ctx["database"].session() as session:
+        await resume_duplicates(ctx, session, logger)
 
 
 class WorkerSettings:
-    """ARQ Worker Settings"""
+    """ARQ Worker Settings
+
+    Run with `python -m src.task_manager.worker` -- the arq cli only drains
+    the default (medium priority) queue.
+    """
 
-    functions = [process_om]
+    functions = [
+        process_om,
+        process_om_part,
+        merge_om,
+        # batch jobs wait on message batches for hours, far past job_timeout
+        func(process_om_batch, timeout=BATCH_JOB_TIMEOUT),
+    ]
+    cron_jobs = [cron(dispatch_jobs, second=0)]
     on_startup = startup
     on_shutdown = shutdown
     redis_settings = RedisSettings.from_dsn(Config().redis_url)
@@ -40,3 +122,8 @@ class WorkerSettings:
     keep_result = 3600
     health_check_interval = 30
     health_check_key = "arq:health-check"
+
+
+if __name__ == "__main__":
+    logging.config.dictConfig(default_log_config(verbose=True))
+    asyncio.run(run_priority_workers(WorkerSettings))
@@ -0,0 +1,79 @@
+import json
+import os
+import resource
+import shutil
+import time
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+from src.llm.engines.om.engine import OmEngine
+from tests.fake_anthropic import FakeAnthropic
+
+# Get the absolute path to the fixtures directory
+FIXTURES_DIR = Path(__file__).parent.parent / "fixtures"
+# Where results are written, one JSON file per fixture, so runs can be diffed
+BENCHMARK_DIR = Path(os.getenv("BENCHMARK_DIR", "benchmark_results"))
+# Seconds the fake client takes per call -- roughly a short model answer
+FAKE_LATENCY = float(os.getenv("BENCHMARK_FAKE_LATENCY", 0.5))
+
+
+def peak_rss_mb(who: int) -> float:
+    # kilobytes on linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(not shutil.which("pdftoppm"), reason="Poppler is not installed")
+@pytest.mark.parametrize("fixture", ["1004_gates_ave.pdf"])
+async def test_process_pdf_throughput(fixture):
+    """Report pages/sec, peak RSS, calls per page and time per stage -- run with --run-slow -s
+
+    Model calls go to a fake client, replaying LLM_RECORDING when given and
+    answering with canned responses otherwise, so the numbers measure the
+    engine rather than the API. Peak RSS is the process' peak so far.
+    """
+    client = FakeAnthropic(recording=os.getenv("LLM_RECORDING"), latency=FAKE_LATENCY)
+    engine = OmEngine(client)
+
+    start = time.perf_counter()
+    context = await engine.process_pdf(BytesIO((FIXTURES_DIR / fixture).read_bytes()))
+    seconds = time.perf_counter() - start
+
+    stats = engine.stats.to_dict()
+    pages = stats["pages"]
+    result = {
+        "fixture": fixture,
+        "fake_latency": FAKE_LATENCY,
+        "pages": pages,
+        "seconds": seconds,
+        "pages_per_second": pages / seconds,
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+        # the render processes
+        "peak_child_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "calls": client.calls,
+        "calls_per_page": client.calls / pages,
+        "replayed_calls": client.calls - client.misses,
+        "stages": stats["stages"],
+        "prescreen": stats["prescreen"],
+    }
+    BENCHMARK_DIR.mkdir(parents=True, exist_ok=True)
+    output = BENCHMARK_DIR / f"process_pdf-{Path(fixture).stem}.json"
+    output.write_text(json.dumps(result, indent=2))
+
+    print(
+        f"\n{fixture}: {pages} pages in {seconds:.1f}s ({result['pages_per_second']:.2f} pages/s), "
+        f"{result['calls_per_page']:.2f} calls/page, peak rss {result['peak_rss_mb']:.0f} MB "
+        f"(+{result['peak_child_rss_mb']:.0f} MB render) -> {output}"
+    )
+    print(
+        f"{'stage':<12} {'calls':>6} {'retries':>8} {'input':>9} {'output':>8} {'call s':>8}"
+    )
+    for stage, row in stats["stages"].items():
+        print(
+            f"{stage:<12} {row['calls']:>6} {row['retries']:>8} {row['input_tokens']:>9} "
+            f"{row['output_tokens']:>8} {row['seconds']:>8.1f}"
+        )
+
+    assert context.current_page == pages
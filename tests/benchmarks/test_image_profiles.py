@@ -0,0 +1,59 @@
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+from pdf2image import convert_from_path
+
+from src.llm.engines.om.pdf import (
+    encode_image,
+    extract_text_range,
+    count_pages,
+    IMAGE_PROFILES,
+)
+
+# Get the absolute path to the fixtures directory
+FIXTURES_DIR = Path(__file__).parent.parent / "fixtures"
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(not shutil.which("pdftoppm"), reason="Poppler is not installed")
+def test_image_profile_benchmark():
+    """Report bytes per page and encode time per image profile -- run with --run-slow -s"""
+    pdf_path = str(FIXTURES_DIR / "1004_gates_ave.pdf")
+    total_pages = count_pages(pdf_path)
+    texts = extract_text_range(pdf_path, 1, total_pages)
+
+    rows = []
+    for name, profile in IMAGE_PROFILES.items():
+        start = time.perf_counter()
+        images = convert_from_path(pdf_path, dpi=profile.dpi)
+        render_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        encoded = [
+            encode_image(img, profile, grayscale=profile.use_grayscale(text))
+            for img, text in zip(images, texts)
+        ]
+        encode_seconds = time.perf_counter() - start
+
+        assert len(encoded) == total_pages
+        rows.append(
+            (
+                name,
+                sum(len(image) for image in encoded) / total_pages,
+                render_seconds / total_pages * 1000,
+                encode_seconds / total_pages * 1000,
+            )
+        )
+
+    print(
+        f"\n{'profile':<10} {'KB/page':>10} {'render ms/page':>15} {'encode ms/page':>15}"
+    )
+    for name, bytes_per_page, render_ms, encode_ms in rows:
+        print(
+            f"{name:<10} {bytes_per_page / 1024:>10.1f} {render_ms:>15.1f} {encode_ms:>15.1f}"
+        )
+
+    sizes = dict((name, bytes_per_page) for name, bytes_per_page, _, _ in rows)
+    assert sizes["default"] < sizes["legacy"]
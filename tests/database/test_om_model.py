@@ -1,5 +1,5 @@
 import pytest
-from src.database.models import Om, OmStatus
+from src.database.models import Om, OmStatus, OmTable
 from src.database.database import AsyncDatabase
 
 pytestmark = pytest.mark.asyncio
@@ -95,3 +95,37 @@ async def test_om_update_nonexistent(session):
     # Test updating a non-existent Om
     with pytest.raises(ValueError, match="Om with id fake-id not found"):
         await Om.update("fake-id", {"status": OmStatus.PROCESSED}, session)
+
+
+async def test_om_copy_results_from_same_content(session):
+    class Storage:
+        def __init__(self):
+            self.objects = {}
+
+        def put_object(self, stream, stream_len, bucket, object_name=None):
+            self.objects[object_name] = stream.read(stream_len)
+            return object_name
+
+    storage = Storage()
+    source = await Om.create(
+        user_id="test-user-id", storage_object_id="abc", content_hash="abc", session=session
+    )
+    await OmTable.create_many(
+        source.id, {"rent_roll": [{"unit": "1"}]}, storage, session, content_hash="abc"
+    )
+    # only a processed upload is worth copying
+    assert await Om.read_processed_by_content_hash("abc", session) is None
+    await Om.update(source.id, {"status": OmStatus.PROCESSED, "title": "Test Title"}, session)
+    assert (await Om.read_processed_by_content_hash("abc", session)).id == source.id
+
+    om = await Om.create(
+        user_id="other-user-id", storage_object_id="abc", content_hash="abc", session=session
+    )
+    await om.copy_results(source, session)
+    assert om.status == OmStatus.PROCESSED
+    assert om.title == "Test Title"
+    tables = await OmTable.read_by_om_id(om.id, session)
+    # the copy shares the stored table data
+    assert [(table.type, table.storage_object_id) for table in tables] == [("rent_roll", "abc/rent_roll.json")]
+    assert storage.objects == {"abc/rent_roll.json": b'[{"unit": "1"}]'}
+
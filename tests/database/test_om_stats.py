@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from src.database.models import Om, OmStats
+from src.database.database import AsyncDatabase
+from src.llm.engines.om.stats import CallUsage, DocumentStats
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+async def db():
+    db = AsyncDatabase(":memory:")
+    await db.initialize()
+    yield db
+    await db.engine.dispose()
+
+
+@pytest.fixture
+async def session(db):
+    async with db.session() as session:
+        yield session
+        await session.rollback()
+
+
+async def test_om_stats_create(session):
+    om = await Om.create(
+        user_id="test-user-id",
+        storage_object_id="test-storage-object-id",
+        session=session,
+    )
+    stats = DocumentStats.from_usage(
+        [
+            CallUsage(
+                "claude-3-5-haiku-20241022",
+                stage="screening",
+                input_tokens=1000,
+                output_tokens=10,
+            ),
+            CallUsage(
+                "claude-3-5-sonnet-20241022",
+                stage="tables",
+                input_tokens=2000,
+                output_tokens=500,
+                attempts=2,
+            ),
+        ],
+        pages=2,
+        wall_seconds=3.5,
+    )
+
+    om_stats = await OmStats.create(om.id, stats, session)
+
+    assert om_stats.id is not None
+    assert om_stats.om_id == om.id
+    assert om_stats.calls == 2
+    assert om_stats.input_tokens == 3000
+    assert om_stats.output_tokens == 510
+    assert om_stats.cost_usd == pytest.approx(stats.total.cost_usd)
+    assert om_stats.wall_seconds == 3.5
+    saved = json.loads(om_stats.stats)
+    assert saved["stages"]["tables"]["retries"] == 1
+    assert saved["pages"] == 2
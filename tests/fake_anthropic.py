@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import anthropic
+from anthropic.types import Message
+
+from src.llm.engines.om.engine import IMAGE_TOKEN_ESTIMATE, estimate_tokens
+from src.llm.engines.om.prompts import (
+    BATCH_SCREENING_SYSTEM,
+    CHUNK_SUMMARY_SYSTEM,
+    EXTRACTION_SYSTEM,
+    METADATA_SYSTEM,
+    PAGE_SCREENING_SYSTEM,
+    SUMMARY_REDUCE_SYSTEM,
+    SUMMARY_UPDATE_SYSTEM,
+    TABLE_DETECTION_SYSTEM,
+)
+
+
+def request_key(params: Dict[str, Any]) -> str:
+    """Identifies a `messages.create` call in a recording"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def estimate_usage(params: Dict[str, Any], text: str) -> Dict[str, int]:
+    """Token counts for a call, estimated the way the engine estimates them"""
+    content = params["messages"][0]["content"]
+    system = "".join(block["text"] for block in params.get("system") or [])
+    prompt = "".join(block["text"] for block in content if block["type"] == "text")
+    images = sum(block["type"] == "image" for block in content)
+    return {
+        "input_tokens": estimate_tokens(system + prompt)
+        + IMAGE_TOKEN_ESTIMATE * images,
+        "output_tokens": estimate_tokens(text),
+    }
+
+
+def canned_response(params: Dict[str, Any]) -> str:
+    """A well-formed answer for every OM engine prompt -- every page relevant, one table per call"""
+    system = "".join(block["text"] for block in params.get("system") or [])
+    prompt = params["messages"][0]["content"][0]["text"]
+    metadata = {
+        "title": "Fake Property",
+        "address": "1 Fake St",
+        "description": "A property described by the fake client",
+        "square_feet": 10000,
+        "total_units": 10,
+        "property_type": "multifamily",
+    }
+    tables = {"rent_roll": [{"unit": "1", "rent": 1000}]}
+
+    if system == PAGE_SCREENING_SYSTEM:
+        return json.dumps({"is_relevant": True, "confidence": 1.0, "reason": "canned"})
+    if system == BATCH_SCREENING_SYSTEM:
+        pages = [int(page) for page in re.findall(r"--- Page (\d+) ---", prompt)]
+        return json.dumps(
+            [
+                {
+                    "page": page,
+                    "is_relevant": True,
+                    "confidence": 1.0,
+                    "reason": "canned",
+                }
+                for page in pages
+            ]
+        )
+    if system == EXTRACTION_SYSTEM:
+        return json.dumps({"metadata": metadata, "tables": tables})
+    if system == TABLE_DETECTION_SYSTEM:
+        return json.dumps(tables)
+    if system == METADATA_SYSTEM:
+        return json.dumps(metadata)
+    if system in (SUMMARY_UPDATE_SYSTEM, CHUNK_SUMMARY_SYSTEM, SUMMARY_REDUCE_SYSTEM):
+        return "A summary written by the fake client."
+    raise ValueError("no canned response for this request")
+
+
+class FakeMessages:
+    def __init__(self, client: "FakeAnthropic | RecordingAnthropic"):
+        self.client = client
+
+    async def create(self, **params) -> Message:
+        return await self.client.create(params)
+
+
+class FakeAnthropic:
+    """Stand-in for `AsyncAnthropic` answering from a recording or canned responses
+
+    `latency` is seconds per call, or a function of the call's params, so
+    benchmarks see a realistic amount of waiting. Calls missing from the
+    recording are answered by `respond`, with estimated token usage.
+    """
+
+    def __init__(
+        self,
+        respond: Callable[[Dict[str, Any]], str] = canned_response,
+        recording: Optional[str | Path] = None,
+        latency: float | Callable[[Dict[str, Any]], float] = 0.0,
+    ):
+        self.respond = respond
+        self.latency = latency
+        self.recorded: Dict[str, Dict[str, Any]] = {}
+        if recording and Path(recording).exists():
+            self.recorded = json.loads(Path(recording).read_text())
+        self.messages = FakeMessages(self)
+        self.calls = 0
+        # calls answered by `respond` because the recording lacked them
+        self.misses = 0
+
+    async def create(self, params: Dict[str, Any]) -> Message:
+        self.calls += 1
+        latency = self.latency(params) if callable(self.latency) else self.latency
+        if latency:
+            await asyncio.sleep(latency)
+
+        recorded = self.recorded.get(request_key(params))
+        if recorded:
+            return message(params["model"], recorded["text"], recorded["usage"])
+        self.misses += 1
+        text = self.respond(params)
+        return message(params["model"], text, estimate_usage(params, text))
+
+
+class RecordingAnthropic:
+    """Wraps a real client, keeping every answer so `FakeAnthropic` can replay it"""
+
+    def __init__(self, client: anthropic.AsyncAnthropic, path: str | Path):
+        self.client = client
+        self.path = Path(path)
+        self.recorded: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            self.recorded = json.loads(self.path.read_text())
+        self.messages = FakeMessages(self)
+
+    async def create(self, params: Dict[str, Any]) -> Message:
+        response = await self.client.messages.create(**params)
+        self.recorded[request_key(params)] = {
+            "text": response.content[0].text,
+            "usage": response.usage.model_dump(),
+        }
+        return response
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.recorded, indent=1))
+
+
+def message(model: str, text: str, usage: Dict[str, Any]) -> Message:
+    return Message.model_validate(
+        {
+            "id": "msg_fake",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": usage,
+        }
+    )
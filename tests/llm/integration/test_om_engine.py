@@ -1,5 +1,6 @@
 from io import BytesIO
 import json
+import os
 from pathlib import Path
 
 import anthropic
@@ -7,15 +8,25 @@ import pytest
 
 from src.llm.engines.om.engine import OmEngine
 from src.config import Config
+from tests.fake_anthropic import RecordingAnthropic
 
 # Get the absolute path to the fixtures directory
 FIXTURES_DIR = Path(__file__).parent.parent.parent / "fixtures"
 
-# @pytest.mark.slow
-async def test_process_pdf_20_w_37_st():
-    pdf_path = FIXTURES_DIR / "20_w_37_st.pdf"
+
+@pytest.mark.slow
+@pytest.mark.parametrize("fixture", ["1004_gates_ave.pdf"])
+async def test_process_pdf(fixture):
+    """Process a fixture against the live API -- run with --run-slow -s
+
+    With LLM_RECORDING set, every answer is saved there for the benchmarks to replay.
+    """
+    pdf_path = FIXTURES_DIR / fixture
     config = Config()
-    anthropic_client = anthropic.Client(api_key=config.secrets.anthropic_api_key)
+    anthropic_client = anthropic.AsyncAnthropic(api_key=config.secrets.anthropic_api_key)
+    recording = os.getenv("LLM_RECORDING")
+    if recording:
+        anthropic_client = RecordingAnthropic(anthropic_client, recording)
     engine = OmEngine(anthropic_client)
     
     try:
@@ -38,3 +49,6 @@ async def test_process_pdf_20_w_37_st():
     except Exception as e:
         print(f"Unexpected error in process_pdf: {e}")
         raise
+    finally:
+        if recording:
+            anthropic_client.save()
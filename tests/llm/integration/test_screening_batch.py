@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import anthropic
+import pytest
+
+from src.config import Config
+from src.llm.engines.om.engine import OmEngine
+from src.llm.engines.om.pdf import count_pages, extract_text_range
+
+# Get the absolute path to the fixtures directory
+FIXTURES_DIR = Path(__file__).parent.parent.parent / "fixtures"
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("fixture", ["1004_gates_ave.pdf"])
+async def test_batched_screening_agrees_with_per_page(fixture):
+    """Report per-page vs batched screening verdicts -- run with --run-slow -s"""
+    pdf_path = str(FIXTURES_DIR / fixture)
+    texts = extract_text_range(pdf_path, 1, count_pages(pdf_path))
+    config = Config()
+    engine = OmEngine(
+        anthropic.AsyncAnthropic(api_key=config.secrets.anthropic_api_key)
+    )
+
+    per_page = [await engine.screen_page(text) for text in texts]
+    batched = await engine.screen_batch(texts)
+
+    agreed = sum(a.is_relevant == b.is_relevant for a, b in zip(per_page, batched))
+    print(
+        f"\n{fixture}: {agreed}/{len(texts)} verdicts agree (1 batched call vs {len(texts)} per-page calls)"
+    )
+    for i, (a, b) in enumerate(zip(per_page, batched), start=1):
+        marker = " " if a.is_relevant == b.is_relevant else "*"
+        print(
+            f"{marker} page {i:>3}: per-page={a.is_relevant!s:<5} batched={b.is_relevant!s:<5} {b.reason}"
+        )
+
+    assert agreed / len(texts) >= 0.75
@@ -0,0 +1,26 @@
+import anthropic
+import httpx
+
+
+def request_text(kwargs) -> str:
+    """Everything the model would read for a `messages.create` call -- system prompt then user text"""
+    system = "".join(block["text"] for block in kwargs.get("system") or [])
+    prompt = kwargs["messages"][0]["content"][0]["text"]
+    return f"{system}\n{prompt}"
+
+
+def api_error(
+    status_code: int, headers: dict | None = None
+) -> anthropic.APIStatusError:
+    """The error the SDK raises for an HTTP error response"""
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return anthropic.AsyncAnthropic(api_key="test")._make_status_error(
+        "error", body=None, response=response
+    )
+
+
+def connection_error() -> anthropic.APIConnectionError:
+    return anthropic.APIConnectionError(
+        request=httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    )
@@ -0,0 +1,334 @@
+import asyncio
+import json
+import re
+from datetime import datetime, UTC
+from io import BytesIO
+from typing import Any, Dict, List
+
+import anthropic
+import httpx
+import pytest
+
+from src.llm.cache import LruResponseCache
+from src.llm.engines.om import engine as engine_module
+from src.llm.engines.om.batch import MessageBatchRunner
+from src.llm.engines.om.checkpoint import MemoryCheckpointStore
+from src.llm.engines.om.engine import OmEngine
+from tests.unit.anthropic_stub import request_text
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeBatchEndpoint:
+    """Local stand-in for the messages and message batches HTTP API
+
+    `answer` maps a request's params to the reply text; requests matching
+    `fail_in_batch` error when they are part of a batch.
+    """
+
+    def __init__(
+        self, answer, polls_until_ended: int = 1, fail_in_batch=lambda params: False
+    ):
+        self.answer = answer
+        self.fail_in_batch = fail_in_batch
+        self.polls_until_ended = polls_until_ended
+        self.batches: Dict[str, Any] = {}
+        self.polls: Dict[str, int] = {}
+        self.messages: List[Any] = []
+
+    def client(self) -> anthropic.AsyncAnthropic:
+        return anthropic.AsyncAnthropic(
+            api_key="test",
+            base_url="http://batch.test",
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(self.handle)),
+        )
+
+    @staticmethod
+    def message(params, text):
+        return {
+            "id": "msg",
+            "type": "message",
+            "role": "assistant",
+            "model": params["model"],
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 10, "output_tokens": 2},
+        }
+
+    def batch(self, batch_id):
+        now = datetime.now(UTC).isoformat()
+        ended = self.polls[batch_id] >= self.polls_until_ended
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0,
+                "succeeded": 0,
+                "errored": 0,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "created_at": now,
+            "expires_at": now,
+            "results_url": f"http://batch.test/v1/messages/batches/{batch_id}/results",
+        }
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if request.method == "POST" and path == "/v1/messages":
+            params = json.loads(request.content)
+            self.messages.append(params)
+            return httpx.Response(200, json=self.message(params, self.answer(params)))
+        if request.method == "POST" and path == "/v1/messages/batches":
+            batch_id = f"batch_{len(self.batches)}"
+            self.batches[batch_id] = json.loads(request.content)["requests"]
+            self.polls[batch_id] = 0
+            return httpx.Response(200, json=self.batch(batch_id))
+
+        batch_id = path.split("/")[4]
+        if path.endswith("/results"):
+            lines = []
+            for item in self.batches[batch_id]:
+                result = (
+                    {
+                        "type": "errored",
+                        "error": {
+                            "type": "error",
+                            "error": {"type": "api_error", "message": "boom"},
+                        },
+                    }
+                    if self.fail_in_batch(item["params"])
+                    else {
+                        "type": "succeeded",
+                        "message": self.message(
+                            item["params"], self.answer(item["params"])
+                        ),
+                    }
+                )
+                lines.append(
+                    json.dumps({"custom_id": item["custom_id"], "result": result})
+                )
+            return httpx.Response(200, content="\n".join(lines).encode())
+        self.polls[batch_id] += 1
+        return httpx.Response(200, json=self.batch(batch_id))
+
+
+async def test_batch_runner_polls_and_resumes():
+    endpoint = FakeBatchEndpoint(
+        lambda params: "ok",
+        polls_until_ended=3,
+        fail_in_batch=lambda params: "fail" in request_text(params),
+    )
+    state = MemoryCheckpointStore()
+    runner = MessageBatchRunner(endpoint.client(), poll_interval=0, state=state)
+    requests = {
+        name: {
+            "model": "m",
+            "max_tokens": 10,
+            "messages": [{"role": "user", "content": [{"type": "text", "text": name}]}],
+        }
+        for name in ("a", "b", "fail")
+    }
+
+    messages = await runner.run("screening", requests)
+    # kept polling until the batch ended (fetching results retrieves it once more)
+    assert endpoint.polls["batch_0"] == 4
+    # errored requests are left for the caller
+    assert {
+        custom_id: message.content[0].text for custom_id, message in messages.items()
+    } == {"a": "ok", "b": "ok"}
+
+    # a retried job finds the batch it already submitted
+    await runner.run("screening", requests)
+    assert list(endpoint.batches) == ["batch_0"]
+    assert await state.load() == {"screening": "batch_0"}
+
+
+class StubPageImage:
+    def __init__(self, page_number: int):
+        self.page_number = page_number
+
+    async def render(self) -> bytes:
+        return b"image"
+
+
+def answer(params):
+    prompt = request_text(params)
+    pages = re.findall(r"page \d+ of doc \d+", prompt)
+    if "is_relevant" in prompt:
+        page = int(pages[0].split()[1])
+        return json.dumps(
+            {"is_relevant": page != 2, "confidence": 1.0, "reason": "stub"}
+        )
+    if "combined summary text" in prompt:
+        sections = re.findall(
+            r"--- Section \d+ ---\n(.*?)(?=\n\n--- Section|\n\nProvide)", prompt, re.S
+        )
+        return f"combined({' | '.join(sections)})"
+    if "summary text" in prompt:
+        return f"summary({prompt.split('Text: ')[1].rsplit(chr(10) * 2, 1)[0]})"
+    doc = pages[0].split()[-1]
+    # the first chunk of doc 1 has no address
+    address = None if pages[0] == "page 1 of doc 1" else f"address {doc}"
+    metadata = {
+        "title": f"title {doc}",
+        "address": address,
+        "description": f"description {pages[0]}",
+    }
+    if "table types" in prompt:
+        tables = {"rent_roll": [{"source": page} for page in pages]}
+        return json.dumps(
+            {"metadata": metadata, "tables": tables}
+            if '"metadata"' in prompt
+            else tables
+        )
+    return json.dumps(metadata)
+
+
+@pytest.fixture
+def two_pages_per_chunk(monkeypatch):
+    """Budgets that close a chunk every two relevant pages, and give each its own summary"""
+    image_tokens = engine_module.IMAGE_TOKEN_ESTIMATE
+    monkeypatch.setattr(
+        engine_module, "EXTRACTION_INPUT_TOKEN_BUDGET", 2 * image_tokens + 100
+    )
+    monkeypatch.setattr(engine_module, "SUMMARY_INPUT_TOKEN_BUDGET", 10)
+
+
+async def test_process_pdfs_batch_matches_interactive(monkeypatch, two_pages_per_chunk):
+    async def extract_pdf(pdf_stream, *args):
+        doc = pdf_stream.getvalue().decode()
+        for i in range(1, 6):
+            yield f"page {i} of doc {doc}", StubPageImage(i), 5
+
+    monkeypatch.setattr(engine_module, "extract_pdf", extract_pdf)
+    # the table request of one chunk errors in the batch, so it is retried as an ordinary call
+    endpoint = FakeBatchEndpoint(
+        answer,
+        fail_in_batch=lambda params: "table types" in request_text(params)
+        and "page 4 of doc 0" in request_text(params),
+    )
+    client = endpoint.client()
+    engine = OmEngine(
+        client,
+        prescreen=False,
+        batch_runner=MessageBatchRunner(client, poll_interval=0),
+    )
+
+    first, second = await engine.process_pdfs_batch([BytesIO(b"0"), BytesIO(b"1")])
+
+    # screening, extraction, the metadata doc 1 is still missing, then one level of summary reduction
+    assert len(endpoint.batches) == 4
+    assert len(endpoint.messages) == 1
+    assert engine.usage
+
+    for pdf_stream, context in ((BytesIO(b"0"), first), (BytesIO(b"1"), second)):
+        interactive = await OmEngine(client, prescreen=False).process_pdf(pdf_stream)
+        assert context.metadata() == interactive.metadata()
+        assert context.tables == interactive.tables
+        assert context.current_page == interactive.current_page == 5
+    assert second.address == "address 1"
+    assert first.chunk_summaries == [
+        "summary(page 1 of doc 0\npage 3 of doc 0)",
+        "summary(page 4 of doc 0\npage 5 of doc 0)",
+    ]
+    assert first.running_summary == f"combined({' | '.join(first.chunk_summaries)})"
+
+
+async def test_process_pdfs_batch_keeps_chunk_order_with_cached_summaries(
+    monkeypatch, two_pages_per_chunk
+):
+    async def extract_pdf(pdf_stream, *args):
+        for i in range(1, 6):
+            yield f"page {i} of doc 0", StubPageImage(i), 5
+
+    monkeypatch.setattr(engine_module, "extract_pdf", extract_pdf)
+    endpoint = FakeBatchEndpoint(answer)
+    client = endpoint.client()
+    cache = LruResponseCache()
+    engine = OmEngine(
+        client,
+        prescreen=False,
+        batch_runner=MessageBatchRunner(client, poll_interval=0),
+        cache=cache,
+    )
+    await engine.process_pdfs_batch([BytesIO(b"0")])
+
+    # only the second chunk's summary is answered from the cache next time
+    for key, value in list(cache.entries.items()):
+        if not value[0].startswith("summary(page 4"):
+            cache._remove(key)
+    (context,) = await engine.process_pdfs_batch([BytesIO(b"0")])
+
+    assert context.chunk_summaries == [
+        "summary(page 1 of doc 0\npage 3 of doc 0)",
+        "summary(page 4 of doc 0\npage 5 of doc 0)",
+    ]
+
+
+async def test_process_pdfs_batch_asks_again_for_unusable_metadata(
+    monkeypatch, two_pages_per_chunk
+):
+    async def extract_pdf(pdf_stream, *args):
+        doc = pdf_stream.getvalue().decode()
+        for i in range(1, 6):
+            yield f"page {i} of doc {doc}", StubPageImage(i), 5
+
+    refused = []
+
+    def refuse_metadata_once(params):
+        prompt = request_text(params)
+        if not refused and "table types" not in prompt and "title" in prompt:
+            refused.append(params)
+            return "Sorry, I can't find that."
+        return answer(params)
+
+    monkeypatch.setattr(engine_module, "extract_pdf", extract_pdf)
+    endpoint = FakeBatchEndpoint(refuse_metadata_once)
+    client = endpoint.client()
+    cache = LruResponseCache()
+    engine = OmEngine(
+        client,
+        prescreen=False,
+        batch_runner=MessageBatchRunner(client, poll_interval=0),
+        cache=cache,
+    )
+
+    (context,) = await engine.process_pdfs_batch([BytesIO(b"1")])
+
+    assert refused
+    # the refusal is asked again on its own, and never cached
+    assert len(endpoint.messages) == 1
+    assert context.address == "address 1"
+    assert all("Sorry" not in value for value, _ in cache.entries.values())
+
+
+async def test_process_pdfs_batch_renders_a_documents_pages_together(monkeypatch):
+    rendering = []
+    most_at_once = []
+
+    class SlowPageImage(StubPageImage):
+        async def render(self) -> bytes:
+            rendering.append(self.page_number)
+            most_at_once.append(len(rendering))
+            await asyncio.sleep(0)
+            rendering.remove(self.page_number)
+            return b"image"
+
+    async def extract_pdf(pdf_stream, *args):
+        for i in range(1, 6):
+            yield f"page {i} of doc 0", SlowPageImage(i), 5
+
+    monkeypatch.setattr(engine_module, "extract_pdf", extract_pdf)
+    client = FakeBatchEndpoint(answer).client()
+    engine = OmEngine(
+        client,
+        prescreen=False,
+        batch_runner=MessageBatchRunner(client, poll_interval=0),
+    )
+    await engine.process_pdfs_batch([BytesIO(b"0")])
+
+    # page 2 is irrelevant, and never rendered
+    assert max(most_at_once) == len(most_at_once) == 4
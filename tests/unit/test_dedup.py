@@ -0,0 +1,126 @@
+import fnmatch
+from types import SimpleNamespace
+
+import pytest
+
+from src.database.database import AsyncDatabase
+from src.database.models import Om, OmStatus
+from src.task_manager import TaskManager
+from src.task_manager.dedup import claim_content, content_lock_key, content_waiting_key
+from src.task_manager.tasks.process_om import resume_duplicates
+
+
+class Redis:
+    """Stand-in for the few redis commands dedup uses, keeping keys in memory"""
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.enqueued = []
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode()
+        return True
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+    async def exists(self, key):
+        return key in self.values or key in self.sets
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def sadd(self, key, member):
+        self.sets.setdefault(key, set()).add(member.encode())
+
+    async def srem(self, key, member):
+        members = self.sets.get(key, set())
+        if member.encode() not in members:
+            return 0
+        members.remove(member.encode())
+        return 1
+
+    async def spop(self, key):
+        members = self.sets.get(key)
+        if not members:
+            return None
+        member = min(members)
+        members.remove(member)
+        if not members:
+            del self.sets[key]
+        return member
+
+    async def scan_iter(self, match):
+        for key in list(self.sets):
+            if fnmatch.fnmatchcase(key, match):
+                yield key.encode()
+
+    async def publish(self, channel, message):
+        pass
+
+    async def enqueue_job(self, function, *args, **kwargs):
+        self.enqueued.append((function, args))
+
+
+@pytest.fixture
+async def session():
+    db = AsyncDatabase(":memory:")
+    await db.initialize()
+    async with db.session() as session:
+        yield session
+        await session.rollback()
+    await db.engine.dispose()
+
+
+async def upload(session, content_hash):
+    om = await Om.create(
+        user_id="user",
+        storage_object_id=content_hash,
+        content_hash=content_hash,
+        session=session,
+    )
+    await session.commit()
+    return om
+
+
+@pytest.mark.asyncio
+async def test_waiters_nobody_settled_are_resumed(session):
+    redis = Redis()
+    task_manager = TaskManager("redis://localhost", None)
+    task_manager.redis_pool = redis
+    ctx = {"redis": redis, "task_manager": task_manager}
+    logger = SimpleNamespace(info=lambda message: None)
+
+    # the first upload finished, but its job ended before settling the second
+    finished = await upload(session, "a")
+    assert await claim_content(redis, "a", finished.id)
+    settled = await upload(session, "a")
+    assert not await claim_content(redis, "a", settled.id)
+    await Om.update(
+        finished.id, {"status": OmStatus.PROCESSED, "title": "Title"}, session
+    )
+
+    # the lock of the first upload ran out with its job gone
+    lost = await upload(session, "b")
+    assert await claim_content(redis, "b", lost.id)
+    first, second = sorted(
+        [await upload(session, "b"), await upload(session, "b")], key=lambda om: om.id
+    )
+    assert not await claim_content(redis, "b", first.id)
+    assert not await claim_content(redis, "b", second.id)
+    await redis.delete(content_lock_key("b"))
+
+    await resume_duplicates(ctx, session, logger)
+
+    assert (await Om.read(settled.id, session)).title == "Title"
+    assert await redis.get(content_lock_key("a")) is None
+    # one waiter runs in the lost one's place, and the other waits on it
+    assert redis.enqueued == [("process_om", (first.id,))]
+    assert await redis.get(content_lock_key("b")) == first.id.encode()
+    assert redis.sets == {content_waiting_key("b"): {second.id.encode()}}
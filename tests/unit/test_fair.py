@@ -0,0 +1,113 @@
+import pytest
+from arq.connections import ArqRedis
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeAsyncRedisConnection
+from redis.asyncio import ConnectionPool
+
+from src.task_manager.fair import FairScheduler
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+async def redis():
+    """An arq pool over an in-memory redis that runs the scheduler's Lua scripts"""
+    redis = ArqRedis(
+        connection_pool=ConnectionPool(
+            connection_class=FakeAsyncRedisConnection, server=FakeServer()
+        )
+    )
+    yield redis
+    await redis.aclose()
+
+
+def recording(scheduler):
+    """The labels of the jobs `scheduler` hands to arq, in order"""
+    dispatched = []
+    enqueue_job = scheduler.redis.enqueue_job
+
+    async def record(function, label, **kwargs):
+        job = await enqueue_job(function, label, **kwargs)
+        if job is not None:
+            dispatched.append(label)
+        return job
+
+    scheduler.redis.enqueue_job = record
+    return dispatched
+
+
+async def test_users_take_turns(redis):
+    scheduler = FairScheduler(redis, max_jobs_per_user=1)
+    dispatched = recording(scheduler)
+
+    jobs = {}
+    for user, count in (("a", 3), ("b", 3), ("c", 1)):
+        for i in range(count):
+            jobs[f"{user}{i}"] = await scheduler.submit(user, "job", f"{user}{i}")
+    assert dispatched == ["a0", "b0", "c0"]
+
+    for label in ("a0", "b0", "c0"):
+        await scheduler.release(jobs[label])
+    assert await scheduler.dispatch() == 2
+    for label in ("a1", "b1"):
+        await scheduler.release(jobs[label])
+    assert await scheduler.dispatch() == 2
+
+    # a user with more jobs queued doesn't get ahead of the others
+    assert dispatched == ["a0", "b0", "c0", "a1", "b1", "a2", "b2"]
+    assert await scheduler.dispatch() == 0
+
+
+async def test_users_are_capped(redis):
+    scheduler = FairScheduler(redis, max_jobs_per_user=2)
+    dispatched = recording(scheduler)
+
+    jobs = [await scheduler.submit("a", "job", f"a{i}") for i in range(5)]
+    await scheduler.submit("b", "job", "b0")
+
+    assert dispatched == ["a0", "a1", "b0"]
+    assert await scheduler.running("a") == 2
+    assert await scheduler.dispatch() == 0
+
+    # a finished job lets the next one in, and releasing it again changes nothing
+    await scheduler.release(jobs[0])
+    await scheduler.release(jobs[0])
+    assert await scheduler.dispatch() == 1
+    assert dispatched[-1] == "a2"
+    assert await scheduler.running("a") == 2
+
+
+async def test_expired_leases_give_their_slots_back(redis):
+    scheduler = FairScheduler(redis, max_jobs_per_user=1)
+    dispatched = recording(scheduler)
+
+    lost = await scheduler.submit("a", "job", "a0")
+    await scheduler.submit("a", "job", "a1")
+    assert dispatched == ["a0"]
+
+    # the job's worker went away, and its lease ran out without a release
+    await redis.zadd("fair:running:a", {lost: 0})
+
+    assert await scheduler.dispatch() == 1
+    assert dispatched == ["a0", "a1"]
+    assert await scheduler.running("a") == 1
+
+
+async def test_jobs_are_deduplicated_by_id(redis):
+    scheduler = FairScheduler(redis, max_jobs_per_user=1)
+    await redis.enqueue_job("job", "direct", _job_id="queued")
+    dispatched = recording(scheduler)
+
+    running = await scheduler.submit("a", "job", "a0")
+    # while pending, the first job with an id wins
+    assert await scheduler.submit("a", "job", "first", _job_id="same") == "same"
+    assert await scheduler.submit("a", "job", "second", _job_id="same") == "same"
+    await scheduler.release(running)
+    assert await scheduler.dispatch() == 1
+    assert dispatched == ["a0", "first"]
+
+    # a job arq already has is not enqueued again, and holds no slot
+    await scheduler.release("same")
+    await scheduler.submit("a", "job", "again", _job_id="queued")
+    assert dispatched == ["a0", "first"]
+    assert await scheduler.running("a") == 0
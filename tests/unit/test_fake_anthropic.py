@@ -0,0 +1,67 @@
+from io import BytesIO
+
+import pytest
+
+from src.llm.engines.om import engine as engine_module
+from src.llm.engines.om.engine import OmEngine
+from tests.fake_anthropic import FakeAnthropic, RecordingAnthropic, canned_response
+
+pytestmark = pytest.mark.asyncio
+
+
+class StubPageImage:
+    def __init__(self, page_number: int):
+        self.page_number = page_number
+
+    async def render(self) -> bytes:
+        return b"image"
+
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+    async def extract_pdf(pdf_stream, *args):
+        for i in range(1, 8):
+            yield f"page {i}: rent roll for unit {i}", StubPageImage(i), 7
+
+    monkeypatch.setattr(engine_module, "extract_pdf", extract_pdf)
+
+
+@pytest.mark.parametrize("screening_batch_size", [1, 4])
+async def test_canned_responses_run_the_whole_pipeline(fake_pdf, screening_batch_size):
+    client = FakeAnthropic(latency=0.01)
+    engine = OmEngine(
+        client, prescreen=False, screening_batch_size=screening_batch_size
+    )
+
+    context = await engine.process_pdf(BytesIO(b""))
+
+    assert context.current_page == 7
+    assert context.title == "Fake Property"
+    assert context.tables["rent_roll"]
+    assert context.running_summary
+    assert client.calls == engine.stats.total.calls
+    assert engine.stats.total.input_tokens > 0
+
+
+async def test_recorded_calls_replay(fake_pdf, tmp_path):
+    path = tmp_path / "recording.json"
+
+    def respond(params):
+        answer = canned_response(params)
+        return answer.replace("Fake Property", "Recorded Property")
+
+    recorder = RecordingAnthropic(FakeAnthropic(respond), path)
+    recorded = await OmEngine(recorder, prescreen=False).process_pdf(BytesIO(b""))
+    recorder.save()
+
+    # replay never reaches `respond`
+    def unreachable(params):
+        raise AssertionError("not recorded")
+
+    client = FakeAnthropic(unreachable, recording=path)
+    replayed = await OmEngine(client, prescreen=False).process_pdf(BytesIO(b""))
+
+    assert replayed.title == recorded.title == "Recorded Property"
+    assert replayed.tables == recorded.tables
+    assert replayed.running_summary == recorded.running_summary
+    assert client.misses == 0
@@ -0,0 +1,170 @@
+import asyncio
+import json
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+
+from src.llm.cache import cache_key, LruResponseCache, RedisResponseCache
+from src.llm.engines.om import engine as engine_module
+from src.llm.engines.om.engine import OmEngine
+from tests.unit.anthropic_stub import request_text
+
+
+def test_cache_key():
+    key = cache_key("model", "prompt", b"image", 100, 0)
+    assert key == cache_key("model", "prompt", b"image", 100, 0)
+    assert key != cache_key("model", "prompt", b"other", 100, 0)
+    assert key != cache_key("other", "prompt", b"image", 100, 0)
+    assert key != cache_key("model", "prompt", None, 100, 0)
+    assert key != cache_key("model", "prompt", b"image", 200, 0)
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_by_size():
+    cache = LruResponseCache(max_bytes=10)
+    await cache.set("a", "aaaa")
+    await cache.set("b", "bbbb")
+    # touch a so b is the least recently used
+    assert await cache.get("a") == "aaaa"
+    await cache.set("c", "cccc")
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "aaaa"
+    assert await cache.get("c") == "cccc"
+    assert cache.size == 8
+
+
+@pytest.mark.asyncio
+async def test_lru_expires_entries():
+    cache = LruResponseCache(ttl=0.01)
+    await cache.set("a", "aaaa")
+    await asyncio.sleep(0.02)
+    assert await cache.get("a") is None
+    assert cache.size == 0
+
+
+class Redis:
+    """Stand-in for the redis commands the cache uses, keeping keys and their ttl in memory"""
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+        self.down = False
+
+    async def get(self, key):
+        if self.down:
+            raise ConnectionError("redis is down")
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        if self.down:
+            raise ConnectionError("redis is down")
+        self.values[key] = value.encode()
+        self.ttls[key] = ex
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_prefixes_keys_and_expires_them():
+    redis = Redis()
+    cache = RedisResponseCache(redis, ttl=60)
+    await cache.set("a", "aaaa")
+
+    assert redis.values == {"llm:response:a": b"aaaa"}
+    assert redis.ttls == {"llm:response:a": 60}
+    assert await cache.get("a") == "aaaa"
+    assert await cache.get("b") is None
+
+    # a cache that can't reach redis misses, and never fails the call
+    redis.down = True
+    assert await cache.get("a") is None
+    await cache.set("b", "bbbb")
+    assert "llm:response:b" not in redis.values
+
+
+@pytest.mark.asyncio
+async def test_engine_rerun_is_served_from_cache(monkeypatch):
+    async def extract_pdf(pdf_stream, *args):
+        for i in range(4):
+            yield f"page {i}", None, 4
+
+    monkeypatch.setattr(engine_module, "extract_pdf", extract_pdf)
+
+    class Messages:
+        calls = 0
+
+        async def create(self, **kwargs):
+            self.calls += 1
+            prompt = request_text(kwargs)
+            if "is_relevant" in prompt:
+                text = json.dumps(
+                    {"is_relevant": True, "confidence": 1.0, "reason": "stub"}
+                )
+            else:
+                text = "summary"
+            return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+    messages = Messages()
+    cache = LruResponseCache()
+
+    first = await OmEngine(
+        SimpleNamespace(messages=messages), cache=cache, prescreen=False
+    ).process_pdf(BytesIO(b""))
+    calls = messages.calls
+    assert calls > 0
+
+    second = await OmEngine(
+        SimpleNamespace(messages=messages), cache=cache, prescreen=False
+    ).process_pdf(BytesIO(b""))
+    assert messages.calls == calls
+    assert second == first
+
+
+@pytest.mark.asyncio
+async def test_unusable_answers_are_not_cached(monkeypatch):
+    real_sleep = asyncio.sleep
+
+    async def no_sleep(delay, *args):
+        await real_sleep(0)
+
+    monkeypatch.setattr(engine_module.asyncio, "sleep", no_sleep)
+    answers = [
+        json.dumps({"is_relevant": True, "reason": "no confidence"}),
+        json.dumps({"is_relevant": True, "confidence": 1.0, "reason": "stub"}),
+    ]
+
+    class Messages:
+        calls = 0
+
+        async def create(self, **kwargs):
+            self.calls += 1
+            return SimpleNamespace(
+                content=[SimpleNamespace(text=answers[min(self.calls, 2) - 1])]
+            )
+
+    messages = Messages()
+    cache = LruResponseCache()
+    # a stale bad answer from before validation is asked again too
+    engine = OmEngine(SimpleNamespace(messages=messages), cache=cache)
+    await cache.set(
+        engine.call_cache_key(
+            dict(
+                model=engine.models.screening,
+                prompt=engine_module.PAGE_SCREENING_PROMPT.format(text="page"),
+                system=engine_module.PAGE_SCREENING_SYSTEM,
+                max_tokens=engine_module.PAGE_SCREENING_MAX_TOKENS,
+            )
+        ),
+        answers[0],
+    )
+
+    page = await engine.screen_page("page")
+    assert page.is_relevant
+    assert messages.calls == 2
+
+    # only the good answer was kept
+    page = await OmEngine(SimpleNamespace(messages=messages), cache=cache).screen_page(
+        "page"
+    )
+    assert page.is_relevant
+    assert messages.calls == 2
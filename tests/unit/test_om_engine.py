@@ -0,0 +1,694 @@
+import anthropic
+import asyncio
+import json
+import re
+import time
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+
+from src.llm.engines.om import engine as engine_module
+from src.llm.engines.om import prompts
+from src.llm.engines.om.engine import (
+    CHUNK_PAGE_LIMIT,
+    PIPELINE_QUEUE_SIZE,
+    PROMPT_CACHE_MIN_TOKENS,
+    estimate_tokens,
+    ModelRouting,
+    OmEngine,
+    SummaryMode,
+)
+from src.llm.cache import LruResponseCache
+from src.llm.engines.om.checkpoint import MemoryCheckpointStore
+from tests.fake_anthropic import FakeAnthropic, canned_response
+from tests.unit.anthropic_stub import connection_error, request_text
+
+_real_sleep = asyncio.sleep
+
+
+async def _no_sleep(delay, *args):
+    """Stand-in for asyncio.sleep that skips retry backoff delays"""
+    await _real_sleep(0)
+
+
+def with_metadata(prompt: str, tables: dict) -> dict:
+    """Answer a table request, in the combined format when metadata was asked for too"""
+    if '"metadata"' not in prompt:
+        return tables
+    return {
+        "metadata": {"title": "t", "address": "a", "description": "d"},
+        "tables": tables,
+    }
+
+
+class StubPageImage:
+    def __init__(self, page_number: int, rendered: list | None = None):
+        self.page_number = page_number
+        self.rendered = rendered if rendered is not None else []
+
+    async def render(self) -> bytes:
+        self.rendered.append(self.page_number)
+        return b"image"
+
+
+@pytest.fixture
+def fake_pdf(request, monkeypatch):
+    """Stub `extract_pdf` with a document of "page 1" to "page N", returning the pages rendered
+
+    N is 3 unless parametrized indirectly; a `page_range` is honored like the real one.
+    """
+    total_pages = getattr(request, "param", 3)
+    rendered: list = []
+
+    async def extract_pdf(
+        pdf_stream, render_service=None, profile=None, page_range=None
+    ):
+        first, last = page_range or (1, total_pages)
+        for i in range(first, last + 1):
+            yield f"page {i}", StubPageImage(i, rendered), total_pages
+
+    monkeypatch.setattr(engine_module, "extract_pdf", extract_pdf)
+    return rendered
+
+
+@pytest.fixture
+def three_pages_per_chunk(monkeypatch):
+    """Budgets that close a chunk every three relevant pages, and give each its own summary"""
+    image_tokens = engine_module.IMAGE_TOKEN_ESTIMATE
+    monkeypatch.setattr(
+        engine_module, "EXTRACTION_INPUT_TOKEN_BUDGET", 3 * image_tokens + 100
+    )
+    monkeypatch.setattr(engine_module, "SUMMARY_INPUT_TOKEN_BUDGET", 8)
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_runs_overlap(fake_pdf):
+    client = FakeAnthropic(latency=0.05)
+    intervals = []
+
+    async def run():
+        engine = OmEngine(client, prescreen=False)
+        start = time.monotonic()
+        context = await engine.process_pdf(BytesIO(b""))
+        intervals.append((start, time.monotonic()))
+        return context
+
+    contexts = await asyncio.gather(run(), run())
+
+    assert contexts[0] == contexts[1]
+    (first_start, first_end), (second_start, second_end) = sorted(intervals)
+    # the second run must start before the first one finishes
+    assert second_start < first_end
+    # and together they take far less than running them back to back
+    serial = client.calls * client.latency
+    assert max(first_end, second_end) - first_start < serial * 0.75
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_bounds_screening_ahead_of_extraction(
+    monkeypatch, three_pages_per_chunk
+):
+    total_pages = 120
+    rendered = []
+    extracted = set()
+    ahead = 0
+
+    class PageImage(StubPageImage):
+        async def render(self) -> bytes:
+            nonlocal ahead
+            rendered.append(self.page_number)
+            ahead = max(ahead, len(rendered) - len(extracted))
+            return b"image"
+
+    async def extract_pdf(pdf_stream, *args):
+        for i in range(total_pages):
+            yield f"page {i}", PageImage(i), total_pages
+
+    monkeypatch.setattr(engine_module, "extract_pdf", extract_pdf)
+    in_flight = 0
+    max_in_flight = 0
+
+    class Messages:
+        async def create(self, **kwargs):
+            nonlocal in_flight, max_in_flight
+            prompt = request_text(kwargs)
+            if "is_relevant" in prompt:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+                # later pages answer first
+                page = int(prompt.split("page ")[-1].split()[0])
+                await asyncio.sleep(0.001 * (3 - page % 3))
+                in_flight -= 1
+                text = json.dumps(
+                    {
+                        "is_relevant": page % 2 == 0,
+                        "confidence": 1.0,
+                        "reason": f"page {page}",
+                    }
+                )
+            elif "tables" in prompt:
+                # table extraction is the slow stage
+                await asyncio.sleep(0.005)
+                pages = re.findall(r"page (\d+)", prompt)
+                extracted.update(int(page) for page in pages)
+                text = json.dumps(
+                    with_metadata(
+                        prompt, {"rent_roll": [{"source": page} for page in pages]}
+                    )
+                )
+            else:
+                text = "summary"
+            return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+    events = []
+
+    async def progress_callback(event):
+        events.append(event.current_page)
+
+    engine = OmEngine(
+        SimpleNamespace(messages=Messages()),
+        progress_callback=progress_callback,
+        screening_concurrency=3,
+        prescreen=False,
+    )
+    context = await engine.process_pdf(BytesIO(b""))
+
+    assert max_in_flight == 3
+    sources = [int(row["source"]) for row in context.tables["rent_roll"]]
+    assert sources == list(range(0, total_pages, 2))
+    assert events == list(range(1, total_pages + 1)) + [total_pages]
+    # screened batches waiting on a slot, the chunk being built, queued chunks,
+    #  the chunk being extracted and the one waiting to be queued -- three
+    #  relevant, rendered pages to a chunk
+    bound = 3 + 3 * (PIPELINE_QUEUE_SIZE + 3)
+    assert ahead <= bound < total_pages
+
+
+@pytest.mark.parametrize("fake_pdf", [9], indirect=True)
+@pytest.mark.asyncio
+async def test_process_pdf_pipelines_stages(fake_pdf):
+    calls = []
+
+    class Messages:
+        async def create(self, **kwargs):
+            prompt = request_text(kwargs)
+            if "is_relevant" in prompt:
+                calls.append("screen")
+                # early pages are slower to screen than later ones
+                page = int(prompt.split("page ")[-1].split()[0])
+                await asyncio.sleep(0.015 if page <= 3 else 0.01)
+                text = json.dumps(
+                    {"is_relevant": True, "confidence": 1.0, "reason": "stub"}
+                )
+            elif "summary text" in prompt:
+                calls.append("summary")
+                await asyncio.sleep(0.02)
+                text = "summary"
+            elif "tables" in prompt:
+                calls.append("tables")
+                await asyncio.sleep(0.02)
+                pages = re.findall(r"page \d+", prompt)
+                text = json.dumps(
+                    with_metadata(
+                        prompt, {"rent_roll": [{"source": page} for page in pages]}
+                    )
+                )
+            else:
+                calls.append("metadata")
+                text = json.dumps({"title": "t", "address": "a", "description": "d"})
+            return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+    engine = OmEngine(
+        SimpleNamespace(messages=Messages()), screening_concurrency=2, prescreen=False
+    )
+    context = await engine.process_pdf(BytesIO(b""))
+
+    # tables are merged in page order regardless of screening completion order
+    sources = [row["source"] for row in context.tables["rent_roll"]]
+    assert list(dict.fromkeys(sources)) == [f"page {i}" for i in range(1, 10)]
+    assert context.title == "t"
+    # table extraction started before the last page was screened
+    assert calls.index("tables") < len(calls) - 1 - calls[::-1].index("screen")
+
+
+@pytest.mark.parametrize("fake_pdf", [6], indirect=True)
+@pytest.mark.asyncio
+async def test_process_pdf_renders_only_relevant_pages(fake_pdf):
+    images = []
+
+    def respond(params):
+        content = params["messages"][0]["content"]
+        images.extend(part for part in content if part["type"] == "image")
+        if "is_relevant" in request_text(params):
+            page = int(content[0]["text"].split("page ")[-1].split()[0])
+            return json.dumps(
+                {"is_relevant": page in (1, 4), "confidence": 1.0, "reason": "stub"}
+            )
+        return canned_response(params)
+
+    engine = OmEngine(FakeAnthropic(respond), prescreen=False)
+    await engine.process_pdf(BytesIO(b""))
+
+    assert sorted(fake_pdf) == [1, 4]
+    assert images
+
+
+@pytest.mark.parametrize("fake_pdf", [9], indirect=True)
+@pytest.mark.parametrize("summary_mode", list(SummaryMode))
+@pytest.mark.asyncio
+async def test_process_pdf_resumes_from_checkpoint(
+    fake_pdf, monkeypatch, summary_mode, three_pages_per_chunk
+):
+    screened = []
+    fail_on_page = None
+
+    class Messages:
+        async def create(self, **kwargs):
+            prompt = request_text(kwargs)
+            if "is_relevant" in prompt:
+                screened.append(int(prompt.split("page ")[-1].split()[0]))
+                text = json.dumps(
+                    {"is_relevant": True, "confidence": 1.0, "reason": "stub"}
+                )
+            elif "summary text" in prompt:
+                text = "summary of " + ", ".join(re.findall(r"page \d+", prompt))
+            elif "tables" in prompt:
+                pages = re.findall(r"page \d+", prompt)
+                if f"page {fail_on_page}" in pages:
+                    raise connection_error()
+                text = json.dumps(
+                    with_metadata(
+                        prompt,
+                        {
+                            "rent_roll": [
+                                {"source": page} for page in dict.fromkeys(pages)
+                            ]
+                        },
+                    )
+                )
+            else:
+                text = json.dumps({"title": "t", "address": "a", "description": "d"})
+            return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+    monkeypatch.setattr(engine_module.asyncio, "sleep", _no_sleep)
+    engine = OmEngine(
+        SimpleNamespace(messages=Messages()), prescreen=False, summary_mode=summary_mode
+    )
+
+    fail_on_page = None
+    uninterrupted = await engine.process_pdf(BytesIO(b""))
+
+    fail_on_page = 7
+    checkpoint = MemoryCheckpointStore()
+
+    with pytest.raises(anthropic.APIConnectionError):
+        await engine.process_pdf(BytesIO(b""), checkpoint=checkpoint)
+    saved = await checkpoint.load()
+    assert saved["current_page"] == 6
+    assert saved["title"] == "t"
+    # the second chunk's text waits to share a summary call with the next
+    assert "page 4" in saved["pending_summary"]
+    if summary_mode == SummaryMode.MAP_REDUCE:
+        assert len(saved["chunk_summaries"]) == 1
+
+    screened.clear()
+    fail_on_page = None
+    context = await engine.process_pdf(BytesIO(b""), checkpoint=checkpoint)
+
+    # only the pages after the checkpoint are redone
+    assert sorted(screened) == [7, 8, 9]
+    assert context.tables == uninterrupted.tables
+    assert context.running_summary == uninterrupted.running_summary
+    assert context.chunk_summaries == uninterrupted.chunk_summaries
+    assert context.current_page == 9
+
+
+def batch_screening_client(malformed: bool = False):
+    calls = []
+
+    class Messages:
+        async def create(self, **kwargs):
+            prompt = request_text(kwargs)
+            if "JSON array" in prompt:
+                calls.append("batch")
+                pages = re.findall(r"--- Page (\d+) ---\npage (\d+)", prompt)
+                verdicts = [
+                    {
+                        "page": int(index),
+                        "is_relevant": int(page) % 2 == 0,
+                        "confidence": 0.9,
+                        "reason": "stub",
+                    }
+                    for index, page in pages
+                ]
+                text = "not json" if malformed else json.dumps(verdicts[::-1])
+            elif "is_relevant" in prompt:
+                calls.append("page")
+                page = int(prompt.split("page ")[-1].split()[0])
+                text = json.dumps(
+                    {"is_relevant": page % 2 == 0, "confidence": 0.9, "reason": "stub"}
+                )
+            else:
+                text = "{}"
+            return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+    return SimpleNamespace(messages=Messages()), calls
+
+
+@pytest.mark.asyncio
+async def test_screen_batch_matches_per_page():
+    texts = [f"page {i}" for i in range(5)]
+    client, calls = batch_screening_client()
+    engine = OmEngine(client)
+
+    batched = await engine.screen_batch(texts)
+    assert calls == ["batch"]
+    per_page = [await engine.screen_page(text) for text in texts]
+    assert [page.is_relevant for page in batched] == [
+        page.is_relevant for page in per_page
+    ]
+
+
+@pytest.mark.asyncio
+async def test_screen_batch_falls_back_when_malformed():
+    client, calls = batch_screening_client(malformed=True)
+    engine = OmEngine(client)
+
+    pages = await engine.screen_batch([f"page {i}" for i in range(4)])
+    assert calls == ["batch", "page", "page", "page", "page"]
+    assert [page.is_relevant for page in pages] == [True, False, True, False]
+
+
+@pytest.mark.parametrize("fake_pdf", [10], indirect=True)
+@pytest.mark.asyncio
+async def test_process_pdf_batches_screening(fake_pdf):
+    client, calls = batch_screening_client()
+    engine = OmEngine(client, screening_batch_size=4, prescreen=False)
+
+    await engine.process_pdf(BytesIO(b""))
+    assert calls == ["batch", "batch", "batch"]
+
+
+@pytest.mark.parametrize("fake_pdf", [2], indirect=True)
+@pytest.mark.asyncio
+async def test_calls_are_routed_per_model(fake_pdf):
+    kinds = {
+        prompts.PAGE_SCREENING_SYSTEM: "screening",
+        # metadata is extracted alongside the tables
+        prompts.EXTRACTION_SYSTEM: "tables",
+        prompts.TABLE_DETECTION_SYSTEM: "tables",
+        prompts.SUMMARY_UPDATE_SYSTEM: "summary",
+        prompts.CHUNK_SUMMARY_SYSTEM: "summary",
+        prompts.SUMMARY_REDUCE_SYSTEM: "summary",
+        prompts.METADATA_SYSTEM: "metadata",
+    }
+    models = {}
+
+    def respond(params):
+        kind = kinds[params["system"][-1]["text"]]
+        models.setdefault(kind, set()).add(params["model"])
+        return canned_response(params)
+
+    routing = ModelRouting(
+        screening="small", metadata="medium", tables="large", summary="small"
+    )
+    engine = OmEngine(FakeAnthropic(respond), models=routing, prescreen=False)
+    await engine.process_pdf(BytesIO(b""))
+
+    assert models == {
+        "screening": {"small"},
+        "tables": {"large"},
+        "summary": {"small"},
+    }
+
+
+@pytest.mark.asyncio
+async def test_system_prefix_is_cached_once_long_enough():
+    requests = []
+
+    class Messages:
+        async def create(self, **kwargs):
+            requests.append(kwargs)
+            usage = SimpleNamespace(
+                input_tokens=20,
+                output_tokens=5,
+                cache_creation_input_tokens=0 if len(requests) > 1 else 3000,
+                cache_read_input_tokens=3000 if len(requests) > 1 else 0,
+            )
+            text = json.dumps(
+                {"is_relevant": True, "confidence": 1.0, "reason": "stub"}
+            )
+            return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=usage)
+
+    engine = OmEngine(SimpleNamespace(messages=Messages()))
+    await engine.screen_page("page 1")
+
+    # the static instructions go first, the page text is left out
+    system = requests[0]["system"]
+    assert "page 1" not in system[-1]["text"]
+    assert "page 1" in requests[0]["messages"][0]["content"][0]["text"]
+    # none of the prompts is long enough for the API to cache
+    assert "cache_control" not in system[-1]
+    for name in dir(prompts):
+        if name.endswith("_SYSTEM"):
+            assert estimate_tokens(getattr(prompts, name)) < PROMPT_CACHE_MIN_TOKENS
+
+    # a long enough prefix is marked, and what the cache served is recorded
+    requests.clear()
+    engine.usage = []
+    # ~1500 tokens: past the minimum, but not haiku's
+    system = "instructions " * 460
+    for model in ("claude-3-5-sonnet-20241022", "claude-3-5-haiku-20241022"):
+        await engine.generate("page 1", system=system, model=model)
+        await engine.generate("page 2", system=system, model=model)
+    assert [request["system"][-1].get("cache_control") for request in requests] == (
+        [{"type": "ephemeral"}] * 2 + [None] * 2
+    )
+    assert [usage.cache_read_input_tokens for usage in engine.usage[:2]] == [0, 3000]
+
+
+@pytest.mark.asyncio
+async def test_metadata_extracted_with_tables_until_complete():
+    requests = []
+
+    class Messages:
+        async def create(self, **kwargs):
+            prompt = request_text(kwargs)
+            images = [
+                part
+                for part in kwargs["messages"][0]["content"]
+                if part["type"] == "image"
+            ]
+            requests.append(
+                ("extraction" if '"metadata"' in prompt else "tables", len(images))
+            )
+            text = json.dumps(
+                with_metadata(prompt, {"rent_roll": [{"unit": len(requests)}]})
+            )
+            return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+    engine = OmEngine(SimpleNamespace(messages=Messages()))
+    context = engine_module.DocumentContext()
+    await engine.process_chunk_data("page 1\npage 2", [b"first", b"second"], context)
+    await engine.process_chunk_data("page 3", [b"third"], context)
+
+    # one call per input carrying all of its images, metadata only until it is complete
+    assert requests == [("extraction", 2), ("tables", 1)]
+    assert (context.title, context.address, context.description) == ("t", "a", "d")
+    assert context.tables == {"rent_roll": [{"unit": 1}, {"unit": 2}]}
+
+
+def test_chunk_inputs_keep_pages_with_their_images():
+    engine = OmEngine(SimpleNamespace())
+    budget = 3 * engine_module.IMAGE_TOKEN_ESTIMATE
+
+    def page(number, chars, image=True):
+        text = "\n".join(f"page {number} row {row}" for row in range(chars // 20))
+        return engine_module.PageContent(
+            text=text, image=f"image {number}".encode() if image else None
+        )
+
+    pages = [
+        page(1, 400),
+        page(2, 400),
+        page(3, 400, image=False),
+        page(4, 40000),
+        page(5, 400),
+    ]
+    inputs = engine.chunk_inputs(pages, token_budget=budget)
+
+    for text, images in inputs:
+        numbers = set(re.findall(r"page (\d+)", text))
+        # every image in an input belongs to a page whose text is in it
+        assert {image.decode().split()[1] for image in images} <= numbers
+        assert (
+            engine_module.estimate_tokens(text)
+            + len(images) * engine_module.IMAGE_TOKEN_ESTIMATE
+            <= budget
+        )
+    # whole pages share a call while they fit, the image-less page 3 included, and page 4 is split
+    assert sorted(set(re.findall(r"page (\d+)", inputs[0][0]))) == ["1", "2", "3"]
+    assert inputs[0][1] == [b"image 1", b"image 2"]
+    assert sum("page 4" in text for text, _ in inputs) > 1
+    assert all(images == [b"image 4"] for text, images in inputs if "page 4" in text)
+    # no text is lost
+    rows = [line for text, _ in inputs for line in text.split("\n") if line]
+    assert rows == [line for p in pages for line in p.text.split("\n")]
+
+
+def test_pack_chunks_fills_the_budget_with_relevant_pages(monkeypatch):
+    engine = OmEngine(SimpleNamespace())
+    image_tokens = engine_module.IMAGE_TOKEN_ESTIMATE
+    monkeypatch.setattr(
+        engine_module, "EXTRACTION_INPUT_TOKEN_BUDGET", 3 * image_tokens + 100
+    )
+
+    def page(number, is_relevant):
+        return engine_module.PageContent(
+            text=f"page {number}",
+            is_relevant=is_relevant,
+            image=b"image" if is_relevant else None,
+        )
+
+    def numbers(chunks):
+        return [[int(p.text.split()[1]) for p in chunk] for chunk in chunks]
+
+    # irrelevant pages cost nothing, so three relevant ones fill each chunk
+    pages = [page(i, is_relevant=i % 3 == 0) for i in range(1, 19)]
+    assert numbers(engine.pack_chunks(pages)) == [
+        list(range(1, 12)),
+        list(range(12, 19)),
+    ]
+
+    # a run of irrelevant pages is still cut at CHUNK_PAGE_LIMIT
+    pages = [page(i, is_relevant=False) for i in range(1, 2 * CHUNK_PAGE_LIMIT + 2)]
+    assert [len(chunk) for chunk in engine.pack_chunks(pages)] == [
+        CHUNK_PAGE_LIMIT,
+        CHUNK_PAGE_LIMIT,
+        1,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_reduce_summaries_is_hierarchical(monkeypatch):
+    monkeypatch.setattr(engine_module, "SUMMARY_REDUCE_FAN_IN", 4)
+    in_flight = 0
+    max_in_flight = 0
+    inputs = []
+
+    class Messages:
+        async def create(self, **kwargs):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            sections = re.findall(r"--- Section \d+ ---\n(\S+)", request_text(kwargs))
+            inputs.append(sections)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return SimpleNamespace(content=[SimpleNamespace(text="+".join(sections))])
+
+    engine = OmEngine(SimpleNamespace(messages=Messages()))
+    summary = await engine.reduce_summaries([str(i) for i in range(10)])
+
+    # 10 summaries -> 3 -> 1, order kept at every level
+    assert summary == "+".join(str(i) for i in range(10))
+    assert sorted(len(group) for group in inputs) == [2, 3, 4, 4]
+    # groups of a level are combined concurrently
+    assert max_in_flight == 3
+
+
+@pytest.mark.parametrize("fake_pdf", [9], indirect=True)
+@pytest.mark.parametrize("summary_mode", list(SummaryMode))
+@pytest.mark.asyncio
+async def test_page_ranges_merge_into_the_whole_document(
+    fake_pdf, summary_mode, three_pages_per_chunk
+):
+    class Messages:
+        async def create(self, **kwargs):
+            prompt = request_text(kwargs)
+            pages = re.findall(r"page \d+", prompt)
+            if "is_relevant" in prompt:
+                text = json.dumps(
+                    {"is_relevant": True, "confidence": 1.0, "reason": "stub"}
+                )
+            elif "combined summary text" in prompt:
+                sections = re.findall(r"--- Section \d+ ---\n(.*)", prompt)
+                text = f"combined({' | '.join(sections)})"
+            elif "summary text" in prompt:
+                text = "summary of " + ", ".join(dict.fromkeys(pages))
+            else:
+                # every part sees a different title, the earliest one wins
+                metadata = {
+                    "title": f"title from {pages[0]}",
+                    "address": "a",
+                    "description": "d",
+                }
+                tables = {
+                    "rent_roll": [{"source": page} for page in dict.fromkeys(pages)]
+                }
+                text = json.dumps(
+                    {"metadata": metadata, "tables": tables}
+                    if '"metadata"' in prompt
+                    else tables
+                )
+            return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+    engine = OmEngine(
+        SimpleNamespace(messages=Messages()), prescreen=False, summary_mode=summary_mode
+    )
+    whole = await engine.process_pdf(BytesIO(b""))
+
+    parts = []
+    for page_range in ((1, 6), (7, 9)):
+        part = await engine.process_pdf(BytesIO(b""), page_range=page_range)
+        assert part.current_page == page_range[1]
+        assert engine.stats.pages == page_range[1] - page_range[0] + 1
+        parts.append(part)
+    merged = await engine.merge_contexts(parts)
+
+    assert merged.metadata() == whole.metadata()
+    assert merged.title == "title from page 1"
+    assert merged.tables == whole.tables
+    assert merged.current_page == 9
+    if summary_mode == SummaryMode.MAP_REDUCE:
+        # the parts leave their chunk summaries for the merge to reduce
+        assert parts[0].running_summary == ""
+        assert merged.running_summary == whole.running_summary
+    else:
+        assert (
+            merged.running_summary
+            == f"combined({parts[0].running_summary} | {parts[1].running_summary})"
+        )
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_records_stats_per_stage(fake_pdf, monkeypatch):
+    failed = []
+
+    def respond(params):
+        # the first table request fails once and is retried
+        if params["system"][-1]["text"] == prompts.EXTRACTION_SYSTEM and not failed:
+            failed.append(params)
+            raise connection_error()
+        return canned_response(params)
+
+    monkeypatch.setattr(engine_module.asyncio, "sleep", _no_sleep)
+    engine = OmEngine(FakeAnthropic(respond), prescreen=False, cache=LruResponseCache())
+    await engine.process_pdf(BytesIO(b""))
+    first = engine.stats
+
+    assert first.pages == 3
+    assert first.wall_seconds > 0
+    assert set(first.stages) == {"screening", "tables", "summary"}
+    assert first.stages["screening"].calls == 3
+    assert first.stages["tables"].retries == 1
+    assert first.total.calls == len(engine.usage)
+    assert first.total.input_tokens == sum(usage.input_tokens for usage in engine.usage)
+    assert first.total.cache_hits == 0
+
+    # a second run is answered from the response cache
+    await engine.process_pdf(BytesIO(b""))
+    assert engine.stats.total.cache_hits == engine.stats.total.calls
+    assert engine.stats.total.input_tokens == 0
+    assert engine.stats.to_dict()["stages"]["screening"]["calls"] == 3
@@ -0,0 +1,126 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from src.llm.engines.om import pdf
+from src.llm.engines.om.engine import IMAGE_TOKEN_ESTIMATE
+from src.llm.engines.om.pdf import (
+    extract_pdf,
+    encode_image,
+    split_page_ranges,
+    IMAGE_PROFILES,
+    RenderService,
+)
+
+# Get the absolute path to the fixtures directory
+FIXTURES_DIR = Path(__file__).parent.parent / "fixtures"
+
+
+def read_fixture(name: str) -> BytesIO:
+    with open(FIXTURES_DIR / name, "rb") as pdf_file:
+        return BytesIO(pdf_file.read())
+
+
+@pytest.mark.asyncio
+async def test_extract_pdf_renders_on_demand(monkeypatch):
+    rendered = []
+
+    def convert_from_path(pdf_path, dpi, first_page, last_page):
+        rendered.append((first_page, last_page))
+        return [Image.new("RGB", (1700, 2200))]
+
+    monkeypatch.setattr(pdf, "convert_from_path", convert_from_path)
+    monkeypatch.setattr(pdf.shutil, "which", lambda _: "/usr/bin/pdftoppm")
+    # a thread pool so the patched converter is visible to the workers
+    render_service = RenderService(max_workers=2, executor=ThreadPoolExecutor(2))
+
+    pages = [
+        page
+        async for page in extract_pdf(
+            read_fixture("1004_gates_ave.pdf"), render_service
+        )
+    ]
+
+    assert len(pages) == 8
+    assert all(total_pages == 8 for _, _, total_pages in pages)
+    assert "Gates Avenue" in pages[0][0]
+    # nothing is rasterized until a page image is asked for
+    assert rendered == []
+
+    image = await pages[2][1].render()
+    assert image.startswith(b"\xff\xd8")
+    assert rendered == [(3, 3)]
+    # downscaled to the default profile's pixel cap
+    assert Image.open(BytesIO(image)).size == (942, 1219)
+
+    # the spilled file goes away with the last page handle
+    path = pages[0][1].document.path
+    del pages
+    assert not os.path.exists(path)
+
+
+@pytest.mark.asyncio
+async def test_extract_pdf_text_in_process_pool(monkeypatch):
+    monkeypatch.setattr(pdf.shutil, "which", lambda _: "/usr/bin/pdftoppm")
+    render_service = RenderService(max_workers=2)
+    try:
+        pages = [
+            page
+            async for page in extract_pdf(
+                read_fixture("1004_gates_ave.pdf"), render_service
+            )
+        ]
+    finally:
+        render_service.shutdown()
+
+    assert [image.page_number for _, image, _ in pages] == list(range(1, 9))
+    assert "Asking Price" in pages[2][0]
+
+
+def test_split_page_ranges():
+    assert split_page_ranges([1, 2, 3, 4, 5, 6, 7, 8], 4) == [
+        (1, 2),
+        (3, 4),
+        (5, 6),
+        (7, 8),
+    ]
+    assert split_page_ranges([1, 2, 3, 7, 8], 4) == [(1, 2), (3, 3), (7, 8)]
+    assert split_page_ranges([5], 8) == [(5, 5)]
+
+
+@pytest.mark.skipif(not shutil.which("pdftoppm"), reason="Poppler is not installed")
+@pytest.mark.asyncio
+async def test_extract_pdf_fixture():
+    pages = [page async for page in extract_pdf(read_fixture("1004_gates_ave.pdf"))]
+
+    assert len(pages) == 8
+    for _, image, _ in pages:
+        assert (await image.render()).startswith(b"\xff\xd8")
+
+
+def test_encode_image_profiles():
+    page = Image.new("RGB", (1700, 2200), "white")
+
+    webp = encode_image(page.copy(), IMAGE_PROFILES["compact"])
+    assert Image.open(BytesIO(webp)).format == "WEBP"
+    assert max(Image.open(BytesIO(webp)).size) == 1092
+
+    gray = encode_image(page.copy(), IMAGE_PROFILES["default"], grayscale=True)
+    assert Image.open(BytesIO(gray)).mode == "L"
+    # the long edge cap alone would leave 1211x1568, ~1.9 MP
+    width, height = Image.open(BytesIO(gray)).size
+    assert width * height <= IMAGE_PROFILES["default"].max_pixels
+    assert width * height / 750 <= IMAGE_TOKEN_ESTIMATE
+    assert height > 1200
+
+    legacy = encode_image(page.copy(), IMAGE_PROFILES["legacy"])
+    assert Image.open(BytesIO(legacy)).size == (1700, 2200)
+
+    assert IMAGE_PROFILES["lossless"].media_type == "image/png"
+    assert IMAGE_PROFILES["default"].use_grayscale("x" * 2000)
+    assert not IMAGE_PROFILES["color"].use_grayscale("x" * 2000)
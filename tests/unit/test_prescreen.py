@@ -0,0 +1,93 @@
+import json
+from io import BytesIO
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from src.llm.engines.om import engine as engine_module
+from src.llm.engines.om.engine import OmEngine
+from tests.unit.anthropic_stub import request_text
+from src.llm.engines.om.pdf import count_pages, extract_text_range
+from src.llm.engines.om.prescreen import prescreen_page, PrescreenVerdict
+
+# Get the absolute path to the fixtures directory
+FIXTURES_DIR = Path(__file__).parent.parent / "fixtures"
+
+DISCLAIMER = (
+    "CONFIDENTIALITY AND DISCLAIMER. This offering memorandum is confidential and may not be reproduced. "
+    "The owner makes no representation or warranty as to its accuracy. Each prospective purchaser should "
+    "conduct an independent investigation. Offers may be rejected at the owner's sole discretion."
+)
+
+
+def test_prescreen_fixture_pages():
+    pdf_path = str(FIXTURES_DIR / "1004_gates_ave.pdf")
+    texts = extract_text_range(pdf_path, 1, count_pages(pdf_path))
+    verdicts = [prescreen_page(text).verdict for text in texts]
+
+    # the rent roll, financial summary and tax pages are settled locally
+    assert [
+        i
+        for i, verdict in enumerate(verdicts, start=1)
+        if verdict == PrescreenVerdict.RELEVANT
+    ] == [3, 4, 5]
+    # nothing from this memorandum is thrown away without asking the model
+    assert PrescreenVerdict.IRRELEVANT not in verdicts
+
+
+def test_prescreen_short_circuits_obvious_pages():
+    assert prescreen_page("").verdict == PrescreenVerdict.IRRELEVANT
+    assert (
+        prescreen_page("Photo: lobby, 2nd floor").verdict == PrescreenVerdict.IRRELEVANT
+    )
+    assert prescreen_page(DISCLAIMER).verdict == PrescreenVerdict.IRRELEVANT
+    assert (
+        prescreen_page(
+            "The building sits on a quiet tree-lined block close to transit, parks and shopping."
+        ).verdict
+        == PrescreenVerdict.AMBIGUOUS
+    )
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_skips_and_audits_prescreened_pages(monkeypatch):
+    texts = [
+        "",
+        DISCLAIMER,
+        "A quiet tree-lined block close to transit, parks and shopping.",
+    ]
+
+    async def extract_pdf(pdf_stream, *args):
+        for text in texts:
+            yield text, None, len(texts)
+
+    monkeypatch.setattr(engine_module, "extract_pdf", extract_pdf)
+    screened = []
+
+    class Messages:
+        async def create(self, **kwargs):
+            prompt = request_text(kwargs)
+            if "is_relevant" in prompt:
+                screened.append(prompt)
+                # the model disagrees with the pre-screen about the empty page
+                relevant = "Text: \n" in prompt or "tree-lined" in prompt
+                text = json.dumps(
+                    {"is_relevant": relevant, "confidence": 1.0, "reason": "stub"}
+                )
+            else:
+                text = "{}"
+            return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+    engine = OmEngine(SimpleNamespace(messages=Messages()))
+    await engine.process_pdf(BytesIO(b""))
+    assert len(screened) == 1
+    assert engine.prescreen_stats.skipped_irrelevant == 2
+    assert engine.prescreen_stats.agreement_rate is None
+
+    screened.clear()
+    engine = OmEngine(SimpleNamespace(messages=Messages()), prescreen_audit=True)
+    await engine.process_pdf(BytesIO(b""))
+    assert len(screened) == 3
+    assert engine.prescreen_stats.audited == 2
+    assert engine.prescreen_stats.agreement_rate == 0.5
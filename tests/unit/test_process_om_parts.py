@@ -0,0 +1,240 @@
+import asyncio
+import json
+from dataclasses import asdict
+from types import SimpleNamespace
+
+import pytest
+from arq import Retry
+
+from src.database.database import AsyncDatabase
+from src.database.models import Om, OmStatus
+from src.llm.engines.om.engine import DocumentContext, OmEngine, ProgressEvent
+from src.task_manager.tasks import process_om_parts
+from src.task_manager.tasks.process_om_parts import (
+    merge_om,
+    part_key,
+    process_om_part,
+)
+
+PAGE_RANGES = [[1, 4], [5, 8], [9, 10]]
+
+
+class Redis:
+    """Stand-in for the few redis commands the part jobs use, keeping keys in memory"""
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.hashes = {}
+        self.published = []
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value.encode()
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+        self.sets.pop(key, None)
+        self.hashes.pop(key, None)
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def sadd(self, key, member):
+        members = self.sets.setdefault(key, set())
+        added = member not in members
+        members.add(member)
+        return int(added)
+
+    async def scard(self, key):
+        return len(self.sets.get(key, ()))
+
+    async def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = str(value).encode()
+
+    async def hvals(self, key):
+        return list(self.hashes.get(key, {}).values())
+
+    async def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+    def pipeline(self, transaction=True):
+        return Pipeline(self)
+
+
+class Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, name)
+        return lambda *args: self.calls.append((command, args))
+
+    async def execute(self):
+        return [await command(*args) for command, args in self.calls]
+
+
+class Engine(OmEngine):
+    """Processes a page range without a model, reporting progress as it goes"""
+
+    fail = False
+
+    def __init__(self, progress_callback=None):
+        super().__init__(SimpleNamespace(), progress_callback=progress_callback)
+
+    async def process_pdf(self, pdf_stream, checkpoint=None, page_range=None):
+        first_page, last_page = page_range
+        for page in range(first_page, last_page + 1):
+            await self.emit_progress(
+                ProgressEvent(OmStatus.PROCESSING, page - first_page + 1, 10)
+            )
+            # yield like a real pipeline, so concurrent ranges interleave
+            await asyncio.sleep(0)
+        if self.fail:
+            await self.emit_progress(ProgressEvent(OmStatus.FAILED, 0, 10, "stub"))
+            raise RuntimeError("stub")
+        await self.emit_progress(ProgressEvent(OmStatus.PROCESSED, last_page, 10))
+        return DocumentContext(
+            title=f"pages {first_page}-{last_page}", current_page=last_page
+        )
+
+
+@pytest.fixture
+async def ctx(monkeypatch):
+    monkeypatch.setattr(process_om_parts, "om_engine", lambda ctx, *args: Engine(*args))
+    monkeypatch.setattr(Engine, "fail", False)
+    db = AsyncDatabase(":memory:")
+    await db.initialize()
+    merges = []
+
+    async def enqueue_merge(om_id, parts, priority=None, user_id=None):
+        merges.append((om_id, parts))
+
+    async def job_done(job_id):
+        pass
+
+    logger = SimpleNamespace(
+        info=lambda message: None,
+        error=lambda message: None,
+        exception=lambda message: None,
+    )
+    yield {
+        "redis": Redis(),
+        "database": db,
+        "storage": SimpleNamespace(
+            get_object=lambda **kwargs: SimpleNamespace(data=b"")
+        ),
+        "logger": SimpleNamespace(get_worker_logger=lambda **kwargs: logger),
+        "task_manager": SimpleNamespace(merge_om=enqueue_merge, job_done=job_done),
+        "job_id": "job",
+        "job_try": 1,
+        "merges": merges,
+    }
+    await db.engine.dispose()
+
+
+async def upload(ctx):
+    async with ctx["database"].session() as session:
+        om = await Om.create(user_id="user", storage_object_id="om", session=session)
+        await session.commit()
+        return om.id
+
+
+async def status(ctx, om_id):
+    async with ctx["database"].session() as session:
+        return (await Om.read(om_id, session)).status
+
+
+async def run_part(ctx, om_id, part, job_try=1):
+    await process_om_part(
+        {**ctx, "job_try": job_try}, om_id, part, PAGE_RANGES[part], len(PAGE_RANGES)
+    )
+
+
+@pytest.mark.asyncio
+async def test_parts_report_progress_across_the_document(ctx):
+    om_id = await upload(ctx)
+
+    await asyncio.gather(*(run_part(ctx, om_id, part) for part in range(3)))
+
+    pages = [
+        event["current_page"]
+        for channel, event in ctx["redis"].published
+        if channel == "process_om_progress"
+    ]
+    # every page of every range is counted toward the one document
+    assert pages == sorted(pages)
+    assert pages[-1] == 10
+    assert len(pages) == 13
+
+
+@pytest.mark.asyncio
+async def test_parts_are_counted_once_and_merged_once(ctx):
+    om_id = await upload(ctx)
+
+    await run_part(ctx, om_id, 0)
+    # a range finishing again, e.g. re-run after its worker was lost, counts once
+    await run_part(ctx, om_id, 0)
+    assert ctx["merges"] == []
+    await asyncio.gather(run_part(ctx, om_id, 1), run_part(ctx, om_id, 2))
+
+    assert ctx["redis"].sets["process_om:parts_done:" + om_id] == {0, 1, 2}
+    assert ctx["merges"] == [(om_id, 3)]
+
+    await merge_om(ctx, om_id, 3)
+
+    assert await status(ctx, om_id) == OmStatus.PROCESSED
+    async with ctx["database"].session() as session:
+        assert (await Om.read(om_id, session)).title == "pages 1-4"
+    assert ctx["redis"].values == {}
+    assert ctx["redis"].sets == {}
+    assert ctx["redis"].hashes == {}
+
+
+@pytest.mark.asyncio
+async def test_merge_retries_while_a_part_is_missing(ctx):
+    om_id = await upload(ctx)
+    for part in (0, 2):
+        await ctx["redis"].set(
+            part_key(om_id, part), json.dumps(asdict(DocumentContext()))
+        )
+
+    with pytest.raises(Retry):
+        await merge_om(ctx, om_id, 3)
+    assert await status(ctx, om_id) == OmStatus.UPLOADED
+
+    with pytest.raises(Retry):
+        await merge_om({**ctx, "job_try": 5}, om_id, 3)
+    assert await status(ctx, om_id) == OmStatus.FAILED
+
+
+@pytest.mark.asyncio
+async def test_a_part_failing_for_good_fails_the_om(ctx, monkeypatch):
+    om_id = await upload(ctx)
+    monkeypatch.setattr(Engine, "fail", True)
+
+    with pytest.raises(Retry):
+        await run_part(ctx, om_id, 1)
+    assert await status(ctx, om_id) == OmStatus.UPLOADED
+
+    with pytest.raises(Retry):
+        await run_part(ctx, om_id, 1, job_try=5)
+    assert await status(ctx, om_id) == OmStatus.FAILED
+    assert ("process_om_status", {"om_id": om_id, "status": "failed"}) in ctx[
+        "redis"
+    ].published
+
+    # the other ranges then stop, and nothing is merged
+    monkeypatch.setattr(Engine, "fail", False)
+    await run_part(ctx, om_id, 0)
+    assert part_key(om_id, 0) not in ctx["redis"].values
+    assert ctx["merges"] == []
@@ -0,0 +1,120 @@
+from types import SimpleNamespace
+
+import pytest
+from arq import Retry
+
+from src.task_manager import OM_BATCH_SIZE, TaskManager, TaskPriority
+from src.task_manager.fair import fair_share
+from src.task_manager.queues import JobSlots
+
+
+def slots_with(max_jobs, running, waiting):
+    """Slots over stand-in workers -- `waiting` counts jobs queued per priority"""
+    slots = JobSlots(max_jobs)
+
+    class Pool:
+        async def zcount(self, queue_name, low, high):
+            return next(
+                count
+                for priority, count in waiting.items()
+                if priority.queue_name == queue_name
+            )
+
+    for priority in TaskPriority:
+        slots.workers[priority] = SimpleNamespace(
+            job_counter=running.get(priority, 0), pool=Pool()
+        )
+    return slots
+
+
+def test_queue_names():
+    # medium priority jobs wait on arq's default queue, so jobs enqueued before priorities still run
+    assert TaskPriority.MEDIUM.queue_name == "arq:queue"
+    assert TaskPriority.HIGH.queue_name == "arq:queue:high"
+    assert TaskPriority.LOW.queue_name == "arq:queue:low"
+
+
+@pytest.mark.asyncio
+async def test_idle_queues_lend_their_slots():
+    waiting = {TaskPriority.HIGH: 0, TaskPriority.MEDIUM: 0, TaskPriority.LOW: 50}
+    slots = slots_with(10, {}, waiting)
+    assert await slots.allowance(TaskPriority.LOW) == 10
+
+
+@pytest.mark.asyncio
+async def test_high_priority_drains_first_but_low_keeps_its_share():
+    waiting = {TaskPriority.HIGH: 50, TaskPriority.MEDIUM: 50, TaskPriority.LOW: 50}
+    slots = slots_with(10, {}, waiting)
+    assert slots.shares == {
+        TaskPriority.HIGH: 6,
+        TaskPriority.MEDIUM: 3,
+        TaskPriority.LOW: 1,
+    }
+    assert await slots.allowance(TaskPriority.HIGH) == 6
+    assert await slots.allowance(TaskPriority.MEDIUM) == 3
+    assert await slots.allowance(TaskPriority.LOW) == 1
+
+    # with high priority idle, medium borrows its slots but low still gets one
+    waiting[TaskPriority.HIGH] = 0
+    assert await slots.allowance(TaskPriority.MEDIUM) == 9
+    assert await slots.allowance(TaskPriority.LOW) == 1
+
+
+@pytest.mark.asyncio
+async def test_borrowed_slots_are_returned_as_jobs_finish():
+    # low borrowed every slot while nothing else waited
+    waiting = {TaskPriority.HIGH: 5, TaskPriority.MEDIUM: 0, TaskPriority.LOW: 50}
+    slots = slots_with(10, {TaskPriority.LOW: 10}, waiting)
+    # running jobs are never cancelled, but low starts nothing new...
+    assert await slots.allowance(TaskPriority.LOW) == 10
+    assert await slots.allowance(TaskPriority.HIGH) == 0
+
+    # ...so high gets the slots as they free up
+    slots.workers[TaskPriority.LOW].job_counter = 7
+    assert await slots.allowance(TaskPriority.HIGH) == 3
+    assert await slots.allowance(TaskPriority.LOW) == 7
+
+
+@pytest.mark.asyncio
+async def test_user_slot_is_kept_while_the_job_retries():
+    released = []
+
+    class TaskManager:
+        async def job_done(self, job_id):
+            released.append(job_id)
+
+    @fair_share
+    async def job(ctx, fail: bool, max_tries: int = 3):
+        if fail:
+            raise Retry(defer=1)
+
+    def ctx(job_try):
+        return {"task_manager": TaskManager(), "job_id": "job", "job_try": job_try}
+
+    with pytest.raises(Retry):
+        await job(ctx(1), fail=True)
+    assert released == []
+    # a last try frees the slot even when it fails...
+    with pytest.raises(Retry):
+        await job(ctx(3), fail=True)
+    assert released == ["job"]
+    # ...and any try that succeeds does
+    await job(ctx(2), fail=False)
+    assert released == ["job", "job"]
+
+
+@pytest.mark.asyncio
+async def test_batch_backfills_are_split_into_bounded_jobs():
+    enqueued = []
+
+    class Pool:
+        async def enqueue_job(self, function, om_ids, _queue_name):
+            enqueued.append(om_ids)
+
+    task_manager = TaskManager("redis://localhost", None)
+    task_manager.redis_pool = Pool()
+    om_ids = [str(i) for i in range(2 * OM_BATCH_SIZE + 1)]
+    await task_manager.process_om_batch(om_ids)
+
+    assert [len(group) for group in enqueued] == [OM_BATCH_SIZE, OM_BATCH_SIZE, 1]
+    assert sum(enqueued, []) == om_ids
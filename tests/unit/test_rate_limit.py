@@ -0,0 +1,155 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import anthropic
+import pytest
+
+from src.llm.engines.om import engine as engine_module
+from src.llm.engines.om.engine import OmEngine
+from src.llm.rate_limit import (
+    AdaptiveConcurrency,
+    LocalTokenBucket,
+    RateLimiter,
+    RedisTokenBucket,
+    retry_after,
+)
+from tests.unit.anthropic_stub import api_error
+
+
+def test_retry_after():
+    assert retry_after(api_error(429, {"retry-after": "7"})) == 7.0
+    assert (
+        retry_after(api_error(429, {"retry-after-ms": "250", "retry-after": "1"}))
+        == 0.25
+    )
+    assert (
+        retry_after(api_error(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}))
+        is None
+    )
+    assert retry_after(api_error(529)) is None
+    assert retry_after(RuntimeError()) is None
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_refill():
+    bucket = LocalTokenBucket(capacity=60, rate=1)
+    assert await bucket.take(60) == 0
+    # empty: the next token takes a second to refill
+    assert await bucket.take(1) == pytest.approx(1, abs=0.05)
+    # a call that used more than it reserved drives the bucket negative
+    await bucket.adjust(-30)
+    assert await bucket.take(1) == pytest.approx(31, abs=0.05)
+    # requests bigger than the bucket wait for a full one
+    await bucket.adjust(100)
+    assert await bucket.take(1000) == 0
+
+
+@pytest.mark.asyncio
+async def test_redis_bucket_falls_back_when_redis_fails():
+    class BrokenRedis:
+        def register_script(self, script):
+            async def run(**kwargs):
+                raise ConnectionError("redis down")
+
+            return run
+
+    bucket = RedisTokenBucket(BrokenRedis(), "bucket", capacity=2, rate=1)
+    assert await bucket.take(2) == 0
+    assert await bucket.take(1) > 0
+
+
+@pytest.mark.asyncio
+async def test_concurrency_halves_on_overload_and_grows_back():
+    concurrency = AdaptiveConcurrency(max_limit=8, min_limit=2, cooldown=60)
+    concurrency.decrease()
+    # overloads within the cooldown are the same burst
+    concurrency.decrease()
+    assert concurrency.limit == 4
+    concurrency.last_decrease = 0
+    concurrency.decrease()
+    concurrency.last_decrease = 0
+    concurrency.decrease()
+    assert concurrency.limit == 2
+
+    # about one more slot per round of successful calls, up to the maximum
+    for _ in range(3):
+        concurrency.increase()
+    assert int(concurrency.limit) == 3
+    for _ in range(100):
+        concurrency.increase()
+    assert concurrency.limit == 8
+
+
+@pytest.mark.asyncio
+async def test_limiter_bounds_in_flight_calls_and_settles_tokens():
+    limiter = RateLimiter(tokens_per_minute=6000, max_concurrency=2)
+    in_flight = []
+    max_in_flight = 0
+
+    async def call():
+        nonlocal max_in_flight
+        async with limiter.reserve(100) as reservation:
+            in_flight.append(1)
+            max_in_flight = max(max_in_flight, len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+            reservation.tokens = 1000
+
+    await asyncio.gather(*(call() for _ in range(5)))
+    assert max_in_flight == 2
+    # five calls that really used 1000 tokens each
+    assert limiter.tokens.level == pytest.approx(1000, abs=10)
+
+
+@pytest.mark.asyncio
+async def test_limiter_backs_off_on_overload():
+    limiter = RateLimiter(max_concurrency=8)
+    with pytest.raises(anthropic.InternalServerError):
+        async with limiter.reserve(10):
+            raise api_error(529, {"retry-after": "30"})
+    assert limiter.concurrency.limit == 4
+    assert await limiter._pause_remaining() == pytest.approx(30, abs=1)
+
+    # other errors are not a signal to slow down
+    limiter = RateLimiter(max_concurrency=8)
+    with pytest.raises(anthropic.BadRequestError):
+        async with limiter.reserve(10):
+            raise api_error(400)
+    assert limiter.concurrency.limit == 8
+    assert await limiter._pause_remaining() <= 0
+
+
+@pytest.mark.asyncio
+async def test_generate_retries_only_retryable_errors(monkeypatch):
+    delays = []
+
+    async def sleep(delay, *args):
+        delays.append(delay)
+
+    monkeypatch.setattr(engine_module.asyncio, "sleep", sleep)
+    errors = []
+
+    class Messages:
+        async def create(self, **kwargs):
+            if errors:
+                raise errors.pop(0)
+            text = json.dumps(
+                {"is_relevant": True, "confidence": 1.0, "reason": "stub"}
+            )
+            return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+    engine = OmEngine(SimpleNamespace(messages=Messages()))
+
+    # a bad request fails the same way every time
+    errors[:] = [api_error(400)]
+    with pytest.raises(anthropic.BadRequestError):
+        await engine.generate("prompt")
+    assert engine.usage[-1].attempts == 1
+    assert delays == []
+
+    # rate limits are retried no sooner than the api asked
+    errors[:] = [api_error(429, {"retry-after": "5"})]
+    await engine.generate("prompt")
+    assert engine.usage[-1].attempts == 2
+    assert delays == [pytest.approx(5)]
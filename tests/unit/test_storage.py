@@ -0,0 +1,58 @@
+import hashlib
+import io
+
+from minio.error import S3Error
+
+from src.storage import PART_SIZE, Storage, StorageBucket
+
+
+class Minio:
+    """Stand-in client keeping objects in memory, as minio reads them: in parts"""
+
+    def __init__(self):
+        self.objects = {}
+        self.part_sizes = []
+
+    def put_object(
+        self, bucket_name, object_name, data, length, content_type, part_size
+    ):
+        self.part_sizes.append(part_size)
+        parts = iter(lambda: data.read(part_size), b"")
+        self.objects[(bucket_name, object_name)] = b"".join(parts)
+
+    def stat_object(self, bucket_name, object_name):
+        if (bucket_name, object_name) not in self.objects:
+            raise S3Error("NoSuchKey", "no such key", object_name, None, None, None)
+
+    def copy_object(self, bucket_name, object_name, source):
+        self.objects[(bucket_name, object_name)] = self.objects[
+            (source.bucket_name, source.object_name)
+        ]
+
+    def remove_object(self, bucket_name, object_name):
+        del self.objects[(bucket_name, object_name)]
+
+
+def storage_with(client):
+    storage = Storage.__new__(Storage)
+    storage.client = client
+    return storage
+
+
+def test_upload_is_streamed_and_stored_by_hash():
+    client = Minio()
+    storage = storage_with(client)
+    content = b"%PDF-1.7" + bytes(PART_SIZE)
+    content_hash = hashlib.sha256(content).hexdigest()
+
+    assert storage.put_object_by_hash(io.BytesIO(content), StorageBucket.oms) == (
+        content_hash,
+        len(content),
+    )
+    assert client.part_sizes == [PART_SIZE]
+    # the temporary upload is gone
+    assert client.objects == {("oms", content_hash): content}
+
+    # the same content again is not stored twice
+    storage.put_object_by_hash(io.BytesIO(content), StorageBucket.oms)
+    assert client.objects == {("oms", content_hash): content}